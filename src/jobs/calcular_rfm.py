@@ -0,0 +1,35 @@
+"""
+Job de recálculo da segmentação RFM dos clientes
+
+Agendamento sugerido (crontab, diariamente às 4h, após a sincronização):
+    0 4 * * * cd /caminho/melina && .venv/bin/python -m src.jobs.calcular_rfm
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.db_service import init_db
+from services.rfm_service import calcular_rfm
+
+
+def main():
+    init_db()
+
+    try:
+        relatorio = calcular_rfm()
+    except Exception as e:
+        print(f"Erro ao calcular segmentação RFM: {str(e)}")
+        return 1
+
+    segmentos = ', '.join(f"{nome}={total}" for nome, total in relatorio['segmentos'].items())
+    print(f"{relatorio['total_clientes']} clientes em {relatorio['duracao_segundos']}s: {segmentos}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
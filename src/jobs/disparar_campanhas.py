@@ -0,0 +1,49 @@
+"""
+Job que retoma o disparo de campanhas em andamento
+
+Processa a fila de envios (pendentes, novas tentativas e reservas
+expiradas) das campanhas com status "enviando", por exemplo após o
+reinício dos workers.
+
+Agendamento sugerido (crontab, a cada 5 minutos):
+    */5 * * * * cd /caminho/melina && .venv/bin/python -m src.jobs.disparar_campanhas
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.db_service import init_db, get_conn
+from services import envio_service
+
+
+def main():
+    init_db()
+
+    campanhas = [
+        row['id']
+        for row in get_conn().execute("SELECT id FROM campanhas WHERE status = 'enviando' ORDER BY id")
+    ]
+
+    falhas = 0
+    for campanha_id in campanhas:
+        try:
+            envio_service.processar(campanha_id, aguardar_repeticoes=False)
+            metricas = envio_service.metricas(campanha_id)
+            print(
+                f"Campanha {campanha_id}: {metricas['por_status']} "
+                f"({metricas['envios_por_segundo']} envios/s, fila {metricas['fila']})"
+            )
+        except Exception as e:
+            print(f"Erro ao processar campanha {campanha_id}: {str(e)}")
+            falhas += 1
+
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
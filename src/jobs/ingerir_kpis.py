@@ -0,0 +1,35 @@
+"""
+Job de ingestão da disponibilidade Paytour na tabela de fatos dos KPIs
+
+Agendamento sugerido (crontab, a cada hora):
+    0 * * * * cd /caminho/melina && .venv/bin/python -m src.jobs.ingerir_kpis
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# pace_service registra os triggers do histórico de disponibilidade
+from services import kpi_service, pace_service
+
+
+def main():
+    try:
+        relatorio = kpi_service.ingerir()
+    except Exception as e:
+        print(f"Erro ao ingerir KPIs: {str(e)}")
+        return 1
+
+    print(
+        f"{relatorio['passeios']} passeios, {relatorio['linhas_alteradas']} linhas alteradas "
+        f"em {relatorio['duracao_segundos']}s"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Job de limpeza do log de alterações de clientes
+
+Remove entradas mais antigas que a retenção (padrão: 7 dias). Clientes com
+cursor anterior recebem 410 no feed e recarregam a lista completa.
+
+Agendamento sugerido (crontab, diariamente às 3h):
+    0 3 * * * cd /caminho/melina && .venv/bin/python -m src.jobs.limpar_alteracoes
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.db_service import init_db
+from services.clientes_service import limpar_alteracoes, RETENCAO_ALTERACOES_DIAS
+
+
+def main():
+    init_db()
+
+    dias = int(os.getenv('CRM_RETENCAO_ALTERACOES_DIAS', RETENCAO_ALTERACOES_DIAS))
+
+    try:
+        removidas = limpar_alteracoes(dias)
+    except Exception as e:
+        print(f"Erro ao limpar log de alterações: {str(e)}")
+        return 1
+
+    print(f"{removidas} alterações removidas (retenção de {dias} dias)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
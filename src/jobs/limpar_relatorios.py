@@ -0,0 +1,37 @@
+"""
+Job de limpeza dos relatórios financeiros gerados em segundo plano
+
+Remove registros e arquivos mais antigos que a retenção (padrão: 24 horas),
+além de arquivos sem registro em RELATORIOS_DIR. Links de download de
+relatórios removidos passam a responder 404.
+
+Agendamento sugerido (crontab, a cada hora):
+    15 * * * * cd /caminho/melina && .venv/bin/python -m src.jobs.limpar_relatorios
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.relatorio_service import limpar_relatorios, RETENCAO_RELATORIOS_HORAS
+
+
+def main():
+    horas = int(os.getenv('RELATORIO_RETENCAO_HORAS', RETENCAO_RELATORIOS_HORAS))
+
+    try:
+        removidos = limpar_relatorios(horas)
+    except Exception as e:
+        print(f"Erro ao limpar relatórios: {str(e)}")
+        return 1
+
+    print(f"{removidos} relatórios removidos (retenção de {horas} horas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
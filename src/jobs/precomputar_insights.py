@@ -0,0 +1,126 @@
+"""
+Job noturno de pré-cálculo dos insights de IA
+
+Gera e armazena, para os períodos padrão, a análise de vendas, a análise
+de campanhas de marketing e as narrativas de impacto do clima. Insights
+cujos dados de entrada não mudaram são mantidos sem nova chamada ao modelo.
+
+Agendamento sugerido (crontab):
+    0 3 * * * cd /caminho/melina && .venv/bin/python -m src.jobs.precomputar_insights
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.paytour_service import PaytourService
+from services.weather_service import WeatherService
+from services.marketing_service import MarketingService
+from services.ai_service import AIService
+from services.insights_service import InsightsService
+from services import kpi_service
+
+PERIODOS_VENDAS = ['dia', 'semana', 'mes']
+PERIODOS_CLIMA = [3, 7]
+
+
+def precomputar_vendas(ai_service, insights):
+    for periodo in PERIODOS_VENDAS:
+        dados = [
+            {'passeio': item['passeio'], 'vendas': item['vendas'], 'receita': item['receita']}
+            for item in kpi_service.vendas_por_passeio(periodo)
+        ]
+        metricas = {
+            'total_vendas': sum(item['vendas'] for item in dados),
+            'total_receita': sum(item['receita'] for item in dados)
+        }
+        resultado = insights.obter_ou_gerar(
+            'analise_vendas',
+            periodo,
+            dados,
+            metricas,
+            lambda: ai_service.analisar_vendas(dados, periodo=periodo),
+            limiar=0
+        )
+        yield f"analise_vendas/{periodo}", resultado
+
+
+def precomputar_marketing(ai_service, insights):
+    marketing = MarketingService()
+    google_ads = marketing.campanhas_por_plataforma('Google Ads')
+    meta_ads = marketing.campanhas_por_plataforma('Meta Ads')
+    campanhas = google_ads + meta_ads
+    metricas = {
+        'investimento': sum(c.get('investimento', 0) for c in campanhas),
+        'retorno': sum(c.get('retorno', 0) for c in campanhas),
+        'conversoes': sum(c.get('conversoes', 0) for c in campanhas)
+    }
+    resultado = insights.obter_ou_gerar(
+        'analise_campanhas',
+        'atual',
+        campanhas,
+        metricas,
+        lambda: ai_service.analisar_campanhas_marketing(google_ads, meta_ads),
+        limiar=0
+    )
+    yield "analise_campanhas/atual", resultado
+
+
+def precomputar_clima(paytour, ai_service, insights):
+    weather = WeatherService()
+    passeios = [
+        {'passeio': p.get('titulo', ''), 'preco': float(p.get('preco_exibicao', 0) or 0)}
+        for p in paytour.get_passeios().get('passeios', [])
+    ]
+
+    for dias in PERIODOS_CLIMA:
+        previsao = weather.get_forecast(days=dias)
+        impactos = weather.analyze_impact(previsao)
+        clima = [
+            {'data': i['data'], 'score': i['score'], 'classificacao': i['classificacao']}
+            for i in impactos
+        ]
+        resultado = insights.obter_ou_gerar(
+            'impacto_clima',
+            f'{dias}d',
+            impactos,
+            weather.resumo_impacto(impactos),
+            lambda: ai_service.prever_impacto_clima(clima, passeios),
+            limiar=0
+        )
+        yield f"impacto_clima/{dias}d", resultado
+
+
+def main():
+    paytour = PaytourService()
+    ai_service = AIService()
+    insights = InsightsService()
+
+    etapas = [
+        lambda: precomputar_vendas(ai_service, insights),
+        lambda: precomputar_marketing(ai_service, insights),
+        lambda: precomputar_clima(paytour, ai_service, insights),
+    ]
+
+    falhas = 0
+    for etapa in etapas:
+        inicio = time.time()
+        try:
+            for nome, resultado in etapa():
+                situacao = 'mantido' if resultado['pre_calculado'] else 'gerado'
+                print(f"{nome}: {situacao} ({time.time() - inicio:.1f}s)")
+                inicio = time.time()
+        except Exception as e:
+            falhas += 1
+            print(f"Erro ao pré-calcular insights: {str(e)}")
+
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
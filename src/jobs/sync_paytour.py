@@ -0,0 +1,43 @@
+"""
+Job de sincronização incremental de pedidos Paytour para o CRM
+
+Agendamento sugerido (crontab, a cada 15 minutos):
+    */15 * * * * cd /caminho/melina && .venv/bin/python -m src.jobs.sync_paytour
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.db_service import init_db
+from services.paytour_sync_service import PaytourSyncService
+from services import cache_service
+
+
+def main():
+    init_db()
+
+    try:
+        relatorio = PaytourSyncService().sincronizar()
+    except Exception as e:
+        print(f"Erro ao sincronizar pedidos Paytour: {str(e)}")
+        return 1
+
+    # Estatísticas do CRM exibidas na home
+    cache_service.invalidar_seguro('dashboard')
+
+    print(
+        f"{relatorio['pedidos_processados']} pedidos, "
+        f"{relatorio['clientes_afetados']} clientes em {relatorio['duracao_segundos']}s "
+        f"({relatorio['pedidos_por_segundo']} pedidos/s), "
+        f"hwm {relatorio['hwm_anterior']} -> {relatorio['hwm_atual']}"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
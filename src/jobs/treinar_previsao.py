@@ -0,0 +1,47 @@
+"""
+Job de treino do modelo de previsão de ocupação
+
+Registra a previsão do tempo dos próximos dias (histórico de clima do
+modelo) e retreina com as datas já realizadas da matriz de pace.
+
+Agendamento sugerido (crontab, diariamente às 5h, após a ingestão dos KPIs):
+    0 5 * * * cd /caminho/melina && .venv/bin/python -m src.jobs.treinar_previsao
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services import previsao_service
+
+
+def main():
+    try:
+        previsao_service.registrar_clima()
+    except Exception as e:
+        # Sem clima novo o treino continua com o histórico já registrado
+        print(f"Erro ao registrar clima: {str(e)}")
+
+    try:
+        relatorio = previsao_service.treinar()
+    except Exception as e:
+        print(f"Erro ao treinar previsão: {str(e)}")
+        return 1
+
+    erros = ', '.join(
+        f"{faixa['antecedencia']}d={faixa['erro_medio']}"
+        for faixa in relatorio['por_antecedencia'] if faixa['erro_medio'] is not None
+    )
+    print(
+        f"{relatorio['amostras']} amostras de {relatorio['passeios']} passeios "
+        f"em {relatorio['duracao_segundos']}s (erro médio por antecedência: {erros})"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
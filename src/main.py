@@ -3,10 +3,13 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
+from sqlalchemy import event
 from src.models.user import db
+from src.services.db_service import aplicar_pragmas
+from src.services import http_service, estaticos_service
 from src.routes.user import user_bp
 from src.routes.passeios import passeios_bp
 from src.routes.financeiro import financeiro_bp
@@ -14,6 +17,7 @@ from src.routes.crm import crm_bp
 from src.routes.outros import outros_bp
 from src.routes.auth import auth_bp, init_oauth
 from src.routes.config import config_bp
+from src.routes.dashboard import dashboard_bp
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -29,6 +33,9 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 # Habilitar CORS
 CORS(app, supports_credentials=True)
 
+# ETag, GET condicional (304) e compressão das respostas da API
+http_service.configurar(app)
+
 # Inicializar OAuth
 init_oauth(app)
 
@@ -40,14 +47,20 @@ app.register_blueprint(crm_bp)
 app.register_blueprint(outros_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(config_bp, url_prefix='/api/config')
+app.register_blueprint(dashboard_bp)
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
+    # Mesmos pragmas (WAL, busy_timeout...) da camada sqlite3 do CRM
+    event.listen(db.engine, 'connect', lambda dbapi_conn, _: aplicar_pragmas(dbapi_conn))
     db.create_all()
 
+# Manifesto dos estáticos montado uma vez por processo (reiniciar após o deploy do front-end)
+manifesto_estaticos = estaticos_service.montar_manifesto(app.static_folder)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -55,14 +68,13 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    item = manifesto_estaticos.get(path) if path != "" else None
+    if item is None:
+        item = manifesto_estaticos.get('index.html')
+    if item is None:
+        return "index.html not found", 404
+
+    return estaticos_service.servir(item)
 
 
 if __name__ == '__main__':
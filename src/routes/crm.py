@@ -2,107 +2,73 @@
 Rotas para CRM - INTEGRAÇÃO REAL
 Clientes da Paytour + Cadastro local + Campanhas com IA
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
-import sqlite3
+import io
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.paytour_service import PaytourService
 from services.ai_service import AIService
+from services.db_service import transacao, init_db, normalizar_email
+from services import clientes_service, rfm_service, dedupe_service, envio_service
+from services.paytour_sync_service import PaytourSyncService
+from services.http_service import versao_dados
 
 crm_bp = Blueprint('crm', __name__, url_prefix='/api/crm')
 
-# Database path
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
-
-def init_db():
-    """Inicializa tabela de clientes se não existir"""
-    try:
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                telefone TEXT,
-                cpf TEXT,
-                data_nascimento TEXT,
-                cidade TEXT,
-                estado TEXT,
-                origem TEXT DEFAULT 'cadastro_manual',
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ultima_compra TIMESTAMP,
-                total_compras INTEGER DEFAULT 0,
-                valor_total REAL DEFAULT 0,
-                status TEXT DEFAULT 'ativo',
-                observacoes TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Erro ao inicializar DB: {str(e)}")
+# Públicos padrão e canais aceitos na geração de campanhas em lote
+# (segmentos RFM também podem ser informados)
+PUBLICOS = list(clientes_service.PUBLICOS)
+CANAIS = ['email', 'whatsapp']
+MAX_VARIANTES_LOTE = 24
+MAX_GERACOES_SIMULTANEAS = int(os.getenv('CAMPANHAS_MAX_SIMULTANEAS', 6))
 
 # Inicializar DB
 init_db()
 
 @crm_bp.route('/clientes', methods=['GET'])
+@versao_dados(clientes_service.versao)
 def listar_clientes():
     """Lista todos os clientes (Paytour + Cadastro local)"""
     try:
-        # Buscar clientes do banco local
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Parâmetros de filtro
+        # Parâmetros de filtro, ordenação e paginação
         status = request.args.get('status', 'ativo')
         busca = request.args.get('busca', '')
         
-        query = 'SELECT * FROM clientes WHERE status = ?'
-        params = [status]
+        # Lido antes da listagem: alterações concorrentes chegam pelo feed de alterações
+        cursor_alteracoes = clientes_service.cursor_atual()
         
-        if busca:
-            query += ' AND (nome LIKE ? OR email LIKE ? OR telefone LIKE ?)'
-            params.extend([f'%{busca}%', f'%{busca}%', f'%{busca}%'])
+        pagina = clientes_service.listar_clientes(
+            status=status,
+            busca=busca,
+            ordem=request.args.get('ordem'),
+            direcao=request.args.get('direcao', 'desc'),
+            cursor=request.args.get('cursor'),
+            limite=request.args.get('limite', clientes_service.LIMITE_PADRAO, type=int)
+        )
         
-        query += ' ORDER BY data_cadastro DESC LIMIT 100'
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        clientes = []
-        for row in rows:
-            clientes.append({
-                'id': row['id'],
-                'nome': row['nome'],
-                'email': row['email'],
-                'telefone': row['telefone'],
-                'cpf': row['cpf'],
-                'data_nascimento': row['data_nascimento'],
-                'cidade': row['cidade'],
-                'estado': row['estado'],
-                'origem': row['origem'],
-                'data_cadastro': row['data_cadastro'],
-                'ultima_compra': row['ultima_compra'],
-                'total_compras': row['total_compras'],
-                'valor_total': row['valor_total'],
-                'status': row['status']
-            })
-        
-        conn.close()
+        clientes = [clientes_service.cliente_para_dict(row) for row in pagina['rows']]
         
         return jsonify({
             'success': True,
             'clientes': clientes,
-            'total': len(clientes)
+            'quantidade': len(clientes),
+            'total': clientes_service.contar_clientes(status, busca),
+            'ordem': pagina['ordem'],
+            'proximo_cursor': pagina['proximo_cursor'],
+            'cursor_alteracoes': cursor_alteracoes
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         print(f"Erro ao listar clientes: {str(e)}")
         return jsonify({
@@ -116,55 +82,286 @@ def cadastrar_cliente():
     try:
         data = request.get_json()
         
+        # Mesma forma de email da importação e da sincronização Paytour
+        email = normalizar_email(data.get('email'))
+        
         # Validar campos obrigatórios
-        if not data.get('nome') or not data.get('email'):
+        if not data.get('nome') or not email:
             return jsonify({
                 'success': False,
                 'error': 'Nome e email são obrigatórios'
             }), 400
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        with transacao() as conn:
+            # Verificar se email já existe
+            existente = conn.execute('SELECT id FROM clientes WHERE email = ?', (email,)).fetchone()
+            if existente:
+                return jsonify({
+                    'success': False,
+                    'error': 'Email já cadastrado'
+                }), 400
+            
+            # Inserir cliente
+            cursor = conn.execute('''
+                INSERT INTO clientes (
+                    nome, email, telefone, cpf, data_nascimento,
+                    cidade, estado, origem, observacoes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                data.get('nome'),
+                email,
+                data.get('telefone', ''),
+                data.get('cpf', ''),
+                data.get('data_nascimento', ''),
+                data.get('cidade', ''),
+                data.get('estado', ''),
+                data.get('origem', 'cadastro_manual'),
+                data.get('observacoes', '')
+            ))
+            
+            cliente_id = cursor.lastrowid
         
-        # Verificar se email já existe
-        cursor.execute('SELECT id FROM clientes WHERE email = ?', (data.get('email'),))
-        if cursor.fetchone():
-            conn.close()
+        return jsonify({
+            'success': True,
+            'message': 'Cliente cadastrado com sucesso',
+            'cliente_id': cliente_id
+        }), 201
+        
+    except Exception as e:
+        print(f"Erro ao cadastrar cliente: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/alteracoes', methods=['GET'])
+def alteracoes_clientes():
+    """Inclusões/alterações/remoções de clientes após o cursor (?since=)"""
+    try:
+        since = request.args.get('since')
+        # LIMIT negativo no SQLite seria sem limite
+        limite = max(1, min(
+            request.args.get('limite', clientes_service.LIMITE_ALTERACOES, type=int),
+            clientes_service.LIMITE_ALTERACOES
+        ))
+        
+        # Sem cursor: devolve apenas o ponto de partida para as próximas consultas
+        if since is None:
+            return jsonify({
+                'success': True,
+                'alteracoes': [],
+                'cursor': clientes_service.cursor_atual(),
+                'tem_mais': False
+            }), 200
+        
+        try:
+            resultado = clientes_service.alteracoes_desde(int(since), limite=limite)
+        except ValueError:
             return jsonify({
                 'success': False,
-                'error': 'Email já cadastrado'
+                'error': 'Cursor inválido'
             }), 400
+        except clientes_service.CursorExpirado as e:
+            # O cliente deve recarregar a lista completa e recomeçar do cursor atual
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'cursor': clientes_service.cursor_atual()
+            }), 410
         
-        # Inserir cliente
-        cursor.execute('''
-            INSERT INTO clientes (
-                nome, email, telefone, cpf, data_nascimento,
-                cidade, estado, origem, observacoes
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data.get('nome'),
-            data.get('email'),
-            data.get('telefone', ''),
-            data.get('cpf', ''),
-            data.get('data_nascimento', ''),
-            data.get('cidade', ''),
-            data.get('estado', ''),
-            data.get('origem', 'cadastro_manual'),
-            data.get('observacoes', '')
-        ))
+        return jsonify({
+            'success': True,
+            **resultado
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao buscar alterações de clientes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/importar', methods=['POST'])
+def importar_clientes():
+    """
+    Importa/atualiza clientes em lote a partir de CSV ou NDJSON
+    
+    Aceita upload multipart (campo "arquivo") ou o arquivo no corpo da
+    requisição (Content-Type text/csv ou application/x-ndjson).
+    """
+    try:
+        arquivo = request.files.get('arquivo')
+        
+        if arquivo:
+            stream = arquivo.stream
+            nome_arquivo = (arquivo.filename or '').lower()
+            tipo = arquivo.mimetype or ''
+        else:
+            stream = request.stream
+            nome_arquivo = ''
+            tipo = request.mimetype or ''
+        
+        formato = request.args.get('formato')
+        if not formato:
+            if 'json' in tipo or nome_arquivo.endswith(('.ndjson', '.jsonl')):
+                formato = 'ndjson'
+            else:
+                formato = 'csv'
+        
+        if formato not in ('csv', 'ndjson'):
+            return jsonify({
+                'success': False,
+                'error': 'Formato deve ser csv ou ndjson'
+            }), 400
         
-        cliente_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        # Leitura em streaming: o arquivo não é carregado inteiro em memória
+        texto = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+        linhas = clientes_service.ler_csv(texto) if formato == 'csv' else clientes_service.ler_ndjson(texto)
+        
+        relatorio = clientes_service.importar_clientes(linhas)
         
         return jsonify({
             'success': True,
-            'message': 'Cliente cadastrado com sucesso',
-            'cliente_id': cliente_id
-        }), 201
+            'formato': formato,
+            'importacao': relatorio
+        }), 200
         
     except Exception as e:
-        print(f"Erro ao cadastrar cliente: {str(e)}")
+        print(f"Erro ao importar clientes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/exportar', methods=['GET'])
+def exportar_clientes():
+    """Exporta clientes em CSV ou NDJSON (streaming, memória constante)"""
+    try:
+        formato = request.args.get('formato', 'csv')
+        status = request.args.get('status', 'ativo')
+        busca = request.args.get('busca', '')
+        publico = request.args.get('publico')
+        
+        if formato not in ('csv', 'ndjson'):
+            return jsonify({
+                'success': False,
+                'error': 'Formato deve ser csv ou ndjson'
+            }), 400
+        
+        if publico and not clientes_service.publico_valido(publico):
+            return jsonify({
+                'success': False,
+                'error': f'Público inválido: {publico}'
+            }), 400
+        
+        linhas = clientes_service.exportar_clientes(formato, status=status, busca=busca, publico=publico)
+        nome_arquivo = f"clientes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+        
+        return Response(
+            stream_with_context(linhas),
+            mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}"'}
+        )
+        
+    except Exception as e:
+        print(f"Erro ao exportar clientes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/duplicados', methods=['GET'])
+def listar_duplicados():
+    """Sugestões de clientes duplicados (grupos com principal + duplicados)"""
+    try:
+        limiar = request.args.get('limiar', type=float)
+        limite = request.args.get('limite', 100, type=int)
+        status = request.args.get('status', 'ativo') or None
+        
+        resultado = dedupe_service.detectar_duplicados(limiar=limiar, status=status, limite=limite)
+        
+        return jsonify({
+            'success': True,
+            **resultado
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao detectar duplicados: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/duplicados/ignorar', methods=['POST'])
+def ignorar_duplicado():
+    """Marca um par de clientes como não duplicado"""
+    try:
+        data = request.get_json() or {}
+        ids = data.get('ids') or []
+        
+        if len(ids) != 2:
+            return jsonify({
+                'success': False,
+                'error': 'Informe os ids dos dois clientes'
+            }), 400
+        
+        dedupe_service.ignorar_par(int(ids[0]), int(ids[1]))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Par ignorado'
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao ignorar duplicado: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/clientes/mesclar', methods=['POST'])
+def mesclar_clientes():
+    """Mescla duplicados no cliente principal (um grupo ou lote de grupos)"""
+    try:
+        data = request.get_json() or {}
+        
+        grupos = data.get('grupos')
+        if grupos is None and data.get('principal_id'):
+            grupos = [{'principal_id': data['principal_id'], 'duplicados': data.get('duplicados') or []}]
+        
+        if not grupos:
+            return jsonify({
+                'success': False,
+                'error': 'Informe principal_id e duplicados, ou grupos'
+            }), 400
+        
+        resultado = dedupe_service.mesclar_lote(grupos)
+        
+        return jsonify({
+            'success': not resultado['erros'] or resultado['mesclados'] > 0,
+            'mesclagem': resultado
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao mesclar clientes: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/sync/paytour', methods=['POST'])
+def sincronizar_paytour():
+    """Sincroniza incrementalmente clientes e compras a partir dos pedidos Paytour"""
+    try:
+        relatorio = PaytourSyncService().sincronizar()
+        
+        return jsonify({
+            'success': True,
+            'sincronizacao': relatorio
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao sincronizar pedidos Paytour: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -177,29 +374,19 @@ def criar_campanha():
         data = request.get_json()
         
         tipo = data.get('tipo', 'email')
-        publico = data.get('publico', 'todos')
+        publico = data.get('segmento') or data.get('publico', 'todos')
         objetivo = data.get('objetivo', 'engajamento')
         
+        if not clientes_service.publico_valido(publico):
+            return jsonify({
+                'success': False,
+                'error': f'Público inválido: {publico}'
+            }), 400
+        
         ai_service = AIService()
         
         # Buscar informações dos clientes
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        if publico == 'inativos':
-            cursor.execute('''
-                SELECT COUNT(*) FROM clientes 
-                WHERE ultima_compra IS NULL 
-                OR datetime(ultima_compra) < datetime('now', '-60 days')
-            ''')
-        elif publico == 'vips':
-            cursor.execute('SELECT COUNT(*) FROM clientes WHERE total_compras >= 5')
-        else:
-            cursor.execute('SELECT COUNT(*) FROM clientes WHERE status = "ativo"')
-        
-        result = cursor.fetchone()
-        total_destinatarios = result[0] if result else 0
-        conn.close()
+        total_destinatarios = clientes_service.contar_publico(publico)
         
         # Gerar campanha com IA
         prompt = f"""
@@ -219,11 +406,21 @@ def criar_campanha():
         Tom: Amigável, entusiasmado, focado em experiências.
         """
         
-        campanha = ai_service.generate_text(prompt)
+        campanha = ai_service.generate_text(
+            prompt,
+            tarefa='campanha_whatsapp' if tipo == 'whatsapp' else 'campanha_email'
+        )
+        
+        # Rascunho gravado para disparo posterior
+        campanha_id = envio_service.criar_campanha(
+            tipo, publico, objetivo, campanha,
+            assunto=data.get('assunto') or f'Maremar Turismo: {objetivo}'
+        )
         
         return jsonify({
             'success': True,
             'campanha': {
+                'id': campanha_id,
                 'tipo': tipo,
                 'publico': publico,
                 'objetivo': objetivo,
@@ -240,35 +437,235 @@ def criar_campanha():
             'error': str(e)
         }), 500
 
-@crm_bp.route('/estatisticas', methods=['GET'])
-def estatisticas_crm():
-    """Estatísticas gerais do CRM"""
+@crm_bp.route('/campanhas/<int:campanha_id>/disparar', methods=['POST'])
+def disparar_campanha(campanha_id):
+    """
+    Inicia o envio da campanha em segundo plano
+
+    O primeiro disparo exige o texto final revisado (conteudo e, para email,
+    assunto): o texto gerado pela IA é só um rascunho. Campanhas já em envio
+    ou concluídas só são retomadas com retomar=true (envios já feitos não se
+    repetem), mantendo o texto aprovado.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        data = request.get_json(silent=True) or {}
+        retomar = data.get('retomar') is True
+        conteudo = str(data.get('conteudo') or '').strip()
+        assunto = str(data.get('assunto') or '').strip()
+        
+        campanha = envio_service.buscar_campanha(campanha_id)
+        if not campanha:
+            return jsonify({
+                'success': False,
+                'error': 'Campanha não encontrada'
+            }), 404
+        
+        if campanha['tipo'] not in envio_service.REMETENTES:
+            return jsonify({
+                'success': False,
+                'error': f"Canal sem remetente configurado: {campanha['tipo']}"
+            }), 400
         
-        # Total de clientes
-        cursor.execute('SELECT COUNT(*) FROM clientes WHERE status = "ativo"')
-        result = cursor.fetchone()
-        total_clientes = result[0] if result else 0
+        if campanha['status'] in envio_service.STATUS_DISPARADA:
+            if not retomar:
+                return jsonify({
+                    'success': False,
+                    'error': f"Campanha já disparada ({campanha['status']}); use retomar=true para continuar os envios"
+                }), 409
+            if conteudo or assunto:
+                return jsonify({
+                    'success': False,
+                    'error': 'O texto não pode ser alterado em uma campanha já disparada'
+                }), 400
+        else:
+            # Texto final revisado (com {{primeiro_nome}}, {{cidade}}...) substitui o rascunho da IA
+            if not conteudo or (campanha['tipo'] == 'email' and not assunto):
+                return jsonify({
+                    'success': False,
+                    'error': 'Informe o texto revisado da campanha (conteudo' + (' e assunto' if campanha['tipo'] == 'email' else '') + ')'
+                }), 400
+            
+            # Aprovação e início na mesma transação: dois disparos simultâneos não passam ambos
+            with transacao() as conn:
+                aprovada = conn.execute(
+                    "UPDATE campanhas SET conteudo = ?, assunto = coalesce(?, assunto), status = 'enviando', "
+                    'iniciado_em = coalesce(iniciado_em, ?) WHERE id = ? AND status NOT IN (?, ?)',
+                    (conteudo, assunto or None, datetime.now().isoformat(), campanha_id, *envio_service.STATUS_DISPARADA)
+                ).rowcount
+            if not aprovada:
+                return jsonify({
+                    'success': False,
+                    'error': 'Campanha já disparada'
+                }), 409
+        
+        envio_service.disparar_em_segundo_plano(campanha_id)
         
-        # Clientes novos (últimos 30 dias)
-        cursor.execute('''
-            SELECT COUNT(*) FROM clientes 
-            WHERE status = "ativo" 
-            AND datetime(data_cadastro) >= datetime('now', '-30 days')
-        ''')
-        result = cursor.fetchone()
-        clientes_novos = result[0] if result else 0
+        return jsonify({
+            'success': True,
+            'message': 'Disparo iniciado',
+            'envios': envio_service.metricas(campanha_id)
+        }), 202
         
-        conn.close()
+    except Exception as e:
+        print(f"Erro ao disparar campanha: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/campanhas/<int:campanha_id>/envios', methods=['GET'])
+def envios_campanha(campanha_id):
+    """Progresso do disparo: envios por status, vazão e fila"""
+    try:
+        metricas = envio_service.metricas(campanha_id)
+        if not metricas:
+            return jsonify({
+                'success': False,
+                'error': 'Campanha não encontrada'
+            }), 404
         
         return jsonify({
             'success': True,
-            'estatisticas': {
-                'total_clientes': total_clientes,
-                'clientes_novos_mes': clientes_novos
+            'envios': metricas,
+            'erros_recentes': envio_service.erros_recentes(campanha_id)
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao buscar envios da campanha: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/campanhas/lote', methods=['POST'])
+def criar_campanhas_lote():
+    """Gera campanhas para vários públicos × canais × objetivos em paralelo"""
+    try:
+        data = request.get_json() or {}
+        
+        publicos = data.get('publicos') or data.get('segmentos') or PUBLICOS
+        canais = data.get('canais') or CANAIS
+        objetivos = data.get('objetivos') or [data.get('objetivo', 'engajamento')]
+        
+        # Strings seriam percorridas letra a letra (uma variante por caractere)
+        for nome, valores in [('publicos', publicos), ('canais', canais), ('objetivos', objetivos)]:
+            if not isinstance(valores, list) or not all(isinstance(v, str) and v.strip() for v in valores):
+                return jsonify({
+                    'success': False,
+                    'error': f'{nome} deve ser uma lista de textos'
+                }), 400
+        
+        invalidos = [p for p in publicos if not clientes_service.publico_valido(p)] + [c for c in canais if c not in CANAIS]
+        if invalidos:
+            return jsonify({
+                'success': False,
+                'error': f"Públicos/canais inválidos: {', '.join(invalidos)}"
+            }), 400
+        
+        combinacoes = [
+            (publico, canal, objetivo)
+            for publico in publicos
+            for canal in canais
+            for objetivo in objetivos
+        ]
+        
+        if len(combinacoes) > MAX_VARIANTES_LOTE:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {MAX_VARIANTES_LOTE} variantes por lote'
+            }), 400
+        
+        # Tamanho de cada público (uma consulta por público)
+        totais = {publico: clientes_service.contar_publico(publico) for publico in set(publicos)}
+        
+        ai_service = AIService()
+        geradores = {
+            'email': ai_service.gerar_campanha_email,
+            'whatsapp': ai_service.gerar_campanha_whatsapp
+        }
+        
+        def gerar_variante(combinacao):
+            publico, canal, objetivo = combinacao
+            variante = {
+                'publico': publico,
+                'tipo': canal,
+                'objetivo': objetivo,
+                'total_destinatarios': totais[publico]
             }
+            clientes_data = {'publico': publico, 'total_clientes': totais[publico]}
+            try:
+                variante['conteudo'] = geradores[canal](clientes_data, objetivo)
+            except Exception as e:
+                variante['erro'] = str(e)
+            return variante
+        
+        # Pool limitado; o limite de taxa da OpenAI é compartilhado pelo processo
+        inicio = time.time()
+        with ThreadPoolExecutor(max_workers=min(MAX_GERACOES_SIMULTANEAS, len(combinacoes))) as executor:
+            campanhas = list(executor.map(gerar_variante, combinacoes))
+        
+        return jsonify({
+            'success': True,
+            'campanhas': campanhas,
+            'total': len(campanhas),
+            'erros': sum(1 for c in campanhas if 'erro' in c),
+            'tempo_segundos': round(time.time() - inicio, 2),
+            'data_criacao': datetime.now().isoformat()
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao criar campanhas em lote: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/segmentos', methods=['GET'])
+def listar_segmentos():
+    """Segmentos RFM e públicos disponíveis para campanhas"""
+    try:
+        return jsonify({
+            'success': True,
+            'segmentos': rfm_service.listar_segmentos(),
+            'publicos': clientes_service.publicos_disponiveis()
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao listar segmentos: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/segmentos/recalcular', methods=['POST'])
+def recalcular_segmentos():
+    """Recalcula a segmentação RFM de toda a base"""
+    try:
+        relatorio = rfm_service.calcular_rfm()
+        
+        return jsonify({
+            'success': True,
+            'rfm': relatorio
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao recalcular segmentos RFM: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@crm_bp.route('/estatisticas', methods=['GET'])
+@versao_dados(clientes_service.versao)
+def estatisticas_crm():
+    """Estatísticas gerais do CRM"""
+    try:
+        # Lidas da tabela de contadores mantida por triggers (sem varrer clientes)
+        estatisticas = clientes_service.estatisticas()
+        
+        return jsonify({
+            'success': True,
+            'estatisticas': estatisticas
         }), 200
         
     except Exception as e:
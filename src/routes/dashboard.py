@@ -0,0 +1,36 @@
+"""
+Rotas do dashboard - snapshot da página inicial em uma única requisição
+"""
+from flask import Blueprint, jsonify
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import dashboard_service, kpi_service
+from services.cache_service import cache_rota
+
+dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
+
+@dashboard_bp.route('/home', methods=['GET'])
+@cache_rota('dashboard', ttl=dashboard_service.TTL, versao=kpi_service.versao)
+def home():
+    """Resumo financeiro, passeios, clima e CRM da página inicial (montados em paralelo)"""
+    try:
+        # Guardado como uma unidade no cache de rotas (?forcar=true remonta)
+        snapshot = dashboard_service.montar_home()
+        
+        response = jsonify({
+            'success': True,
+            'home': snapshot['secoes'],
+            'gerado_em': snapshot['gerado_em']
+        })
+        response.headers['Cache-Control'] = f'private, max-age={dashboard_service.TTL}'
+        return response, 200
+        
+    except Exception as e:
+        print(f"Erro ao montar home do dashboard: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
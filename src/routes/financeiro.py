@@ -1,59 +1,55 @@
 """
 Rotas para painel financeiro - INTEGRAÇÃO REAL PAYTOUR
-Cálculo baseado em disponibilidade (vagas vendidas = total - disponível)
+Cálculo baseado em disponibilidade (vagas vendidas = total - disponível),
+lido do cubo de KPIs (kpi_service) para o catálogo inteiro
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, send_file
 from datetime import datetime, timedelta
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.paytour_service import PaytourService
 from services.ai_service import AIService
+from services.insights_service import InsightsService
+from services import relatorio_service, kpi_service, pace_service, previsao_service
+from services.cache_service import cache_rota
+from services.http_service import versao_dados
 
 financeiro_bp = Blueprint('financeiro', __name__, url_prefix='/api/financeiro')
 
+def _kpis_atualizados_em():
+    """Pede a atualização do cubo de KPIs se estiver desatualizado; retorna a data da última ingestão"""
+    kpi_service.atualizar_em_segundo_plano()
+    ingestao = kpi_service.ultima_ingestao()
+    return ingestao['concluido_em'] if ingestao else None
+
 @financeiro_bp.route('/vendas', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
 def listar_vendas():
-    """Lista vendas estimadas por passeio baseado em disponibilidade"""
+    """Lista vendas estimadas por passeio baseado em disponibilidade (catálogo inteiro)"""
     try:
-        paytour = PaytourService()
+        atualizado_em = _kpis_atualizados_em()
         
         # Parâmetros
         periodo = request.args.get('periodo', 'mes')  # dia, semana, mes
         
-        # Buscar todos os passeios
-        hoje = datetime.now().strftime('%Y-%m-%d')
-        um_mes = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-        
-        result = paytour.get_passeios(data_de=hoje, data_ate=um_mes)
-        passeios_list = result.get('passeios', [])
-        
-        # Calcular vendas para cada passeio
-        vendas = []
-        total_vendas = 0
-        total_receita = 0
+        # Vendas de todos os passeios, lidas do cubo de KPIs
+        vendas = [
+            {
+                'passeio_id': item['passeio_id'],
+                'titulo': item['passeio'] or 'Sem título',
+                'vagas_vendidas': item['vendas'],
+                'preco_medio': item['preco_medio'],
+                'receita': item['receita'],
+                'periodo': periodo
+            }
+            for item in kpi_service.vendas_por_passeio(periodo)
+        ]
         
-        for passeio in passeios_list[:15]:  # Limitar para performance
-            passeio_id = passeio.get('id')
-            titulo = passeio.get('titulo', 'Sem título')
-            
-            # Calcular vendas estimadas
-            venda_info = paytour.calcular_vendas_estimadas(passeio_id, periodo=periodo)
-            
-            if venda_info['vagas_vendidas'] > 0:
-                vendas.append({
-                    'passeio_id': passeio_id,
-                    'titulo': titulo,
-                    'vagas_vendidas': venda_info['vagas_vendidas'],
-                    'preco_medio': venda_info['preco_medio'],
-                    'receita': venda_info['receita_estimada'],
-                    'periodo': periodo
-                })
-                
-                total_vendas += venda_info['vagas_vendidas']
-                total_receita += venda_info['receita_estimada']
+        total_vendas = sum(item['vagas_vendidas'] for item in vendas)
+        total_receita = sum(item['receita'] for item in vendas)
         
         return jsonify({
             'success': True,
@@ -62,7 +58,8 @@ def listar_vendas():
                 'total_vendas': total_vendas,
                 'total_receita': round(total_receita, 2),
                 'periodo': periodo
-            }
+            },
+            'atualizado_em': atualizado_em
         }), 200
         
     except Exception as e:
@@ -72,69 +69,194 @@ def listar_vendas():
             'error': str(e)
         }), 500
 
-@financeiro_bp.route('/resumo', methods=['GET'])
-def resumo_financeiro():
-    """Resumo financeiro com KPIs principais"""
+@financeiro_bp.route('/kpis', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
+def kpis():
+    """KPIs (vendidas, receita, ocupação, ticket médio) de um intervalo qualquer"""
     try:
-        paytour = PaytourService()
+        hoje = datetime.now()
+        data_inicio = request.args.get('data_inicio') or hoje.strftime('%Y-%m-%d')
+        data_fim = request.args.get('data_fim') or (hoje + timedelta(days=30)).strftime('%Y-%m-%d')
+        
+        try:
+            resultado = kpi_service.consultar(
+                data_inicio,
+                data_fim,
+                agrupar=request.args.get('agrupar', 'total'),
+                passeio_id=request.args.get('passeio_id', type=int),
+                categoria=request.args.get('categoria')
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'kpis': resultado,
+            'atualizado_em': _kpis_atualizados_em()
+        }), 200
         
-        # Buscar passeios
-        hoje = datetime.now().strftime('%Y-%m-%d')
-        um_mes = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+    except Exception as e:
+        print(f"Erro ao consultar KPIs: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/pace', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
+def pace():
+    """Vagas em carteira contra o ano anterior na mesma antecedência (padrão: próximo mês)"""
+    try:
+        padrao_inicio, padrao_fim = pace_service.proximo_mes()
+        data_inicio = request.args.get('data_inicio') or padrao_inicio
+        data_fim = request.args.get('data_fim') or padrao_fim
+        
+        try:
+            resultado = pace_service.pace(
+                data_inicio,
+                data_fim,
+                agrupar=request.args.get('agrupar', 'total'),
+                passeio_id=request.args.get('passeio_id', type=int)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        result = paytour.get_passeios(data_de=hoje, data_ate=um_mes)
-        passeios_list = result.get('passeios', [])
+        return jsonify({
+            'success': True,
+            'pace': resultado,
+            'atualizado_em': _kpis_atualizados_em()
+        }), 200
         
-        # Calcular métricas
-        total_passeios = len(passeios_list)
-        total_vendas_mes = 0
-        total_receita_mes = 0
-        total_vendas_semana = 0
-        total_receita_semana = 0
+    except Exception as e:
+        print(f"Erro ao consultar pace: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/pace/curva', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
+def curva_pace():
+    """Curva de vendas em carteira por antecedência, deste ano e do ano anterior"""
+    try:
+        padrao_inicio, padrao_fim = pace_service.proximo_mes()
+        
+        try:
+            resultado = pace_service.curva(
+                request.args.get('data_inicio') or padrao_inicio,
+                request.args.get('data_fim') or padrao_fim,
+                passeio_id=request.args.get('passeio_id', type=int)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        passeios_mais_vendidos = []
+        return jsonify({
+            'success': True,
+            'curva': resultado
+        }), 200
         
-        for passeio in passeios_list[:15]:
-            passeio_id = passeio.get('id')
-            titulo = passeio.get('titulo', '')
-            
-            # Vendas do mês
-            vendas_mes = paytour.calcular_vendas_estimadas(passeio_id, periodo='mes')
-            total_vendas_mes += vendas_mes['vagas_vendidas']
-            total_receita_mes += vendas_mes['receita_estimada']
-            
-            # Vendas da semana
-            vendas_semana = paytour.calcular_vendas_estimadas(passeio_id, periodo='semana')
-            total_vendas_semana += vendas_semana['vagas_vendidas']
-            total_receita_semana += vendas_semana['receita_estimada']
-            
-            if vendas_mes['vagas_vendidas'] > 0:
-                passeios_mais_vendidos.append({
-                    'titulo': titulo,
-                    'vendas': vendas_mes['vagas_vendidas'],
-                    'receita': vendas_mes['receita_estimada']
-                })
+    except Exception as e:
+        print(f"Erro ao consultar curva de pace: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/pickup/<int:passeio_id>', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
+def pickup(passeio_id):
+    """Relatório de pickup de um passeio por data (padrão: próximo mês)"""
+    try:
+        padrao_inicio, padrao_fim = pace_service.proximo_mes()
+        
+        try:
+            resultado = pace_service.pickup(
+                passeio_id,
+                request.args.get('data_inicio') or padrao_inicio,
+                request.args.get('data_fim') or padrao_fim
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # Ordenar por vendas
-        passeios_mais_vendidos.sort(key=lambda x: x['vendas'], reverse=True)
+        return jsonify({
+            'success': True,
+            'pickup': resultado,
+            'atualizado_em': _kpis_atualizados_em()
+        }), 200
         
-        # Calcular crescimento (mock - precisaria de dados históricos)
-        crescimento_vendas = 15.5  # Placeholder
-        crescimento_receita = 18.2  # Placeholder
+    except Exception as e:
+        print(f"Erro ao gerar pickup: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/previsao', methods=['GET'])
+@versao_dados(previsao_service.versao)
+@cache_rota('financeiro', ttl=300, versao=previsao_service.versao)
+def previsao():
+    """Ocupação prevista por data, de um passeio ou de todos (padrão: próximos 30 dias)"""
+    try:
+        hoje = datetime.now()
+        
+        try:
+            resultado = previsao_service.prever_periodo(
+                request.args.get('data_inicio') or hoje.strftime('%Y-%m-%d'),
+                request.args.get('data_fim') or (hoje + timedelta(days=30)).strftime('%Y-%m-%d'),
+                passeio_id=request.args.get('passeio_id', type=int)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if resultado is None:
+            return jsonify({
+                'success': False,
+                'error': 'Modelo de previsão ainda não treinado'
+            }), 503
         
         return jsonify({
             'success': True,
-            'resumo': {
-                'total_passeios': total_passeios,
-                'vendas_mes': total_vendas_mes,
-                'receita_mes': round(total_receita_mes, 2),
-                'vendas_semana': total_vendas_semana,
-                'receita_semana': round(total_receita_semana, 2),
-                'ticket_medio': round(total_receita_mes / total_vendas_mes, 2) if total_vendas_mes > 0 else 0,
-                'crescimento_vendas': crescimento_vendas,
-                'crescimento_receita': crescimento_receita,
-                'passeios_mais_vendidos': passeios_mais_vendidos[:5]
-            }
+            'previsao': resultado
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao gerar previsão: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/resumo', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
+def resumo_financeiro():
+    """Resumo financeiro com KPIs principais"""
+    try:
+        atualizado_em = _kpis_atualizados_em()
+        
+        return jsonify({
+            'success': True,
+            'resumo': kpi_service.resumo(),
+            'atualizado_em': atualizado_em
         }), 200
         
     except Exception as e:
@@ -148,56 +270,35 @@ def resumo_financeiro():
 def analise_ia():
     """Análise financeira com IA"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         periodo = data.get('periodo', 'mes')
+        forcar = bool(data.get('forcar', False))
         
-        paytour = PaytourService()
         ai_service = AIService()
+        insights = InsightsService()
+        
+        # Coletar dados para análise (todos os passeios com vendas)
+        kpi_service.atualizar_em_segundo_plano()
+        dados_analise = [
+            {'passeio': item['passeio'], 'vendas': item['vendas'], 'receita': item['receita']}
+            for item in kpi_service.vendas_por_passeio(periodo)
+        ]
+        total_receita = sum(item['receita'] for item in dados_analise)
+        metricas = {
+            'total_vendas': sum(item['vendas'] for item in dados_analise),
+            'total_receita': total_receita
+        }
         
-        # Buscar dados financeiros
-        hoje = datetime.now().strftime('%Y-%m-%d')
-        um_mes = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-        
-        result = paytour.get_passeios(data_de=hoje, data_ate=um_mes)
-        passeios_list = result.get('passeios', [])
-        
-        # Coletar dados para análise
-        dados_analise = []
-        total_receita = 0
-        
-        for passeio in passeios_list[:10]:
-            passeio_id = passeio.get('id')
-            titulo = passeio.get('titulo', '')
-            
-            vendas = paytour.calcular_vendas_estimadas(passeio_id, periodo=periodo)
-            
-            if vendas['vagas_vendidas'] > 0:
-                dados_analise.append({
-                    'passeio': titulo,
-                    'vendas': vendas['vagas_vendidas'],
-                    'receita': vendas['receita_estimada']
-                })
-                total_receita += vendas['receita_estimada']
-        
-        # Gerar análise com IA
-        prompt = f"""
-        Analise os seguintes dados financeiros da Maremar Turismo para o período de {periodo}:
-        
-        Dados de vendas:
-        {dados_analise}
-        
-        Receita total: R$ {total_receita:.2f}
-        
-        Forneça:
-        1. Análise geral do desempenho
-        2. Principais insights
-        3. Recomendações estratégicas
-        4. Oportunidades de crescimento
-        
-        Seja objetivo e focado em ações práticas.
-        """
-        
-        analise = ai_service.analyze_data(dados_analise, prompt)
+        # Reaproveitar insight pré-calculado enquanto os dados não mudarem além do limiar
+        insight = insights.obter_ou_gerar(
+            'analise_vendas',
+            periodo,
+            dados_analise,
+            metricas,
+            lambda: ai_service.analisar_vendas(dados_analise, periodo=periodo),
+            forcar=forcar
+        )
+        analise = insight['conteudo']
         
         return jsonify({
             'success': True,
@@ -206,7 +307,9 @@ def analise_ia():
                 'periodo': periodo,
                 'total_receita': round(total_receita, 2),
                 'passeios_analisados': len(dados_analise)
-            }
+            },
+            'gerado_em': insight['gerado_em'],
+            'pre_calculado': insight['pre_calculado']
         }), 200
         
     except Exception as e:
@@ -218,14 +321,18 @@ def analise_ia():
 
 @financeiro_bp.route('/relatorio', methods=['POST'])
 def gerar_relatorio():
-    """Gera relatório financeiro detalhado"""
+    """Gera relatório financeiro detalhado (json, csv, excel ou pdf)"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         data_inicio = data.get('data_inicio')
         data_fim = data.get('data_fim')
-        formato = data.get('formato', 'json')  # json, pdf, excel
+        formato = data.get('formato', 'json')  # json, csv, excel, pdf
         
-        paytour = PaytourService()
+        if not relatorio_service.formato_disponivel(formato):
+            return jsonify({
+                'success': False,
+                'error': f'Formato indisponível: {formato}'
+            }), 400
         
         # Se não informado, usar último mês
         if not data_inicio:
@@ -233,92 +340,165 @@ def gerar_relatorio():
         if not data_fim:
             data_fim = datetime.now().strftime('%Y-%m-%d')
         
-        # Buscar dados
-        result = paytour.get_passeios(data_de=data_inicio, data_ate=data_fim)
-        passeios_list = result.get('passeios', [])
-        
-        # Gerar relatório
-        relatorio = {
-            'periodo': {
-                'inicio': data_inicio,
-                'fim': data_fim
-            },
-            'resumo': {
-                'total_passeios': len(passeios_list),
-                'total_vendas': 0,
-                'total_receita': 0
-            },
-            'detalhes': []
-        }
-        
-        for passeio in passeios_list[:20]:
-            passeio_id = passeio.get('id')
-            titulo = passeio.get('titulo', '')
-            
-            vendas = paytour.calcular_vendas_estimadas(passeio_id, periodo='mes')
+        try:
+            dias = relatorio_service.dias_intervalo(data_inicio, data_fim)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Datas devem estar no formato YYYY-MM-DD'
+            }), 400
+        
+        if dias < 1:
+            return jsonify({
+                'success': False,
+                'error': 'data_fim anterior a data_inicio'
+            }), 400
+        
+        # Intervalos longos (ou pedidos explicitamente) rodam em segundo plano
+        if formato != 'json' and (dias > relatorio_service.DIAS_SINCRONO or data.get('assincrono')):
+            relatorio_id = relatorio_service.iniciar(formato, data_inicio, data_fim)
             
-            relatorio['resumo']['total_vendas'] += vendas['vagas_vendidas']
-            relatorio['resumo']['total_receita'] += vendas['receita_estimada']
+            return jsonify({
+                'success': True,
+                'relatorio_id': relatorio_id,
+                'status': 'processando',
+                'status_url': f'/api/financeiro/relatorio/{relatorio_id}',
+                'download_url': f'/api/financeiro/relatorio/{relatorio_id}/download'
+            }), 202
+        
+        if formato == 'json':
+            linhas = relatorio_service.agregar_periodo(data_inicio, data_fim)
             
-            relatorio['detalhes'].append({
-                'passeio': titulo,
-                'vendas': vendas['vagas_vendidas'],
-                'preco_medio': vendas['preco_medio'],
-                'receita': vendas['receita_estimada']
+            return jsonify({
+                'success': True,
+                'relatorio': relatorio_service.resumir(linhas, data_inicio, data_fim),
+                'formato': formato
+            }), 200
+        
+        # Arquivo temporário: aberto e já apagado do disco (o envio lê pelo descritor aberto)
+        caminho, _ = relatorio_service.gerar_arquivo(formato, data_inicio, data_fim)
+        try:
+            arquivo = open(caminho, 'rb')
+        finally:
+            relatorio_service.remover_arquivo(caminho)
+        
+        return send_file(
+            arquivo,
+            mimetype=relatorio_service.FORMATOS[formato],
+            as_attachment=True,
+            download_name=relatorio_service.nome_download({
+                'formato': formato, 'data_inicio': data_inicio, 'data_fim': data_fim
             })
+        )
         
-        relatorio['resumo']['total_receita'] = round(relatorio['resumo']['total_receita'], 2)
-        
-        # TODO: Implementar geração de PDF/Excel se necessário
+    except Exception as e:
+        print(f"Erro ao gerar relatório: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/relatorio/<relatorio_id>', methods=['GET'])
+def status_relatorio(relatorio_id):
+    """Status de um relatório gerado em segundo plano"""
+    try:
+        relatorio = relatorio_service.buscar(relatorio_id)
+        if not relatorio:
+            return jsonify({
+                'success': False,
+                'error': 'Relatório não encontrado'
+            }), 404
         
         return jsonify({
             'success': True,
-            'relatorio': relatorio,
-            'formato': formato
+            'relatorio': {
+                'id': relatorio['id'],
+                'formato': relatorio['formato'],
+                'periodo': {'inicio': relatorio['data_inicio'], 'fim': relatorio['data_fim']},
+                'status': relatorio['status'],
+                'resumo': relatorio['resumo'],
+                'erro': relatorio['erro'],
+                'criado_em': relatorio['criado_em'],
+                'concluido_em': relatorio['concluido_em'],
+                'download_url': (
+                    f'/api/financeiro/relatorio/{relatorio_id}/download'
+                    if relatorio['status'] == 'concluido' else None
+                )
+            }
         }), 200
         
     except Exception as e:
-        print(f"Erro ao gerar relatório: {str(e)}")
+        print(f"Erro ao buscar relatório: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@financeiro_bp.route('/relatorio/<relatorio_id>/download', methods=['GET'])
+def download_relatorio(relatorio_id):
+    """Download do arquivo de um relatório concluído"""
+    try:
+        relatorio = relatorio_service.buscar(relatorio_id)
+        if not relatorio:
+            return jsonify({
+                'success': False,
+                'error': 'Relatório não encontrado'
+            }), 404
+        
+        if relatorio['status'] != 'concluido' or not os.path.exists(relatorio['arquivo'] or ''):
+            return jsonify({
+                'success': False,
+                'error': 'Relatório ainda não disponível',
+                'status': relatorio['status']
+            }), 409
+        
+        return send_file(
+            relatorio['arquivo'],
+            mimetype=relatorio_service.FORMATOS[relatorio['formato']],
+            as_attachment=True,
+            download_name=relatorio_service.nome_download(relatorio)
+        )
+        
+    except Exception as e:
+        print(f"Erro ao baixar relatório: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 @financeiro_bp.route('/grafico-vendas', methods=['GET'])
+@versao_dados(kpi_service.versao)
+@cache_rota('financeiro', ttl=300, versao=kpi_service.versao)
 def grafico_vendas():
     """Dados para gráfico de vendas ao longo do tempo"""
     try:
-        paytour = PaytourService()
+        atualizado_em = _kpis_atualizados_em()
+        
+        # Últimos 30 dias, de todos os passeios
+        inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        fim = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        por_dia = {
+            item['grupo']: item
+            for item in kpi_service.consultar(inicio, fim, agrupar='dia')['grupos']
+        }
         
-        # Últimos 30 dias
         dados_grafico = []
         
         for i in range(30, 0, -1):
-            data = datetime.now() - timedelta(days=i)
-            data_str = data.strftime('%Y-%m-%d')
-            
-            # Buscar passeios para este dia
-            result = paytour.get_passeios(data_de=data_str, data_ate=data_str)
-            passeios_list = result.get('passeios', [])
-            
-            vendas_dia = 0
-            receita_dia = 0
-            
-            for passeio in passeios_list[:5]:  # Limitar para performance
-                passeio_id = passeio.get('id')
-                vendas = paytour.calcular_vendas_estimadas(passeio_id, periodo='dia')
-                vendas_dia += vendas['vagas_vendidas']
-                receita_dia += vendas['receita_estimada']
+            data_str = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+            dia = por_dia.get(data_str, {})
             
             dados_grafico.append({
                 'data': data_str,
-                'vendas': vendas_dia,
-                'receita': round(receita_dia, 2)
+                'vendas': dia.get('vendidas', 0),
+                'receita': dia.get('receita', 0)
             })
         
         return jsonify({
             'success': True,
-            'dados': dados_grafico
+            'dados': dados_grafico,
+            'atualizado_em': atualizado_em
         }), 200
         
     except Exception as e:
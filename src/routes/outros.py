@@ -9,12 +9,17 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.weather_service import WeatherService
 from services.ai_service import AIService
+from services.insights_service import InsightsService
+from services.marketing_service import MarketingService
+from services import dashboard_service
+from services.cache_service import cache_rota
 
 outros_bp = Blueprint('outros', __name__, url_prefix='/api')
 
 # ============= CLIMA =============
 
 @outros_bp.route('/clima/atual', methods=['GET'])
+@cache_rota('clima', ttl=600)
 def clima_atual():
     """Obtém clima atual de Ilhabela"""
     try:
@@ -34,6 +39,7 @@ def clima_atual():
         }), 500
 
 @outros_bp.route('/clima/previsao', methods=['GET'])
+@cache_rota('clima', ttl=1800)
 def clima_previsao():
     """Obtém previsão do tempo para os próximos dias"""
     try:
@@ -56,19 +62,20 @@ def clima_previsao():
         }), 500
 
 @outros_bp.route('/clima/analise', methods=['GET'])
+@cache_rota('clima', ttl=600)
 def clima_analise():
     """Analisa impacto do clima nas vendas"""
     try:
         dias = request.args.get('dias', 7, type=int)
         dias = min(dias, 7)
         
-        weather = WeatherService()
-        previsao = weather.get_forecast(days=dias)
-        impactos = weather.analyze_impact(previsao)
+        # Narrativa de IA pré-calculada (somente se ainda condizente com a previsão)
+        impactos, narrativa = dashboard_service.analise_clima(WeatherService(), dias)
         
         return jsonify({
             'success': True,
-            'analise': impactos
+            'analise': impactos,
+            'narrativa': narrativa
         }), 200
         
     except Exception as e:
@@ -95,7 +102,7 @@ def baleias_info():
         Seja objetivo e informativo.
         """
         
-        info = ai_service.generate_text(prompt)
+        info = ai_service.generate_text(prompt, tarefa='pesquisa_baleias')
         
         return jsonify({
             'success': True,
@@ -115,19 +122,7 @@ def baleias_info():
 def marketing_campanhas():
     """Lista campanhas de marketing"""
     try:
-        campanhas = [
-            {
-                'id': 1,
-                'nome': 'Campanha Verão 2024',
-                'plataforma': 'Google Ads',
-                'status': 'ativa',
-                'impressoes': 15420,
-                'cliques': 892,
-                'conversoes': 45,
-                'investimento': 1250.00,
-                'retorno': 4500.00
-            }
-        ]
+        campanhas = MarketingService().listar_campanhas()
         
         return jsonify({
             'success': True,
@@ -139,3 +134,43 @@ def marketing_campanhas():
             'success': False,
             'error': str(e)
         }), 500
+
+@outros_bp.route('/marketing/analise', methods=['GET'])
+def marketing_analise():
+    """Análise das campanhas de marketing com IA (pré-calculada diariamente)"""
+    try:
+        forcar = request.args.get('forcar', 'false').lower() == 'true'
+        
+        marketing = MarketingService()
+        google_ads = marketing.campanhas_por_plataforma('Google Ads')
+        meta_ads = marketing.campanhas_por_plataforma('Meta Ads')
+        campanhas = google_ads + meta_ads
+        
+        metricas = {
+            'investimento': sum(c.get('investimento', 0) for c in campanhas),
+            'retorno': sum(c.get('retorno', 0) for c in campanhas),
+            'conversoes': sum(c.get('conversoes', 0) for c in campanhas)
+        }
+        
+        insight = InsightsService().obter_ou_gerar(
+            'analise_campanhas',
+            'atual',
+            campanhas,
+            metricas,
+            lambda: AIService().analisar_campanhas_marketing(google_ads, meta_ads),
+            forcar=forcar
+        )
+        
+        return jsonify({
+            'success': True,
+            'analise': insight['conteudo'],
+            'gerado_em': insight['gerado_em'],
+            'pre_calculado': insight['pre_calculado']
+        }), 200
+        
+    except Exception as e:
+        print(f"Erro ao analisar campanhas: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
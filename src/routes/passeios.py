@@ -10,10 +10,13 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.paytour_service import PaytourService
+from services import dashboard_service, kpi_service
+from services.cache_service import cache_rota
 
 passeios_bp = Blueprint('passeios', __name__, url_prefix='/api/passeios')
 
 @passeios_bp.route('/', methods=['GET'])
+@cache_rota('passeios', ttl=300)
 def listar_passeios():
     """Lista todos os passeios disponíveis da API Paytour"""
     try:
@@ -100,6 +103,7 @@ def disponibilidade_passeio(passeio_id):
         }), 500
 
 @passeios_bp.route('/resumo', methods=['GET'])
+@cache_rota('passeios', ttl=300, versao=kpi_service.versao)
 def resumo_passeios():
     """Retorna resumo de todos os passeios com disponibilidade (dia/semana/mês)"""
     try:
@@ -112,30 +116,16 @@ def resumo_passeios():
         result = paytour.get_passeios(data_de=hoje, data_ate=um_mes)
         passeios_list = result.get('passeios', [])
         
-        # Processar resumo com disponibilidade
-        resumo = []
-        
-        for passeio in passeios_list:  # Processar todos os passeios
-            passeio_id = passeio.get('id')
-            
-            # Buscar disponibilidade
-            disp = paytour.get_disponibilidade_resumo(passeio_id)
-            
-            resumo.append({
-                'id': passeio_id,
-                'titulo': passeio.get('nome', passeio.get('titulo', 'Sem título')),
-                'preco': float(passeio.get('preco_exibicao', 0)),
-                'icone': passeio.get('icone', 'ship'),
-                'foto': passeio.get('foto_capa', ''),
-                'url': passeio.get('url', ''),
-                'vagas_dia': disp.get('vagas_dia', 0),
-                'vagas_semana': disp.get('vagas_semana', 0),
-                'vagas_mes': disp.get('vagas_mes', 0)
-            })
+        # Vagas lidas do cubo de KPIs (Paytour só para passeios ainda não ingeridos)
+        resumo, do_cubo = dashboard_service.resumo_passeios(paytour, passeios_list)
+        
+        # Vagas do cubo valem a partir da última ingestão; as da Paytour, agora
+        ingestao = kpi_service.ultima_ingestao() if do_cubo else None
         
         return jsonify({
             'success': True,
-            'passeios': resumo
+            'passeios': resumo,
+            'atualizado_em': ingestao['concluido_em'] if ingestao else datetime.now().isoformat(timespec='seconds')
         }), 200
         
     except Exception as e:
@@ -2,15 +2,146 @@
 Serviço de integração com OpenAI para funcionalidades de IA
 """
 import os
+import threading
+import httpx
 from openai import OpenAI
 from dotenv import load_dotenv
+from services.prompt_service import formatar_dados
+from services.rate_limiter import RateLimiter
 
 load_dotenv()
 
+# Modelos por perfil: tarefas curtas/estruturadas usam o modelo rápido,
+# análises longas usam o modelo maior
+MODELOS = {
+    'rapido': os.getenv('OPENAI_MODEL_RAPIDO', 'gpt-4o-mini'),
+    'analise': os.getenv('OPENAI_MODEL_ANALISE', 'gpt-4o'),
+}
+
+# Configuração por tarefa: perfil do modelo, max_tokens, timeout (s) e temperatura
+TAREFAS = {
+    'texto': {'perfil': 'rapido', 'max_tokens': 600, 'timeout': 30, 'temperature': 0.7},
+    'campanha_email': {'perfil': 'rapido', 'max_tokens': 900, 'timeout': 30, 'temperature': 0.7},
+    'campanha_whatsapp': {'perfil': 'rapido', 'max_tokens': 700, 'timeout': 30, 'temperature': 0.7},
+    'pesquisa_baleias': {'perfil': 'rapido', 'max_tokens': 1200, 'timeout': 45, 'temperature': 0.3},
+    'analise_dados': {'perfil': 'analise', 'max_tokens': 1500, 'timeout': 90, 'temperature': 0.5},
+    'analise_vendas': {'perfil': 'analise', 'max_tokens': 1500, 'timeout': 90, 'temperature': 0.5},
+    'impacto_clima': {'perfil': 'analise', 'max_tokens': 1200, 'timeout': 60, 'temperature': 0.6},
+    'analise_campanhas': {'perfil': 'analise', 'max_tokens': 1800, 'timeout': 90, 'temperature': 0.6},
+}
+
+# Limites compartilhados por todas as chamadas do processo
+LIMITE_REQUISICOES_MINUTO = int(os.getenv('OPENAI_REQUISICOES_MINUTO', 60))
+MAX_CHAMADAS_SIMULTANEAS = int(os.getenv('OPENAI_MAX_SIMULTANEAS', 8))
+
+SYSTEM_PADRAO = "Você é um assistente especializado em turismo para a Maremar Turismo em Ilhabela."
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+_rate_limiter = RateLimiter(LIMITE_REQUISICOES_MINUTO)
+_semaforo = threading.BoundedSemaphore(MAX_CHAMADAS_SIMULTANEAS)
+
+
+def get_openai_client():
+    """
+    Retorna o cliente OpenAI compartilhado pelo processo
+
+    O cliente mantém um pool HTTP com keep-alive, evitando um novo
+    handshake TLS a cada requisição. É recriado após fork (workers gunicorn).
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv('OPENAI_MAX_CONEXOES', 20)),
+                    max_keepalive_connections=int(os.getenv('OPENAI_MAX_KEEPALIVE', 10)),
+                    keepalive_expiry=60
+                ),
+                timeout=httpx.Timeout(90, connect=5)
+            )
+            _client = OpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                http_client=http_client,
+                max_retries=int(os.getenv('OPENAI_MAX_RETRIES', 2))
+            )
+            _client_pid = pid
+
+    return _client
+
+
 class AIService:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = get_openai_client()
         
+    def gerar(self, tarefa, prompt, system=None, temperature=None):
+        """
+        Ponto único de geração de texto
+
+        Args:
+            tarefa: Chave em TAREFAS (define modelo, max_tokens e timeout)
+            prompt: Conteúdo da mensagem do usuário
+            system: Mensagem de sistema (opcional)
+            temperature: Sobrescreve a temperatura padrão da tarefa
+        """
+        config = TAREFAS.get(tarefa, TAREFAS['texto'])
+
+        if not _rate_limiter.aguardar(timeout=config['timeout']):
+            raise TimeoutError("Limite de requisições à OpenAI atingido")
+
+        with _semaforo:
+            response = self.client.chat.completions.create(
+                model=MODELOS[config['perfil']],
+                messages=[
+                    {"role": "system", "content": system or SYSTEM_PADRAO},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=config['temperature'] if temperature is None else temperature,
+                max_tokens=config['max_tokens'],
+                timeout=config['timeout']
+            )
+
+        return response.choices[0].message.content
+    
+    def generate_text(self, prompt, tarefa='texto'):
+        """
+        Gera texto livre a partir de um prompt
+
+        Args:
+            prompt: Prompt completo
+            tarefa: Tarefa usada para roteamento de modelo
+        """
+        try:
+            return self.gerar(tarefa, prompt)
+        except Exception as e:
+            print(f"Erro ao gerar texto: {str(e)}")
+            raise
+    
+    def analyze_data(self, dados, prompt):
+        """
+        Gera análise a partir de dados já incorporados ao prompt
+
+        Args:
+            dados: Dados analisados (usados apenas se o prompt estiver vazio)
+            prompt: Prompt de análise
+        """
+        try:
+            return self.gerar(
+                'analise_dados',
+                prompt or f"Analise os seguintes dados:\n{dados}",
+                system="Você é um analista de dados especializado em turismo."
+            )
+        except Exception as e:
+            print(f"Erro ao analisar dados: {str(e)}")
+            raise
+    
     def gerar_campanha_email(self, clientes_data, objetivo):
         """
         Gera conteúdo de campanha de email marketing usando IA
@@ -26,7 +157,7 @@ class AIService:
             Objetivo: {objetivo}
             
             Informações sobre os clientes:
-            {clientes_data}
+            {formatar_dados(clientes_data)}
             
             Por favor, gere:
             1. Assunto do email (atraente e que gere curiosidade)
@@ -36,16 +167,11 @@ class AIService:
             Formato: JSON com as chaves "assunto", "corpo", "segmentacao"
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um especialista em marketing turístico e copywriting."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
+            return self.gerar(
+                'campanha_email',
+                prompt,
+                system="Você é um especialista em marketing turístico e copywriting."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao gerar campanha de email: {str(e)}")
             raise
@@ -65,7 +191,7 @@ class AIService:
             Objetivo: {objetivo}
             
             Informações sobre os clientes:
-            {clientes_data}
+            {formatar_dados(clientes_data)}
             
             Por favor, gere:
             1. Mensagem principal (curta, direta e com emoji apropriado)
@@ -75,32 +201,33 @@ class AIService:
             Formato: JSON com as chaves "mensagem_principal", "variacoes", "horarios_sugeridos"
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um especialista em marketing turístico e comunicação via WhatsApp."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
+            return self.gerar(
+                'campanha_whatsapp',
+                prompt,
+                system="Você é um especialista em marketing turístico e comunicação via WhatsApp."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao gerar campanha de WhatsApp: {str(e)}")
             raise
     
-    def analisar_vendas(self, vendas_data):
+    def analisar_vendas(self, vendas_data, periodo=None):
         """
         Analisa dados de vendas e gera insights usando IA
         
         Args:
             vendas_data: Dados de vendas para análise
+            periodo: Período de referência (dia, semana, mes)
         """
         try:
+            total_receita = sum(
+                item.get('receita', 0) for item in vendas_data if isinstance(item, dict)
+            ) if isinstance(vendas_data, list) else None
+            
             prompt = f"""
-            Analise os seguintes dados de vendas da Maremar Turismo:
+            Analise os seguintes dados de vendas da Maremar Turismo{f' para o período de {periodo}' if periodo else ''}:
             
-            {vendas_data}
+            {formatar_dados(vendas_data, ordenar_por='receita', agrupar_por='passeio')}
+            {f'Receita total: R$ {total_receita:.2f}' if total_receita is not None else ''}
             
             Por favor, forneça:
             1. Principais insights sobre o desempenho
@@ -112,16 +239,11 @@ class AIService:
             Formato: JSON estruturado
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um analista de dados especializado em turismo."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5
+            return self.gerar(
+                'analise_vendas',
+                prompt,
+                system="Você é um analista de dados especializado em turismo."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao analisar vendas: {str(e)}")
             raise
@@ -138,8 +260,10 @@ class AIService:
             prompt = f"""
             Com base nas seguintes informações climáticas e de passeios da Maremar Turismo:
             
-            Clima: {clima_data}
-            Passeios: {passeios_data}
+            Clima:
+            {formatar_dados(clima_data)}
+            Passeios:
+            {formatar_dados(passeios_data)}
             
             Por favor, forneça:
             1. Previsão de impacto do clima em cada passeio
@@ -150,16 +274,11 @@ class AIService:
             Formato: JSON estruturado
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um especialista em turismo e análise de impacto climático em vendas."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6
+            return self.gerar(
+                'impacto_clima',
+                prompt,
+                system="Você é um especialista em turismo e análise de impacto climático em vendas."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao prever impacto do clima: {str(e)}")
             raise
@@ -183,16 +302,11 @@ class AIService:
             Formato: JSON estruturado com dados organizados
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um biólogo marinho especializado em cetáceos e turismo de observação."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
+            return self.gerar(
+                'pesquisa_baleias',
+                prompt,
+                system="Você é um biólogo marinho especializado em cetáceos e turismo de observação."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao pesquisar sobre baleias: {str(e)}")
             raise
@@ -209,8 +323,10 @@ class AIService:
             prompt = f"""
             Analise as seguintes campanhas de marketing da Maremar Turismo:
             
-            Google Ads: {google_ads_data}
-            Meta Ads: {meta_ads_data}
+            Google Ads:
+            {formatar_dados(google_ads_data)}
+            Meta Ads:
+            {formatar_dados(meta_ads_data)}
             
             Por favor, forneça:
             1. Análise de performance de cada campanha
@@ -224,16 +340,11 @@ class AIService:
             Formato: JSON estruturado
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "Você é um especialista em marketing digital e performance de campanhas pagas."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6
+            return self.gerar(
+                'analise_campanhas',
+                prompt,
+                system="Você é um especialista em marketing digital e performance de campanhas pagas."
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             print(f"Erro ao analisar campanhas de marketing: {str(e)}")
             raise
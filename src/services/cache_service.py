@@ -0,0 +1,300 @@
+"""
+Cache de respostas das rotas compartilhado entre os workers
+
+- Armazenado em um SQLite próprio (CACHE_DB_PATH, WAL), separado do app.db
+  para as gravações do cache não disputarem o lock de escrita com os dados
+- cache_rota(grupo, ttl) guarda respostas 200 de GET, com chave formada pela
+  rota, pelos argumentos da query normalizados e pelo escopo (público ou
+  usuário da sessão)
+- Rotas com versão de dados (ex.: última ingestão dos KPIs) incluem a
+  versão na chave: uma resposta calculada antes de uma atualização nunca é
+  servida como se fosse da versão nova
+- Single-flight: no miss, um worker/thread reserva a chave (tabela
+  construcoes) e calcula; os demais esperam a resposta dele por até
+  CACHE_ESPERA_SEGUNDOS em vez de recalcular
+- Tamanho total limitado a CACHE_MAX_MB (remove expirados e, depois, os
+  mais antigos) e respostas maiores que CACHE_MAX_ITEM_KB não são guardadas
+- Jobs de sincronização invalidam os grupos afetados com invalidar()
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from functools import wraps
+from flask import request, session, make_response
+from services.db_service import aplicar_pragmas, BUSY_TIMEOUT_MS
+
+CACHE_DB_PATH = os.getenv(
+    'CACHE_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'cache.db')
+)
+
+ATIVO = os.getenv('CACHE_ROTAS_ATIVO', 'true').lower() == 'true'
+MAX_BYTES = int(os.getenv('CACHE_MAX_MB', 64)) * 1024 * 1024
+MAX_ITEM_BYTES = int(os.getenv('CACHE_MAX_ITEM_KB', 2048)) * 1024
+ESPERA_SEGUNDOS = float(os.getenv('CACHE_ESPERA_SEGUNDOS', 15))
+INTERVALO_ESPERA_SEGUNDOS = 0.05
+
+# Argumentos de controle que não fazem parte da chave
+ARGS_IGNORADOS = {'forcar', '_'}
+
+# Cabeçalhos da resposta original preservados no cache
+CABECALHOS = ['Cache-Control', 'Content-Disposition']
+
+_local = threading.local()
+
+
+def get_conn():
+    """Conexão da thread atual com o banco do cache"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(
+            CACHE_DB_PATH,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        aplicar_pragmas(conn)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def init_db():
+    """Inicializa a tabela de respostas em cache"""
+    try:
+        conn = get_conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                grupo TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                mimetype TEXT,
+                cabecalhos TEXT,
+                corpo BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                expira_em REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_respostas_grupo ON respostas (grupo)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_respostas_criado ON respostas (criado_em)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS construcoes (
+                chave TEXT PRIMARY KEY,
+                expira_em REAL NOT NULL
+            )
+        ''')
+    except Exception as e:
+        print(f"Erro ao inicializar cache de rotas: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+def chave(grupo, escopo='publico', versao=None):
+    """Chave da requisição atual: grupo, rota, query normalizada, escopo e versão dos dados"""
+    args = sorted(
+        (nome, valor)
+        for nome, valores in request.args.lists() if nome not in ARGS_IGNORADOS
+        for valor in valores if valor != ''
+    )
+
+    if escopo == 'usuario':
+        usuario = (session.get('user') or {}).get('email', 'anonimo')
+    else:
+        usuario = 'publico'
+
+    bruta = '|'.join([grupo, request.path, repr(args), usuario, str(versao)])
+    return hashlib.sha1(bruta.encode('utf-8')).hexdigest()
+
+
+def buscar(chave_cache):
+    """(status, mimetype, cabeçalhos, corpo) da resposta em cache ainda válida, ou None"""
+    row = get_conn().execute(
+        'SELECT status, mimetype, cabecalhos, corpo FROM respostas WHERE chave = ? AND expira_em > ?',
+        (chave_cache, time.time())
+    ).fetchone()
+    if not row:
+        return None
+    status, mimetype, cabecalhos, corpo = row
+    return status, mimetype, json.loads(cabecalhos or '{}'), corpo
+
+
+def gravar(chave_cache, grupo, ttl, status, mimetype, cabecalhos, corpo):
+    """Guarda uma resposta e mantém o total dentro de MAX_BYTES"""
+    if len(corpo) > MAX_ITEM_BYTES:
+        return False
+
+    agora = time.time()
+    conn = get_conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            INSERT OR REPLACE INTO respostas (
+                chave, grupo, status, mimetype, cabecalhos, corpo, tamanho, criado_em, expira_em
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            chave_cache, grupo, status, mimetype, json.dumps(cabecalhos), corpo, len(corpo), agora, agora + ttl
+        ))
+        _limitar_tamanho(conn, agora)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return True
+
+
+def _limitar_tamanho(conn, agora):
+    total = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM respostas').fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+
+    conn.execute('DELETE FROM respostas WHERE expira_em <= ?', (agora,))
+    excesso = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM respostas').fetchone()[0] - MAX_BYTES
+
+    # Remove as mais antigas até caber
+    removidas = []
+    for chave_antiga, tamanho in conn.execute('SELECT chave, tamanho FROM respostas ORDER BY criado_em'):
+        if excesso <= 0:
+            break
+        removidas.append((chave_antiga,))
+        excesso -= tamanho
+    conn.executemany('DELETE FROM respostas WHERE chave = ?', removidas)
+
+
+def reservar(chave_cache):
+    """
+    Reserva o cálculo da resposta de uma chave (single-flight entre workers)
+
+    Returns:
+        True se esta requisição deve calcular; False se outra já está
+        calculando (reserva ainda válida)
+    """
+    agora = time.time()
+    cursor = get_conn().execute('''
+        INSERT INTO construcoes (chave, expira_em) VALUES (?, ?)
+        ON CONFLICT(chave) DO UPDATE SET expira_em = excluded.expira_em
+        WHERE construcoes.expira_em <= ?
+    ''', (chave_cache, agora + ESPERA_SEGUNDOS, agora))
+    return cursor.rowcount == 1
+
+
+def liberar(chave_cache):
+    """Remove a reserva de cálculo da chave"""
+    get_conn().execute('DELETE FROM construcoes WHERE chave = ?', (chave_cache,))
+
+
+def aguardar(chave_cache):
+    """
+    Espera a resposta que outro worker está calculando
+
+    Returns:
+        A resposta guardada, ou None se a reserva terminou (ou expirou) sem
+        gravar nada
+    """
+    conn = get_conn()
+    limite = time.time() + ESPERA_SEGUNDOS
+    while time.time() < limite:
+        time.sleep(INTERVALO_ESPERA_SEGUNDOS)
+        guardada = buscar(chave_cache)
+        if guardada:
+            return guardada
+        reservada = conn.execute(
+            'SELECT 1 FROM construcoes WHERE chave = ? AND expira_em > ?', (chave_cache, time.time())
+        ).fetchone()
+        if not reservada:
+            return None
+    return None
+
+
+def invalidar(*grupos):
+    """Remove as respostas dos grupos informados (todas, se nenhum); retorna a quantidade"""
+    conn = get_conn()
+    if grupos:
+        marcadores = ', '.join('?' for _ in grupos)
+        cursor = conn.execute(f'DELETE FROM respostas WHERE grupo IN ({marcadores})', grupos)
+    else:
+        cursor = conn.execute('DELETE FROM respostas')
+    return cursor.rowcount
+
+
+def invalidar_seguro(*grupos):
+    """invalidar() sem propagar erros (para jobs, onde o cache é secundário)"""
+    try:
+        return invalidar(*grupos)
+    except Exception as e:
+        print(f"Erro ao invalidar cache ({', '.join(grupos) or 'todos'}): {str(e)}")
+        return 0
+
+
+def cache_rota(grupo, ttl=60, escopo='publico', versao=None):
+    """
+    Decorator que serve a resposta de um GET do cache compartilhado
+
+    Args:
+        grupo: Nome usado na invalidação (ex.: 'financeiro', 'clima')
+        ttl: Validade em segundos
+        escopo: 'publico' (mesma resposta para todos) ou 'usuario' (por
+            usuário da sessão)
+        versao: Função opcional, somente leitura, com a versão dos dados da
+            rota (entra na chave)
+
+    A query ?forcar=true ignora a resposta guardada e grava a nova. O
+    cabeçalho X-Cache indica HIT ou MISS. Misses simultâneos da mesma chave
+    são calculados uma só vez; as demais requisições esperam a resposta.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not ATIVO or request.method != 'GET':
+                return f(*args, **kwargs)
+
+            reservada = False
+            try:
+                chave_cache = chave(grupo, escopo, versao() if versao else None)
+                forcar = request.args.get('forcar', 'false').lower() == 'true'
+                guardada = None if forcar else buscar(chave_cache)
+                if guardada is None and not forcar:
+                    reservada = reservar(chave_cache)
+                    if not reservada:
+                        # Outro worker está calculando esta resposta
+                        guardada = aguardar(chave_cache)
+            except Exception as e:
+                print(f"Erro ao ler cache de rotas: {str(e)}")
+                return f(*args, **kwargs)
+
+            if guardada:
+                status, mimetype, cabecalhos, corpo = guardada
+                response = make_response(corpo, status)
+                response.mimetype = mimetype
+                response.headers.update(cabecalhos)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            try:
+                response = make_response(f(*args, **kwargs))
+                response.headers['X-Cache'] = 'MISS'
+
+                if response.status_code == 200 and not response.direct_passthrough:
+                    try:
+                        cabecalhos = {nome: response.headers[nome] for nome in CABECALHOS if nome in response.headers}
+                        gravar(
+                            chave_cache, grupo, ttl, response.status_code, response.mimetype, cabecalhos,
+                            response.get_data()
+                        )
+                    except Exception as e:
+                        print(f"Erro ao gravar cache de rotas: {str(e)}")
+            finally:
+                if reservada:
+                    try:
+                        liberar(chave_cache)
+                    except Exception as e:
+                        print(f"Erro ao liberar reserva do cache de rotas: {str(e)}")
+
+            return response
+        return decorated_function
+    return decorator
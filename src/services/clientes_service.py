@@ -0,0 +1,673 @@
+"""
+Regras de consulta e normalização dos clientes do CRM
+"""
+import io
+import re
+import csv
+import json
+import time
+import base64
+from datetime import datetime, timedelta, timezone
+from services.db_service import get_conn, nova_conexao, transacao, fts_disponivel, normalizar_email
+from services import rfm_service
+
+# Busca composta só por dígitos e pontuação de telefone/CPF
+_PADRAO_NUMERICO = re.compile(r'[\d\s().+/-]+')
+
+
+def somente_digitos(valor):
+    """Remove tudo que não for dígito (telefones, CPFs)"""
+    return re.sub(r'\D', '', valor or '')
+
+
+def montar_consulta_fts(busca):
+    """
+    Converte o texto digitado em uma expressão MATCH do FTS5
+
+    - Telefones/CPFs (com ou sem pontuação) buscam por prefixo na coluna
+      de dígitos normalizados
+    - Demais textos viram termos com prefixo ("joa" encontra "João"),
+      combinados com AND
+
+    Retorna None quando não há termos pesquisáveis.
+    """
+    busca = (busca or '').strip()
+
+    if _PADRAO_NUMERICO.fullmatch(busca):
+        digitos = somente_digitos(busca)
+        if len(digitos) >= 3:
+            return f'documentos : "{digitos}"*'
+
+    termos = re.findall(r'\w+', busca)
+    if not termos:
+        return None
+
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+# ============= LISTAGEM =============
+
+# Colunas aceitas para ordenação (todas cobertas por índices (status, coluna, id))
+ORDENACOES = ['data_cadastro', 'ultima_compra', 'total_compras', 'valor_total', 'nome']
+
+# Colunas que podem conter NULL e exigem tratamento especial no keyset
+ORDENACOES_ANULAVEIS = ['ultima_compra']
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 500
+
+# Contagens por filtro mantidas em memória por alguns segundos
+TTL_CONTAGEM = 60
+_contagens = {}
+
+
+def codificar_cursor(valores):
+    """Codifica a posição da página em um token opaco"""
+    texto = json.dumps(valores, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, tamanho):
+    """
+    Decodifica um token gerado por codificar_cursor
+
+    Raises:
+        ValueError: token malformado ou que não é uma lista de `tamanho`
+            valores simples
+    """
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento).decode('utf-8'))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+
+    if (
+        not isinstance(valores, list)
+        or len(valores) != tamanho
+        or not all(v is None or isinstance(v, (str, int, float)) for v in valores)
+    ):
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def filtro_clientes(status=None, busca=''):
+    """
+    Cláusula WHERE (alias c) para status + busca textual
+
+    Returns:
+        (sql, params, consulta_fts)
+    """
+    condicoes = []
+    params = []
+
+    if status:
+        condicoes.append('c.status = ?')
+        params.append(status)
+
+    consulta_fts = montar_consulta_fts(busca) if busca and fts_disponivel() else None
+
+    if consulta_fts:
+        condicoes.append('c.id IN (SELECT rowid FROM clientes_fts WHERE clientes_fts MATCH ?)')
+        params.append(consulta_fts)
+    elif busca:
+        condicoes.append('(c.nome LIKE ? OR c.email LIKE ? OR c.telefone LIKE ?)')
+        params.extend([f'%{busca}%', f'%{busca}%', f'%{busca}%'])
+
+    sql = ' AND '.join(condicoes) if condicoes else '1 = 1'
+    return sql, params, consulta_fts
+
+
+def _condicao_keyset(coluna, descendente, valor, ultimo_id):
+    """
+    Condição que posiciona a consulta logo após (valor, ultimo_id)
+
+    O SQLite ordena NULL como o menor valor: no fim das páginas
+    descendentes e no início das ascendentes.
+    """
+    anulavel = coluna in ORDENACOES_ANULAVEIS
+
+    if descendente:
+        if valor is None:
+            return f'(c.{coluna} IS NULL AND c.id < ?)', [ultimo_id]
+        sql = f'(c.{coluna}, c.id) < (?, ?)'
+        if anulavel:
+            sql = f'({sql} OR c.{coluna} IS NULL)'
+        return sql, [valor, ultimo_id]
+
+    if valor is None:
+        return f'((c.{coluna} IS NULL AND c.id > ?) OR c.{coluna} IS NOT NULL)', [ultimo_id]
+    return f'(c.{coluna}, c.id) > (?, ?)', [valor, ultimo_id]
+
+
+def contar_clientes(status=None, busca=''):
+    """Total de clientes do filtro, reaproveitado por TTL_CONTAGEM segundos"""
+    chave = (status, busca)
+    agora = time.monotonic()
+    em_cache = _contagens.get(chave)
+
+    if em_cache and agora - em_cache[1] < TTL_CONTAGEM:
+        return em_cache[0]
+
+    where, params, _ = filtro_clientes(status, busca)
+    total = get_conn().execute(f'SELECT COUNT(*) FROM clientes c WHERE {where}', params).fetchone()[0]
+
+    if len(_contagens) > 256:
+        _contagens.clear()
+    _contagens[chave] = (total, agora)
+
+    return total
+
+
+def listar_clientes(status='ativo', busca='', ordem=None, direcao='desc', cursor=None, limite=LIMITE_PADRAO):
+    """
+    Página de clientes com paginação por cursor (keyset)
+
+    Args:
+        status: Filtro de status
+        busca: Texto da busca
+        ordem: Coluna de ORDENACOES ou 'relevancia' (padrão com busca)
+        direcao: 'asc' ou 'desc'
+        cursor: Token retornado na página anterior
+        limite: Tamanho da página (máximo LIMITE_MAXIMO)
+
+    Returns:
+        dict com rows, proximo_cursor e ordem efetiva
+    """
+    limite = max(1, min(int(limite or LIMITE_PADRAO), LIMITE_MAXIMO))
+    descendente = (direcao or 'desc').lower() != 'asc'
+    where, params, consulta_fts = filtro_clientes(status, busca)
+
+    if not ordem:
+        ordem = 'relevancia' if consulta_fts else 'data_cadastro'
+
+    if ordem == 'relevancia' and consulta_fts:
+        # Relevância muda a cada busca: paginação por deslocamento
+        deslocamento = decodificar_cursor(cursor, 1)[0] if cursor else 0
+        if not isinstance(deslocamento, int) or isinstance(deslocamento, bool) or deslocamento < 0:
+            raise ValueError('Cursor inválido')
+        rows = get_conn().execute(f'''
+            SELECT c.* FROM clientes_fts f
+            JOIN clientes c ON c.id = f.rowid
+            WHERE clientes_fts MATCH ? AND {where}
+            ORDER BY f.rank
+            LIMIT ? OFFSET ?
+        ''', [consulta_fts] + params + [limite + 1, int(deslocamento)]).fetchall()
+
+        proximo = codificar_cursor([int(deslocamento) + limite]) if len(rows) > limite else None
+        return {'rows': rows[:limite], 'proximo_cursor': proximo, 'ordem': 'relevancia'}
+
+    if ordem not in ORDENACOES:
+        raise ValueError(f"Ordenação inválida: {ordem}")
+
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor, 2)
+        if not isinstance(ultimo_id, int) or isinstance(ultimo_id, bool):
+            raise ValueError('Cursor inválido')
+        condicao, params_cursor = _condicao_keyset(ordem, descendente, valor, ultimo_id)
+        where = f'{where} AND {condicao}'
+        params = params + params_cursor
+
+    sentido = 'DESC' if descendente else 'ASC'
+    rows = get_conn().execute(f'''
+        SELECT c.* FROM clientes c
+        WHERE {where}
+        ORDER BY c.{ordem} {sentido}, c.id {sentido}
+        LIMIT ?
+    ''', params + [limite + 1]).fetchall()
+
+    proximo = None
+    if len(rows) > limite:
+        ultimo = rows[limite - 1]
+        proximo = codificar_cursor([ultimo[ordem], ultimo['id']])
+
+    return {'rows': rows[:limite], 'proximo_cursor': proximo, 'ordem': ordem}
+
+
+def cliente_para_dict(row):
+    """Converte uma linha de clientes no formato retornado pela API"""
+    return {
+        'id': row['id'],
+        'nome': row['nome'],
+        'email': row['email'],
+        'telefone': row['telefone'],
+        'cpf': row['cpf'],
+        'data_nascimento': row['data_nascimento'],
+        'cidade': row['cidade'],
+        'estado': row['estado'],
+        'origem': row['origem'],
+        'data_cadastro': row['data_cadastro'],
+        'ultima_compra': row['ultima_compra'],
+        'total_compras': row['total_compras'],
+        'valor_total': row['valor_total'],
+        'status': row['status']
+    }
+
+
+# ============= LOG DE ALTERAÇÕES =============
+
+LIMITE_ALTERACOES = 1000
+
+# Entradas do log mais antigas que isso são removidas por limpar_alteracoes
+RETENCAO_ALTERACOES_DIAS = 7
+
+
+class CursorExpirado(Exception):
+    """O cursor aponta para alterações já removidas do log"""
+
+
+def cursor_atual():
+    """Último seq do log de alterações (ponto de partida após leitura completa)"""
+    row = get_conn().execute('SELECT coalesce(MAX(seq), 0) FROM clientes_changelog').fetchone()
+    return row[0]
+
+
+def versao():
+    """
+    Versão dos dados de clientes para o ETag: último seq do log de alterações
+    e a data de hoje (faixas de inatividade e novos do mês andam com o dia)
+    """
+    return f"{cursor_atual()}:{datetime.now().date().isoformat()}"
+
+
+def alteracoes_desde(cursor, limite=LIMITE_ALTERACOES):
+    """
+    Alterações de clientes após o cursor, com o estado atual de cada cliente
+
+    Várias alterações do mesmo cliente na página viram uma só (a última);
+    clientes removidos vêm com operacao 'D' e cliente None.
+
+    Raises:
+        CursorExpirado: o log já não contém as alterações seguintes ao cursor
+    """
+    conn = get_conn()
+
+    minimo = conn.execute('SELECT MIN(seq) FROM clientes_changelog').fetchone()[0]
+    if minimo is not None and cursor < minimo - 1:
+        raise CursorExpirado(f'Cursor {cursor} anterior ao log retido (início em {minimo})')
+
+    eventos = conn.execute(
+        'SELECT seq, cliente_id, operacao FROM clientes_changelog WHERE seq > ? ORDER BY seq LIMIT ?',
+        (cursor, limite)
+    ).fetchall()
+
+    if not eventos:
+        return {'alteracoes': [], 'cursor': cursor, 'tem_mais': False}
+
+    ultimos = {}
+    inseridos = set()
+    for evento in eventos:
+        if evento['operacao'] == 'I':
+            inseridos.add(evento['cliente_id'])
+        ultimos[evento['cliente_id']] = evento
+
+    ids = [cliente_id for cliente_id, evento in ultimos.items() if evento['operacao'] != 'D']
+    atuais = {}
+    for inicio in range(0, len(ids), 500):
+        parte = ids[inicio:inicio + 500]
+        marcadores = ','.join('?' * len(parte))
+        for row in conn.execute(f'SELECT * FROM clientes WHERE id IN ({marcadores})', parte):
+            atuais[row['id']] = row
+
+    alteracoes = []
+    for cliente_id, evento in sorted(ultimos.items(), key=lambda item: item[1]['seq']):
+        row = atuais.get(cliente_id)
+        if row is None:
+            operacao = 'D'
+        else:
+            operacao = 'I' if cliente_id in inseridos else 'U'
+        alteracoes.append({
+            'seq': evento['seq'],
+            'operacao': operacao,
+            'cliente_id': cliente_id,
+            'cliente': cliente_para_dict(row) if row is not None else None
+        })
+
+    return {
+        'alteracoes': alteracoes,
+        'cursor': eventos[-1]['seq'],
+        'tem_mais': len(eventos) == limite
+    }
+
+
+def limpar_alteracoes(dias=RETENCAO_ALTERACOES_DIAS):
+    """Remove entradas antigas do log (mantém sempre a última)"""
+    with transacao() as conn:
+        cursor = conn.execute('''
+            DELETE FROM clientes_changelog
+            WHERE alterado_em < datetime('now', ?)
+            AND seq < (SELECT MAX(seq) FROM clientes_changelog)
+        ''', (f'-{int(dias)} days',))
+        return cursor.rowcount
+
+
+# ============= IMPORTAÇÃO EM LOTE =============
+
+CAMPOS_IMPORTACAO = ['nome', 'email', 'telefone', 'cpf', 'data_nascimento', 'cidade', 'estado', 'origem', 'observacoes']
+
+TAMANHO_LOTE_IMPORTACAO = 5000
+MAX_ERROS_RETORNADOS = 1000
+
+_PADRAO_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Campos vazios no arquivo não apagam dados existentes
+SQL_UPSERT_IMPORTACAO = '''
+    INSERT INTO clientes (nome, email, telefone, cpf, data_nascimento, cidade, estado, origem, observacoes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(email) DO UPDATE SET
+        nome = excluded.nome,
+        telefone = coalesce(nullif(excluded.telefone, ''), clientes.telefone),
+        cpf = coalesce(nullif(excluded.cpf, ''), clientes.cpf),
+        data_nascimento = coalesce(nullif(excluded.data_nascimento, ''), clientes.data_nascimento),
+        cidade = coalesce(nullif(excluded.cidade, ''), clientes.cidade),
+        estado = coalesce(nullif(excluded.estado, ''), clientes.estado),
+        observacoes = coalesce(nullif(excluded.observacoes, ''), clientes.observacoes)
+'''
+
+
+def ler_csv(arquivo_texto):
+    """
+    Lê um CSV linha a linha (separador ',' ou ';' detectado no cabeçalho)
+
+    Yields:
+        (número da linha, dict da linha)
+    """
+    cabecalho = arquivo_texto.readline()
+    if not cabecalho:
+        return
+
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    colunas = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=separador))]
+
+    for numero, valores in enumerate(csv.reader(arquivo_texto, delimiter=separador), start=2):
+        if not any(valores):
+            continue
+        yield numero, dict(zip(colunas, valores))
+
+
+def ler_ndjson(arquivo_texto):
+    """
+    Lê um arquivo NDJSON (um objeto JSON por linha)
+
+    Yields:
+        (número da linha, dict da linha ou mensagem de erro)
+    """
+    for numero, linha in enumerate(arquivo_texto, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield numero, 'JSON inválido'
+            continue
+        yield numero, registro if isinstance(registro, dict) else 'Linha não é um objeto JSON'
+
+
+def _texto_limpo(valor):
+    if valor is None:
+        return ''
+    return str(valor).strip()
+
+
+def validar_linha_importacao(registro):
+    """
+    Normaliza e valida uma linha de importação
+
+    Returns:
+        (tupla de parâmetros, None) ou (None, mensagem de erro)
+    """
+    if not isinstance(registro, dict):
+        return None, registro
+
+    valores = {campo: _texto_limpo(registro.get(campo)) for campo in CAMPOS_IMPORTACAO}
+    valores['email'] = normalizar_email(valores['email'])
+
+    if not valores['nome']:
+        return None, 'Nome é obrigatório'
+    if not valores['email']:
+        return None, 'Email é obrigatório'
+    if not _PADRAO_EMAIL.match(valores['email']):
+        return None, 'Email inválido'
+
+    valores['origem'] = valores['origem'] or 'importacao'
+    return tuple(valores[campo] for campo in CAMPOS_IMPORTACAO), None
+
+
+def importar_clientes(linhas):
+    """
+    Insere/atualiza clientes em transações de TAMANHO_LOTE_IMPORTACAO linhas
+
+    Args:
+        linhas: Iterável de (número da linha, dict)
+
+    Returns:
+        Relatório com inseridos, atualizados, erros por linha e vazão
+    """
+    inicio = time.time()
+    relatorio = {'linhas': 0, 'inseridos': 0, 'atualizados': 0, 'total_erros': 0, 'erros': []}
+    lote = []
+
+    def gravar(lote):
+        with transacao() as conn:
+            maior_id = conn.execute('SELECT coalesce(max(id), 0) FROM clientes').fetchone()[0]
+            conn.executemany(SQL_UPSERT_IMPORTACAO, lote)
+            inseridos = conn.execute('SELECT COUNT(*) FROM clientes WHERE id > ?', (maior_id,)).fetchone()[0]
+        relatorio['inseridos'] += inseridos
+        relatorio['atualizados'] += len(lote) - inseridos
+
+    for numero, registro in linhas:
+        relatorio['linhas'] += 1
+        parametros, erro = validar_linha_importacao(registro)
+
+        if erro:
+            relatorio['total_erros'] += 1
+            if len(relatorio['erros']) < MAX_ERROS_RETORNADOS:
+                relatorio['erros'].append({'linha': numero, 'erro': erro})
+            continue
+
+        lote.append(parametros)
+        if len(lote) >= TAMANHO_LOTE_IMPORTACAO:
+            gravar(lote)
+            lote = []
+
+    if lote:
+        gravar(lote)
+
+    duracao = time.time() - inicio
+    relatorio['duracao_segundos'] = round(duracao, 2)
+    relatorio['linhas_por_segundo'] = round(relatorio['linhas'] / duracao, 1) if duracao > 0 else 0
+
+    return relatorio
+
+
+# ============= PÚBLICOS E EXPORTAÇÃO =============
+
+# Públicos de campanha: condição SQL (alias c) aplicada sobre clientes
+PUBLICOS = {
+    'inativos': "(c.ultima_compra IS NULL OR datetime(c.ultima_compra) < datetime('now', '-60 days'))",
+    'vips': 'c.total_compras >= 5',
+    'todos': "c.status = 'ativo'",
+}
+
+
+def publicos_disponiveis():
+    """Públicos fixos + segmentos RFM"""
+    return list(PUBLICOS) + rfm_service.SEGMENTOS
+
+
+def publico_valido(publico):
+    """Indica se o público existe (fixo ou segmento RFM)"""
+    return publico in PUBLICOS or publico in rfm_service.SEGMENTOS
+
+
+def condicao_publico(publico):
+    """Predicado SQL (alias c) de um público fixo ou segmento RFM"""
+    if publico in rfm_service.SEGMENTOS:
+        # Nome já validado contra a lista de segmentos
+        return f"c.id IN (SELECT cliente_id FROM clientes_rfm WHERE segmento = '{publico}')"
+    return PUBLICOS.get(publico, PUBLICOS['todos'])
+
+
+def resolver_publico(publico, tamanho_bloco=1000, status='ativo'):
+    """
+    Gera os destinatários de um público em blocos (keyset por id)
+
+    Cada bloco é uma lista de linhas com id, nome, email, telefone e cidade;
+    só um bloco fica em memória por vez.
+    """
+    condicao = condicao_publico(publico)
+    ultimo_id = 0
+
+    while True:
+        bloco = get_conn().execute(f'''
+            SELECT c.id, c.nome, c.email, c.telefone, c.cidade FROM clientes c
+            WHERE c.status = ? AND c.id > ? AND {condicao}
+            ORDER BY c.id LIMIT ?
+        ''', (status, ultimo_id, tamanho_bloco)).fetchall()
+
+        if not bloco:
+            break
+
+        yield bloco
+        ultimo_id = bloco[-1]['id']
+
+
+CAMPOS_EXPORTACAO = [
+    'id', 'nome', 'email', 'telefone', 'cpf', 'data_nascimento', 'cidade', 'estado', 'origem',
+    'data_cadastro', 'ultima_compra', 'total_compras', 'valor_total', 'status', 'observacoes'
+]
+
+TAMANHO_BLOCO_EXPORTACAO = 1000
+
+
+def exportar_clientes(formato='csv', status='ativo', busca='', publico=None):
+    """
+    Gera o arquivo de exportação em blocos, lendo o cursor aos poucos
+
+    Usa uma conexão dedicada, fechada ao fim do streaming, para não manter
+    aberta a leitura da conexão compartilhada da thread.
+    """
+    where, params, _ = filtro_clientes(status, busca)
+    if publico:
+        where = f'{where} AND {condicao_publico(publico)}'
+
+    conn = nova_conexao()
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join('c.' + campo for campo in CAMPOS_EXPORTACAO)} FROM clientes c WHERE {where} ORDER BY c.id",
+            params
+        )
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+
+        if formato == 'csv':
+            escritor.writerow(CAMPOS_EXPORTACAO)
+
+        while True:
+            rows = cursor.fetchmany(TAMANHO_BLOCO_EXPORTACAO)
+            if not rows:
+                break
+
+            if formato == 'csv':
+                escritor.writerows(tuple(row) for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(CAMPOS_EXPORTACAO, row)), ensure_ascii=False))
+                    buffer.write('\n')
+
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+# ============= ESTATÍSTICAS (contadores) =============
+
+DIAS_INATIVIDADE = 60
+FAIXAS_INATIVIDADE = [30, 60, 90, 180, 365]
+
+
+def _data_limite(dias):
+    """Data (UTC, como CURRENT_TIMESTAMP) de N dias atrás"""
+    return (datetime.now(timezone.utc).date() - timedelta(days=dias)).isoformat()
+
+
+def _contador(chave):
+    row = get_conn().execute('SELECT valor FROM crm_contadores WHERE chave = ?', (chave,)).fetchone()
+    return row[0] if row else 0
+
+
+def _somar_contadores(inicio, fim):
+    """Soma dos contadores com chave no intervalo [inicio, fim)"""
+    row = get_conn().execute(
+        'SELECT coalesce(SUM(valor), 0) FROM crm_contadores WHERE chave >= ? AND chave < ?',
+        (inicio, fim)
+    ).fetchone()
+    return row[0]
+
+
+def _contadores_prefixo(prefixo, limite=None, ordenar_por_valor=True):
+    """Contadores de uma dimensão (ex.: 'cidade:ativo:') como lista (nome, valor)"""
+    ordem = 'valor DESC' if ordenar_por_valor else 'chave'
+    sql = f'''
+        SELECT substr(chave, ?) AS nome, valor FROM crm_contadores
+        WHERE chave >= ? AND chave < ? AND valor > 0
+        ORDER BY {ordem}
+    '''
+    params = [len(prefixo) + 1, prefixo, prefixo[:-1] + ';']
+    if limite:
+        sql += ' LIMIT ?'
+        params.append(limite)
+    return [(row['nome'], row['valor']) for row in get_conn().execute(sql, params)]
+
+
+def contar_inativos(dias=DIAS_INATIVIDADE):
+    """
+    Clientes sem compra há mais de N dias (ou que nunca compraram)
+
+    Granularidade de dia: compras na data limite contam como inativas.
+    """
+    return _contador('compra:nunca') + _somar_contadores('compra:0', f'compra:{_data_limite(dias)};')
+
+
+def contar_publico(publico):
+    """Conta destinatários de um público de campanha a partir dos contadores"""
+    if publico == 'inativos':
+        return contar_inativos()
+    if publico == 'vips':
+        return _contador('vip')
+    if publico in rfm_service.SEGMENTOS:
+        return rfm_service.contar_segmento(publico)
+    if publico == 'todos' or publico not in PUBLICOS:
+        return _contador('status:ativo')
+
+    result = get_conn().execute(f'SELECT COUNT(*) FROM clientes c WHERE {condicao_publico(publico)}').fetchone()
+    return result[0] if result else 0
+
+
+def estatisticas(status='ativo', dias_novos=30, limite_ranking=10):
+    """Estatísticas do CRM lidas da tabela de contadores"""
+    limite_novos = _data_limite(dias_novos)
+    novos_por_dia = [
+        (dia, total)
+        for dia, total in _contadores_prefixo(f'novos:{status}:', ordenar_por_valor=False)
+        if dia >= limite_novos
+    ]
+
+    return {
+        'total_clientes': _contador(f'status:{status}'),
+        'clientes_novos_mes': sum(total for _, total in novos_por_dia),
+        'novos_por_dia': [{'data': dia, 'total': total} for dia, total in novos_por_dia],
+        'por_status': dict(_contadores_prefixo('status:')),
+        'vips': _contador('vip'),
+        'nunca_compraram': _contador('compra:nunca'),
+        'inativos': {str(dias): contar_inativos(dias) for dias in FAIXAS_INATIVIDADE},
+        'por_cidade': [{'cidade': n, 'total': v} for n, v in _contadores_prefixo(f'cidade:{status}:', limite_ranking)],
+        'por_estado': [{'estado': n, 'total': v} for n, v in _contadores_prefixo(f'estado:{status}:', limite_ranking)],
+        'por_origem': [{'origem': n, 'total': v} for n, v in _contadores_prefixo(f'origem:{status}:', limite_ranking)]
+    }
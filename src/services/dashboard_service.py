@@ -0,0 +1,167 @@
+"""
+Snapshot da página inicial do dashboard em uma única resposta
+
+- Resumo financeiro, resumo de passeios, clima atual, análise do clima e
+  estatísticas do CRM são montados em paralelo (threads)
+- O catálogo Paytour é buscado uma vez; as vagas vêm do cubo de KPIs e só
+  os passeios ainda não ingeridos consultam a disponibilidade na Paytour
+- Cada seção informa quando seus dados foram atualizados; a falha de uma
+  seção não derruba as outras
+- A rota guarda o snapshot inteiro no cache de rotas compartilhado por
+  DASHBOARD_TTL segundos
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from services import kpi_service, clientes_service
+from services.paytour_service import PaytourService
+from services.weather_service import WeatherService
+from services.insights_service import InsightsService
+
+TTL = int(os.getenv('DASHBOARD_TTL', 60))
+DIAS_CLIMA = 7
+
+
+def resumo_passeios(paytour, passeios_list):
+    """
+    Resumo (dados do catálogo + vagas dia/semana/mês) de cada passeio
+
+    Pede a atualização do cubo de KPIs se estiver desatualizado (em segundo
+    plano; esta resposta usa as vagas já ingeridas).
+
+    Returns:
+        (lista de passeios, True se todas as vagas vieram do cubo de KPIs)
+    """
+    kpi_service.atualizar_em_segundo_plano()
+    vagas = kpi_service.vagas_por_passeio()
+    do_cubo = True
+    resumo = []
+
+    for passeio in passeios_list:
+        passeio_id = passeio.get('id')
+
+        disp = vagas.get(passeio_id)
+        if disp is None:
+            # Passeio ainda não ingerido: consulta a disponibilidade na Paytour
+            disp = paytour.get_disponibilidade_resumo(passeio_id)
+            do_cubo = False
+
+        resumo.append({
+            'id': passeio_id,
+            'titulo': passeio.get('nome', passeio.get('titulo', 'Sem título')),
+            'preco': float(passeio.get('preco_exibicao', 0)),
+            'icone': passeio.get('icone', 'ship'),
+            'foto': passeio.get('foto_capa', ''),
+            'url': passeio.get('url', ''),
+            'vagas_dia': disp.get('vagas_dia', 0),
+            'vagas_semana': disp.get('vagas_semana', 0),
+            'vagas_mes': disp.get('vagas_mes', 0)
+        })
+
+    return resumo, do_cubo
+
+
+def analise_clima(weather, dias=DIAS_CLIMA):
+    """
+    Impacto do clima previsto e narrativa de IA pré-calculada (somente se
+    ainda condizente com a previsão)
+
+    Returns:
+        (impactos, narrativa ou None)
+    """
+    previsao = weather.get_forecast(days=dias)
+    impactos = weather.analyze_impact(previsao)
+
+    insights = InsightsService()
+    insight = insights.buscar('impacto_clima', f'{dias}d')
+    narrativa = None
+
+    if insights.valido(insight, impactos, weather.resumo_impacto(impactos)):
+        narrativa = {
+            'conteudo': insight['conteudo'],
+            'gerado_em': insight['gerado_em']
+        }
+
+    return impactos, narrativa
+
+
+def _agora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _secao_financeiro():
+    kpi_service.atualizar_em_segundo_plano()
+    ingestao = kpi_service.ultima_ingestao()
+    return kpi_service.resumo(), ingestao['concluido_em'] if ingestao else None
+
+
+def _secao_passeios():
+    paytour = PaytourService()
+    hoje = datetime.now().strftime('%Y-%m-%d')
+    um_mes = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+
+    # Catálogo buscado uma única vez para o snapshot
+    passeios_list = paytour.get_passeios(data_de=hoje, data_ate=um_mes).get('passeios', [])
+    resumo, do_cubo = resumo_passeios(paytour, passeios_list)
+
+    ingestao = kpi_service.ultima_ingestao() if do_cubo else None
+    return resumo, ingestao['concluido_em'] if ingestao else _agora()
+
+
+def _secao_clima_atual():
+    clima = WeatherService().get_current_weather()
+    return clima, clima.get('timestamp') or _agora()
+
+
+def _secao_clima_analise():
+    impactos, narrativa = analise_clima(WeatherService())
+    return {'analise': impactos, 'narrativa': narrativa}, _agora()
+
+
+def _secao_crm():
+    return clientes_service.estatisticas(), _agora()
+
+
+SECOES = {
+    'financeiro': _secao_financeiro,
+    'passeios': _secao_passeios,
+    'clima_atual': _secao_clima_atual,
+    'clima_analise': _secao_clima_analise,
+    'crm': _secao_crm,
+}
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _executar_secao(nome):
+    try:
+        dados, atualizado_em = SECOES[nome]()
+        return {'dados': dados, 'atualizado_em': atualizado_em}
+    except Exception as e:
+        print(f"Erro ao montar seção {nome} do dashboard: {str(e)}")
+        return {'dados': None, 'atualizado_em': None, 'erro': str(e)}
+
+
+def montar_home():
+    """Monta todas as seções em paralelo"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=len(SECOES))
+            _executor_pid = os.getpid()
+
+    inicio = time.time()
+    futuros = {nome: _executor.submit(_executar_secao, nome) for nome in SECOES}
+
+    return {
+        'secoes': {nome: futuro.result() for nome, futuro in futuros.items()},
+        'gerado_em': _agora(),
+        'duracao_segundos': round(time.time() - inicio, 2)
+    }
+
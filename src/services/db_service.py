@@ -0,0 +1,364 @@
+"""
+Camada de acesso ao SQLite compartilhada pelas rotas, serviços e jobs
+
+- Uma conexão reaproveitada por thread (recriada após fork dos workers)
+- WAL + busy_timeout para leituras concorrentes com escritas (Flask-SQLAlchemy
+  escreve no mesmo app.db)
+- Conexões em modo autocommit; escritas usam transacao() com BEGIN IMMEDIATE,
+  evitando "database is locked" na promoção de leitura para escrita
+- Cache de prepared statements do sqlite3 (cached_statements)
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.getenv(
+    'DATABASE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+)
+
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+CACHE_STATEMENTS = 256
+
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}',
+    'PRAGMA synchronous=NORMAL',
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+    f"PRAGMA cache_size={-int(os.getenv('SQLITE_CACHE_KB', 20000))}",
+    'PRAGMA temp_store=MEMORY',
+]
+
+_local = threading.local()
+
+# Indica se o SQLite em uso tem suporte a FTS5 (definido em init_db)
+FTS_DISPONIVEL = False
+
+
+def aplicar_pragmas(conn):
+    """Aplica os pragmas de desempenho em uma conexão DB-API sqlite3"""
+    cursor = conn.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def fts_disponivel():
+    """Indica se a busca FTS5 de clientes está ativa"""
+    return FTS_DISPONIVEL
+
+
+def nova_conexao():
+    """Abre uma conexão dedicada (ex.: exportações longas)"""
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        cached_statements=CACHE_STATEMENTS,
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    aplicar_pragmas(conn)
+    return conn
+
+
+def get_conn():
+    """Retorna a conexão da thread atual, criando-a se necessário"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = nova_conexao()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.profundidade = 0
+    return conn
+
+
+@contextmanager
+def transacao():
+    """
+    Transação de escrita na conexão da thread (BEGIN IMMEDIATE)
+
+    Transações aninhadas são incorporadas à transação externa.
+    """
+    conn = get_conn()
+
+    if _local.profundidade:
+        _local.profundidade += 1
+        try:
+            yield conn
+        finally:
+            _local.profundidade -= 1
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    _local.profundidade = 1
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        _local.profundidade = 0
+
+
+def _sql_digitos(coluna):
+    """Expressão SQL que remove a pontuação comum de telefones e CPFs"""
+    expressao = f"coalesce({coluna}, '')"
+    for caractere in [' ', '(', ')', '-', '.', '+', '/']:
+        expressao = f"replace({expressao}, '{caractere}', '')"
+    return expressao
+
+
+def _sql_documentos(prefixo):
+    """
+    Texto indexado para busca por telefone/CPF
+
+    Inclui os dígitos completos do telefone, o número sem o código do país
+    e os últimos 8/9 dígitos, permitindo encontrar o cliente digitando o
+    número em qualquer um dos formatos usuais.
+    """
+    telefone = _sql_digitos(f'{prefixo}.telefone')
+    cpf = _sql_digitos(f'{prefixo}.cpf')
+    return (
+        f"{telefone} || ' ' || "
+        f"(CASE WHEN {telefone} LIKE '55%' AND length({telefone}) > 11 THEN substr({telefone}, 3) ELSE '' END) || ' ' || "
+        f"substr({telefone}, -9) || ' ' || substr({telefone}, -8) || ' ' || {cpf}"
+    )
+
+
+def _criar_busca_clientes(conn):
+    """Índice FTS5 dos clientes, mantido em sincronia por triggers"""
+    global FTS_DISPONIVEL
+
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clientes_fts'"
+    ).fetchone()
+
+    colunas_novas = f"new.nome, new.email, new.telefone, new.cidade, new.observacoes, {_sql_documentos('new')}"
+
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+            nome, email, telefone, cidade, observacoes, documentos,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN
+            INSERT INTO clientes_fts (rowid, nome, email, telefone, cidade, observacoes, documentos)
+            VALUES (new.id, {colunas_novas});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE OF nome, email, telefone, cpf, cidade, observacoes ON clientes BEGIN
+            DELETE FROM clientes_fts WHERE rowid = old.id;
+            INSERT INTO clientes_fts (rowid, nome, email, telefone, cidade, observacoes, documentos)
+            VALUES (new.id, {colunas_novas});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN
+            DELETE FROM clientes_fts WHERE rowid = old.id;
+        END
+    ''')
+
+    # Primeira criação: indexar a base existente
+    if not existe:
+        conn.execute(f'''
+            INSERT INTO clientes_fts (rowid, nome, email, telefone, cidade, observacoes, documentos)
+            SELECT c.id, c.nome, c.email, c.telefone, c.cidade, c.observacoes, {_sql_documentos('c')}
+            FROM clientes c
+        ''')
+
+    FTS_DISPONIVEL = True
+
+
+# Contadores do CRM: (expressão da chave, expressão do incremento) por linha de clientes.
+# {r} é substituído por new/old nos triggers e pelo alias da tabela no recálculo.
+CONTADORES_CLIENTES = [
+    ("'status:' || coalesce({r}.status, '')", '1'),
+    ("'novos:' || coalesce({r}.status, '') || ':' || coalesce(date({r}.data_cadastro), '')", '1'),
+    ("'compra:' || coalesce(date({r}.ultima_compra), 'nunca')", '1'),
+    ("'vip'", '(coalesce({r}.total_compras, 0) >= 5)'),
+    ("'cidade:' || coalesce({r}.status, '') || ':' || coalesce(trim({r}.cidade), '')", '1'),
+    ("'estado:' || coalesce({r}.status, '') || ':' || upper(coalesce(trim({r}.estado), ''))", '1'),
+    ("'origem:' || coalesce({r}.status, '') || ':' || coalesce({r}.origem, '')", '1'),
+]
+
+COLUNAS_CONTADORES = 'status, data_cadastro, ultima_compra, total_compras, cidade, estado, origem'
+
+
+def _sql_ajustar_contadores(referencia, sinal):
+    """UPSERT que soma (sinal=1) ou subtrai (sinal=-1) as chaves de uma linha"""
+    valores = ', '.join(
+        f"({chave.format(r=referencia)}, {sinal} * {incremento.format(r=referencia)})"
+        for chave, incremento in CONTADORES_CLIENTES
+    )
+    return (
+        f"INSERT INTO crm_contadores (chave, valor) VALUES {valores} "
+        f"ON CONFLICT(chave) DO UPDATE SET valor = valor + excluded.valor;"
+    )
+
+
+def recalcular_contadores(conn):
+    """Reconstrói os contadores a partir da tabela clientes"""
+    conn.execute('DELETE FROM crm_contadores')
+    for chave, incremento in CONTADORES_CLIENTES:
+        conn.execute(f'''
+            INSERT INTO crm_contadores (chave, valor)
+            SELECT {chave.format(r='c')}, SUM({incremento.format(r='c')})
+            FROM clientes c WHERE true
+            GROUP BY 1
+            ON CONFLICT(chave) DO UPDATE SET valor = valor + excluded.valor
+        ''')
+    conn.execute('DELETE FROM crm_contadores WHERE valor = 0')
+
+
+def _criar_contadores_clientes(conn):
+    """Tabela de contadores do CRM mantida por triggers (estatísticas O(1))"""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'crm_contadores'"
+    ).fetchone()
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS crm_contadores (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_contadores_ai AFTER INSERT ON clientes BEGIN
+            {_sql_ajustar_contadores('new', 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_contadores_au AFTER UPDATE OF {COLUNAS_CONTADORES} ON clientes BEGIN
+            {_sql_ajustar_contadores('old', -1)}
+            {_sql_ajustar_contadores('new', 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS clientes_contadores_ad AFTER DELETE ON clientes BEGIN
+            {_sql_ajustar_contadores('old', -1)}
+        END
+    ''')
+
+    if not existe:
+        recalcular_contadores(conn)
+
+
+def _criar_changelog_clientes(conn):
+    """Log de alterações (append-only) dos clientes, alimentado por triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clientes_changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL,
+            alterado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS clientes_changelog_ai AFTER INSERT ON clientes BEGIN
+            INSERT INTO clientes_changelog (cliente_id, operacao) VALUES (new.id, 'I');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS clientes_changelog_au AFTER UPDATE ON clientes BEGIN
+            INSERT INTO clientes_changelog (cliente_id, operacao) VALUES (new.id, 'U');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS clientes_changelog_ad AFTER DELETE ON clientes BEGIN
+            INSERT INTO clientes_changelog (cliente_id, operacao) VALUES (old.id, 'D');
+        END
+    ''')
+
+
+def normalizar_email(email):
+    """Email na forma gravada em clientes (sem espaços, minúsculo); a coluna UNIQUE diferencia maiúsculas"""
+    return str(email).strip().lower() if email is not None else ''
+
+
+def _normalizar_emails_clientes(conn):
+    """
+    Converte emails já gravados para a forma normalizada
+
+    Emails que colidiriam com outro cliente ficam como estão (aparecem para
+    a deduplicação).
+    """
+    ocupados = {email for (email,) in conn.execute('SELECT email FROM clientes WHERE email = lower(trim(email))')}
+    pendentes = conn.execute('SELECT id, email FROM clientes WHERE email <> lower(trim(email))').fetchall()
+
+    atualizacoes = []
+    for cliente_id, email in pendentes:
+        normalizado = normalizar_email(email)
+        if normalizado in ocupados:
+            continue
+        ocupados.add(normalizado)
+        atualizacoes.append((normalizado, cliente_id))
+
+    conn.executemany('UPDATE clientes SET email = ? WHERE id = ?', atualizacoes)
+
+
+def init_db():
+    """Inicializa tabelas do CRM se não existirem"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clientes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    telefone TEXT,
+                    cpf TEXT,
+                    data_nascimento TEXT,
+                    cidade TEXT,
+                    estado TEXT,
+                    origem TEXT DEFAULT 'cadastro_manual',
+                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    ultima_compra TIMESTAMP,
+                    total_compras INTEGER DEFAULT 0,
+                    valor_total REAL DEFAULT 0,
+                    status TEXT DEFAULT 'ativo',
+                    observacoes TEXT
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar DB: {str(e)}")
+
+    try:
+        with transacao() as conn:
+            # Índices compostos para os filtros/ordenações da listagem (keyset)
+            for coluna in ['data_cadastro', 'ultima_compra', 'total_compras', 'valor_total', 'nome']:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_clientes_status_{coluna} ON clientes (status, {coluna}, id)'
+                )
+    except Exception as e:
+        print(f"Erro ao criar índices de clientes: {str(e)}")
+
+    try:
+        with transacao() as conn:
+            _criar_contadores_clientes(conn)
+    except Exception as e:
+        print(f"Erro ao criar contadores do CRM: {str(e)}")
+
+    try:
+        with transacao() as conn:
+            _criar_changelog_clientes(conn)
+    except Exception as e:
+        print(f"Erro ao criar log de alterações de clientes: {str(e)}")
+
+    try:
+        with transacao() as conn:
+            _normalizar_emails_clientes(conn)
+    except Exception as e:
+        print(f"Erro ao normalizar emails de clientes: {str(e)}")
+
+    try:
+        with transacao() as conn:
+            _criar_busca_clientes(conn)
+    except sqlite3.OperationalError as e:
+        print(f"Busca FTS5 indisponível, usando LIKE: {str(e)}")
@@ -0,0 +1,439 @@
+"""
+Detecção e mesclagem de clientes duplicados
+
+- Email, telefone, CPF e nome são normalizados antes da comparação
+- Chaves de bloqueio (email, últimos 8 dígitos do telefone, CPF e
+  primeiro + último nome) agrupam os candidatos; só pares que dividem
+  alguma chave são comparados, evitando a comparação O(n²) da base
+- Cada par recebe uma pontuação de 0 a 1 (difflib para nomes/emails)
+- Pares acima do limiar formam grupos (união de conjuntos) sugeridos
+  para mesclagem; o principal é o cliente com mais compras/mais antigo
+"""
+import os
+import re
+import json
+import time
+import unicodedata
+from datetime import datetime
+from difflib import SequenceMatcher
+from services.db_service import get_conn, transacao
+from services.clientes_service import somente_digitos, cliente_para_dict
+
+LIMIAR_SUGESTAO = float(os.getenv('DEDUPE_LIMIAR', 0.75))
+
+# Blocos maiores que isso (ex.: nomes muito comuns) são ignorados
+MAX_BLOCO = int(os.getenv('DEDUPE_MAX_BLOCO', 200))
+
+# Partículas ignoradas na comparação de nomes
+PARTICULAS = {'de', 'da', 'do', 'das', 'dos', 'e'}
+
+DOMINIOS_GMAIL = {'gmail.com', 'googlemail.com'}
+
+CAMPOS_COMPLEMENTARES = ['nome', 'telefone', 'cpf', 'data_nascimento', 'cidade', 'estado', 'observacoes']
+
+
+def init_db():
+    """Inicializa tabelas de auditoria e pares ignorados"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clientes_mesclados (
+                    duplicado_id INTEGER PRIMARY KEY,
+                    principal_id INTEGER NOT NULL,
+                    email TEXT,
+                    dados TEXT,
+                    mesclado_em TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dedupe_ignorados (
+                    id_a INTEGER NOT NULL,
+                    id_b INTEGER NOT NULL,
+                    ignorado_em TIMESTAMP,
+                    PRIMARY KEY (id_a, id_b)
+                ) WITHOUT ROWID
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas de duplicados: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+# ============= NORMALIZAÇÃO =============
+
+def normalizar_email(email):
+    """Minúsculas, sem +sufixo; no Gmail também sem pontos no usuário"""
+    email = (email or '').strip().lower()
+    if '@' not in email:
+        return email
+
+    usuario, dominio = email.rsplit('@', 1)
+    usuario = usuario.split('+', 1)[0]
+    if dominio in DOMINIOS_GMAIL:
+        usuario = usuario.replace('.', '')
+        dominio = 'gmail.com'
+    return f'{usuario}@{dominio}'
+
+
+def normalizar_telefone(telefone):
+    """Somente dígitos, sem código do país e zero de operadora"""
+    digitos = somente_digitos(telefone)
+    if digitos.startswith('55') and len(digitos) > 11:
+        digitos = digitos[2:]
+    return digitos.lstrip('0')
+
+
+def cpf_valido(cpf):
+    """Valida os dígitos verificadores de um CPF só com dígitos"""
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+
+    for posicao in (9, 10):
+        soma = sum(int(cpf[i]) * (posicao + 1 - i) for i in range(posicao))
+        digito = (soma * 10) % 11 % 10
+        if digito != int(cpf[posicao]):
+            return False
+    return True
+
+
+def normalizar_cpf(cpf):
+    """Dígitos do CPF, ou '' se inválido"""
+    digitos = somente_digitos(cpf)
+    return digitos if cpf_valido(digitos) else ''
+
+
+def normalizar_nome(nome):
+    """Sem acentos, minúsculo, sem pontuação e partículas (de, da, dos...)"""
+    texto = unicodedata.normalize('NFKD', nome or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    tokens = re.findall(r'[a-z0-9]+', texto)
+    return ' '.join(t for t in tokens if t not in PARTICULAS)
+
+
+def normalizar_cliente(row):
+    """Campos normalizados de uma linha de clientes"""
+    nome = normalizar_nome(row['nome'])
+    telefone = normalizar_telefone(row['telefone'])
+    return {
+        'id': row['id'],
+        'nome': nome,
+        'email': normalizar_email(row['email']),
+        'telefone': telefone,
+        'telefone_chave': telefone[-8:] if len(telefone) >= 8 else '',
+        'cpf': normalizar_cpf(row['cpf']),
+        'cidade': normalizar_nome(row['cidade']),
+    }
+
+
+def chaves_bloqueio(cliente):
+    """Chaves que agrupam candidatos a duplicado"""
+    chaves = []
+    if cliente['email']:
+        chaves.append('e:' + cliente['email'])
+    if cliente['telefone_chave']:
+        chaves.append('t:' + cliente['telefone_chave'])
+    if cliente['cpf']:
+        chaves.append('c:' + cliente['cpf'])
+
+    tokens = cliente['nome'].split()
+    if len(tokens) >= 2:
+        chaves.append(f'n:{tokens[0]}:{tokens[-1]}')
+    return chaves
+
+
+# ============= PONTUAÇÃO =============
+
+def similaridade(a, b, minimo=0.5):
+    """
+    Similaridade de 0 a 1 entre dois textos (difflib)
+
+    Retorna 0 sem calcular o ratio() completo quando os limites superiores
+    baratos (real_quick_ratio/quick_ratio) já ficam abaixo do mínimo.
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+
+    comparador = SequenceMatcher(None, a, b, autojunk=False)
+    if comparador.real_quick_ratio() < minimo or comparador.quick_ratio() < minimo:
+        return 0.0
+    return comparador.ratio()
+
+
+def pontuar_par(a, b):
+    """
+    Pontuação de 0 a 1 de dois clientes normalizados serem a mesma pessoa
+
+    Returns:
+        (pontuação, motivos)
+    """
+    telefone_igual = bool(a['telefone_chave']) and a['telefone_chave'] == b['telefone_chave']
+    # Sem telefone em comum, o nome só conta a partir de 0.85
+    nome = similaridade(a['nome'], b['nome'], minimo=0.5 if telefone_igual else 0.85)
+    motivos = []
+    pontuacao = 0.0
+
+    if a['cpf'] and a['cpf'] == b['cpf']:
+        motivos.append('cpf')
+        pontuacao = max(pontuacao, 0.95)
+
+    if a['email'] and a['email'] == b['email']:
+        motivos.append('email')
+        pontuacao = max(pontuacao, 0.9)
+
+    if telefone_igual:
+        # DDDs diferentes indicam números distintos
+        ddd_a = a['telefone'][:2] if len(a['telefone']) in (10, 11) else ''
+        ddd_b = b['telefone'][:2] if len(b['telefone']) in (10, 11) else ''
+        if not ddd_a or not ddd_b or ddd_a == ddd_b:
+            motivos.append('telefone')
+            pontuacao = max(pontuacao, 0.5 + 0.45 * nome)
+
+    if nome >= 0.85:
+        motivos.append('nome')
+        # Só emails parecidos (erros de digitação) reforçam a semelhança de nome
+        email = similaridade(a['email'].split('@')[0], b['email'].split('@')[0], minimo=0.8)
+        email = email if email >= 0.8 else 0.0
+        cidade = 0.05 if a['cidade'] and a['cidade'] == b['cidade'] else 0.0
+        pontuacao = max(pontuacao, 0.55 * nome + 0.3 * email + cidade)
+
+    # CPFs válidos e diferentes: quase certamente pessoas distintas
+    if a['cpf'] and b['cpf'] and a['cpf'] != b['cpf']:
+        pontuacao *= 0.3
+
+    return round(min(pontuacao, 1.0), 3), motivos
+
+
+# ============= DETECÇÃO =============
+
+def _carregar_clientes(status):
+    sql = 'SELECT * FROM clientes'
+    params = []
+    if status:
+        sql += ' WHERE status = ?'
+        params.append(status)
+    return get_conn().execute(sql, params).fetchall()
+
+
+def _pares_ignorados():
+    return {
+        (row['id_a'], row['id_b'])
+        for row in get_conn().execute('SELECT id_a, id_b FROM dedupe_ignorados')
+    }
+
+
+def _agrupar(pares):
+    """União de conjuntos sobre os pares aprovados"""
+    pais = {}
+
+    def raiz(x):
+        while pais.setdefault(x, x) != x:
+            pais[x] = pais[pais[x]]
+            x = pais[x]
+        return x
+
+    for a, b in pares:
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            pais[max(ra, rb)] = min(ra, rb)
+
+    grupos = {}
+    for x in pais:
+        grupos.setdefault(raiz(x), []).append(x)
+    return list(grupos.values())
+
+
+def _prioridade(row):
+    """Principal do grupo: mais compras, maior valor, cadastro mais antigo"""
+    return (
+        -(row['total_compras'] or 0),
+        -(row['valor_total'] or 0),
+        row['data_cadastro'] or '',
+        row['id']
+    )
+
+
+def detectar_duplicados(limiar=None, status='ativo', limite=None):
+    """
+    Procura duplicados na base inteira
+
+    Args:
+        limiar: Pontuação mínima do par (padrão: DEDUPE_LIMIAR)
+        status: Filtra clientes por status (None para todos)
+        limite: Máximo de grupos retornados
+
+    Returns:
+        dict com grupos sugeridos (principal + duplicados) e métricas
+    """
+    inicio = time.time()
+    limiar = LIMIAR_SUGESTAO if limiar is None else limiar
+
+    rows = {row['id']: row for row in _carregar_clientes(status)}
+    normalizados = {cliente_id: normalizar_cliente(row) for cliente_id, row in rows.items()}
+
+    blocos = {}
+    for cliente in normalizados.values():
+        for chave in chaves_bloqueio(cliente):
+            blocos.setdefault(chave, []).append(cliente['id'])
+
+    ignorados = _pares_ignorados()
+    candidatos = set()
+    blocos_ignorados = 0
+    for ids in blocos.values():
+        if len(ids) < 2:
+            continue
+        if len(ids) > MAX_BLOCO:
+            blocos_ignorados += 1
+            continue
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                par = (a, b) if a < b else (b, a)
+                if par not in ignorados:
+                    candidatos.add(par)
+
+    pares = {}
+    for a, b in candidatos:
+        pontuacao, motivos = pontuar_par(normalizados[a], normalizados[b])
+        if pontuacao >= limiar:
+            pares[(a, b)] = (pontuacao, motivos)
+
+    grupos = []
+    for membros in _agrupar(pares):
+        membros.sort(key=lambda cliente_id: _prioridade(rows[cliente_id]))
+        principal = membros[0]
+        duplicados = []
+        for cliente_id in membros[1:]:
+            par = (min(principal, cliente_id), max(principal, cliente_id))
+            pontuacao, motivos = pares.get(par) or pontuar_par(normalizados[principal], normalizados[cliente_id])
+            duplicados.append({
+                'cliente': cliente_para_dict(rows[cliente_id]),
+                'pontuacao': pontuacao,
+                'motivos': motivos
+            })
+        grupos.append({
+            'principal': cliente_para_dict(rows[principal]),
+            'duplicados': duplicados,
+            'pontuacao': max(d['pontuacao'] for d in duplicados)
+        })
+
+    grupos.sort(key=lambda grupo: grupo['pontuacao'], reverse=True)
+    total_grupos = len(grupos)
+    if limite:
+        grupos = grupos[:limite]
+
+    return {
+        'grupos': grupos,
+        'total_grupos': total_grupos,
+        'clientes_analisados': len(rows),
+        'pares_comparados': len(candidatos),
+        'blocos_ignorados': blocos_ignorados,
+        'duracao_segundos': round(time.time() - inicio, 2)
+    }
+
+
+def ignorar_par(id_a, id_b):
+    """Marca um par como não duplicado (não será sugerido de novo)"""
+    a, b = min(id_a, id_b), max(id_a, id_b)
+    with transacao() as conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO dedupe_ignorados (id_a, id_b, ignorado_em) VALUES (?, ?, ?)',
+            (a, b, datetime.now().isoformat())
+        )
+
+
+# ============= MESCLAGEM =============
+
+def _tabela_existe(conn, nome):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome,)
+    ).fetchone() is not None
+
+
+def mesclar(principal_id, duplicados_ids):
+    """
+    Mescla clientes duplicados no principal
+
+    Campos vazios do principal são completados, compras e valores somados,
+    pedidos Paytour reapontados e os duplicados removidos (com cópia em
+    clientes_mesclados para auditoria).
+
+    Returns:
+        Quantidade de clientes mesclados
+    """
+    duplicados_ids = [int(d) for d in duplicados_ids if int(d) != int(principal_id)]
+    if not duplicados_ids:
+        return 0
+
+    with transacao() as conn:
+        principal = conn.execute('SELECT * FROM clientes WHERE id = ?', (principal_id,)).fetchone()
+        if not principal:
+            raise ValueError(f'Cliente {principal_id} não encontrado')
+
+        marcadores = ','.join('?' * len(duplicados_ids))
+        duplicados = conn.execute(
+            f'SELECT * FROM clientes WHERE id IN ({marcadores})', duplicados_ids
+        ).fetchall()
+        if not duplicados:
+            return 0
+
+        mesclado = dict(principal)
+        for row in duplicados:
+            for campo in CAMPOS_COMPLEMENTARES:
+                if not mesclado.get(campo) and row[campo]:
+                    mesclado[campo] = row[campo]
+            mesclado['total_compras'] = (mesclado['total_compras'] or 0) + (row['total_compras'] or 0)
+            mesclado['valor_total'] = (mesclado['valor_total'] or 0) + (row['valor_total'] or 0)
+            if row['ultima_compra'] and (not mesclado['ultima_compra'] or row['ultima_compra'] > mesclado['ultima_compra']):
+                mesclado['ultima_compra'] = row['ultima_compra']
+            if row['data_cadastro'] and (not mesclado['data_cadastro'] or row['data_cadastro'] < mesclado['data_cadastro']):
+                mesclado['data_cadastro'] = row['data_cadastro']
+
+        agora = datetime.now().isoformat()
+        conn.executemany(
+            'INSERT OR REPLACE INTO clientes_mesclados (duplicado_id, principal_id, email, dados, mesclado_em) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(row['id'], principal_id, row['email'], json.dumps(dict(row), ensure_ascii=False), agora) for row in duplicados]
+        )
+
+        if _tabela_existe(conn, 'paytour_pedidos'):
+            conn.execute(
+                f'UPDATE paytour_pedidos SET cliente_email = ? WHERE cliente_email IN '
+                f'(SELECT email FROM clientes WHERE id IN ({marcadores}))',
+                [principal['email']] + duplicados_ids
+            )
+        if _tabela_existe(conn, 'clientes_rfm'):
+            conn.execute(f'DELETE FROM clientes_rfm WHERE cliente_id IN ({marcadores})', duplicados_ids)
+
+        conn.execute(f'DELETE FROM clientes WHERE id IN ({marcadores})', duplicados_ids)
+
+        atribuicoes = CAMPOS_COMPLEMENTARES + ['total_compras', 'valor_total', 'ultima_compra', 'data_cadastro']
+        conn.execute(
+            f"UPDATE clientes SET {', '.join(f'{campo} = ?' for campo in atribuicoes)} WHERE id = ?",
+            [mesclado[campo] for campo in atribuicoes] + [principal_id]
+        )
+
+    return len(duplicados)
+
+
+def mesclar_lote(grupos):
+    """
+    Mescla vários grupos, cada um em sua própria transação
+
+    Args:
+        grupos: Lista de dicts {principal_id, duplicados: [ids]}
+
+    Returns:
+        dict com total mesclado e erros por grupo
+    """
+    mesclados = 0
+    erros = []
+
+    for grupo in grupos:
+        try:
+            mesclados += mesclar(grupo['principal_id'], grupo.get('duplicados') or [])
+        except Exception as e:
+            erros.append({'principal_id': grupo.get('principal_id'), 'erro': str(e)})
+
+    return {'mesclados': mesclados, 'grupos': len(grupos), 'erros': erros}
@@ -0,0 +1,509 @@
+"""
+Disparo de campanhas por email e WhatsApp
+
+- O público é resolvido em blocos de IDs (keyset) e enfileirado em
+  campanha_envios, uma linha por destinatário (idempotente)
+- Workers reservam blocos de envios pendentes (UPDATE ... RETURNING), de
+  modo que vários processos gunicorn/jobs podem processar a mesma campanha
+- Cada mensagem é personalizada ({{primeiro_nome}}, {{cidade}}...) e enviada
+  pelo remetente do canal, respeitando o limite de taxa por canal, que é
+  compartilhado (no SQLite) por todos os processos que disparam campanhas
+- Falhas temporárias voltam para a fila com espera exponencial até
+  ENVIO_MAX_TENTATIVAS; falhas definitivas ficam registradas no log
+
+Para testes locais o remetente de email pode apontar para um servidor SMTP
+de desenvolvimento (ex.: python -m aiosmtpd -n -l localhost:1025 com
+SMTP_HOST=localhost SMTP_PORT=1025 SMTP_TLS=0).
+"""
+import os
+import re
+import time
+import smtplib
+import threading
+import requests
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+from services.db_service import get_conn, transacao
+from services.rate_limiter import RateLimiterCompartilhado
+from services.clientes_service import resolver_publico, somente_digitos
+
+TAMANHO_BLOCO = int(os.getenv('ENVIO_TAMANHO_BLOCO', 200))
+MAX_TENTATIVAS = int(os.getenv('ENVIO_MAX_TENTATIVAS', 3))
+WORKERS_POR_CAMPANHA = int(os.getenv('ENVIO_WORKERS', 4))
+
+# Envios reservados há mais tempo que isso (processo morto) voltam para a fila
+RESERVA_EXPIRA_SEGUNDOS = 600
+
+LIMITES_POR_MINUTO = {
+    'email': int(os.getenv('ENVIO_EMAIL_POR_MINUTO', 600)),
+    'whatsapp': int(os.getenv('ENVIO_WHATSAPP_POR_MINUTO', 80)),
+}
+
+# Status de campanhas que já começaram a enviar (novo disparo só como retomada)
+STATUS_DISPARADA = ('enviando', 'concluida')
+
+
+def init_db():
+    """Inicializa tabelas de campanhas e log de envios"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS campanhas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    publico TEXT NOT NULL,
+                    objetivo TEXT,
+                    assunto TEXT,
+                    conteudo TEXT,
+                    status TEXT DEFAULT 'rascunho',
+                    criado_em TIMESTAMP,
+                    iniciado_em TIMESTAMP,
+                    concluido_em TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS campanha_envios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campanha_id INTEGER NOT NULL,
+                    cliente_id INTEGER NOT NULL,
+                    destino TEXT NOT NULL,
+                    nome TEXT,
+                    cidade TEXT,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER DEFAULT 0,
+                    erro TEXT,
+                    proxima_tentativa TIMESTAMP,
+                    enviado_em TIMESTAMP,
+                    atualizado_em TIMESTAMP,
+                    UNIQUE (campanha_id, cliente_id)
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_campanha_envios_status ON campanha_envios (campanha_id, status, id)'
+            )
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas de envio: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+# ============= REMETENTES =============
+
+class ErroEnvioTemporario(Exception):
+    """Falha que pode ser repetida (conexão, limite do provedor, 4xx do SMTP)"""
+
+
+class RemetenteEmail:
+    """Envio por SMTP reaproveitando a conexão entre mensagens"""
+
+    def __init__(self):
+        self.host = os.getenv('SMTP_HOST', 'localhost')
+        self.porta = int(os.getenv('SMTP_PORT', 587))
+        self.usuario = os.getenv('SMTP_USUARIO')
+        self.senha = os.getenv('SMTP_SENHA')
+        self.remetente = os.getenv('SMTP_REMETENTE', 'contato@maremarturismo.com.br')
+        self.tls = os.getenv('SMTP_TLS', '1') == '1'
+        self.smtp = None
+
+    def _conectar(self):
+        smtp = smtplib.SMTP(self.host, self.porta, timeout=30)
+        if self.tls:
+            smtp.starttls()
+        if self.usuario:
+            smtp.login(self.usuario, self.senha)
+        return smtp
+
+    def enviar(self, destino, assunto, corpo):
+        mensagem = EmailMessage()
+        mensagem['From'] = self.remetente
+        mensagem['To'] = destino
+        mensagem['Subject'] = assunto
+        mensagem.set_content(corpo)
+
+        try:
+            if self.smtp is None:
+                self.smtp = self._conectar()
+            self.smtp.send_message(mensagem)
+        except smtplib.SMTPRecipientsRefused:
+            raise
+        except smtplib.SMTPResponseException as e:
+            self.fechar()
+            if 400 <= e.smtp_code < 500:
+                raise ErroEnvioTemporario(f'SMTP {e.smtp_code}: {e.smtp_error!r}')
+            raise
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            self.fechar()
+            raise ErroEnvioTemporario(str(e))
+
+    def fechar(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+
+class RemetenteWhatsApp:
+    """Envio pela API do WhatsApp Business (Cloud API)"""
+
+    def __init__(self):
+        self.url = os.getenv('WHATSAPP_API_URL', 'https://graph.facebook.com/v20.0')
+        self.phone_id = os.getenv('WHATSAPP_PHONE_ID')
+        self.token = os.getenv('WHATSAPP_TOKEN')
+        self.session = requests.Session()
+
+    def enviar(self, destino, assunto, corpo):
+        try:
+            response = self.session.post(
+                f'{self.url}/{self.phone_id}/messages',
+                headers={'Authorization': f'Bearer {self.token}'},
+                json={
+                    'messaging_product': 'whatsapp',
+                    'to': destino,
+                    'type': 'text',
+                    'text': {'body': corpo}
+                },
+                timeout=15
+            )
+        except requests.RequestException as e:
+            raise ErroEnvioTemporario(str(e))
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise ErroEnvioTemporario(f'WhatsApp {response.status_code}')
+        response.raise_for_status()
+
+    def fechar(self):
+        self.session.close()
+
+
+# Fábricas de remetente por canal; registrar_remetente permite trocar
+# (ex.: outro provedor de WhatsApp ou um remetente de teste)
+REMETENTES = {
+    'email': RemetenteEmail,
+    'whatsapp': RemetenteWhatsApp,
+}
+
+
+def _limitador(canal, por_minuto):
+    """Limite do canal dividido entre workers e jobs (não por processo)"""
+    return RateLimiterCompartilhado(f'envio:{canal}', por_minuto)
+
+
+_limitadores = {canal: _limitador(canal, limite) for canal, limite in LIMITES_POR_MINUTO.items()}
+
+
+def registrar_remetente(canal, fabrica, por_minuto=None):
+    """Registra a fábrica de remetente de um canal"""
+    REMETENTES[canal] = fabrica
+    if por_minuto or canal not in _limitadores:
+        _limitadores[canal] = _limitador(canal, por_minuto or 60)
+
+
+# ============= PERSONALIZAÇÃO =============
+
+_MARCADOR = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+def dados_personalizacao(envio):
+    """Variáveis disponíveis nos modelos de mensagem"""
+    nome = (envio['nome'] or '').strip()
+    return {
+        'nome': nome,
+        'primeiro_nome': nome.split()[0] if nome else '',
+        'cidade': envio['cidade'] or '',
+        'destino': envio['destino'],
+    }
+
+
+def renderizar(modelo, variaveis):
+    """Substitui {{variavel}}; marcadores desconhecidos ficam como estão"""
+    return _MARCADOR.sub(lambda m: str(variaveis.get(m.group(1), m.group(0))), modelo or '')
+
+
+# ============= CAMPANHAS =============
+
+def criar_campanha(tipo, publico, objetivo, conteudo, assunto=None):
+    """Grava a campanha gerada (rascunho) e retorna o id"""
+    with transacao() as conn:
+        cursor = conn.execute('''
+            INSERT INTO campanhas (tipo, publico, objetivo, assunto, conteudo, status, criado_em)
+            VALUES (?, ?, ?, ?, ?, 'rascunho', ?)
+        ''', (tipo, publico, objetivo, assunto, conteudo, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+
+def buscar_campanha(campanha_id):
+    row = get_conn().execute('SELECT * FROM campanhas WHERE id = ?', (campanha_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _destino(canal, cliente):
+    if canal == 'whatsapp':
+        telefone = somente_digitos(cliente['telefone'])
+        if len(telefone) in (10, 11):
+            telefone = '55' + telefone
+        return telefone if len(telefone) >= 12 else None
+    return (cliente['email'] or '').strip() or None
+
+
+def enfileirar(campanha_id):
+    """
+    Resolve o público em blocos e cria um envio pendente por destinatário
+
+    Reexecutar não duplica envios (UNIQUE campanha_id + cliente_id).
+
+    Returns:
+        Quantidade de envios enfileirados nesta execução
+    """
+    campanha = buscar_campanha(campanha_id)
+    if not campanha:
+        raise ValueError(f'Campanha {campanha_id} não encontrada')
+
+    agora = datetime.now().isoformat()
+    enfileirados = 0
+
+    for bloco in resolver_publico(campanha['publico'], tamanho_bloco=TAMANHO_BLOCO * 5):
+        linhas = []
+        for cliente in bloco:
+            destino = _destino(campanha['tipo'], cliente)
+            if destino:
+                linhas.append((campanha_id, cliente['id'], destino, cliente['nome'], cliente['cidade'], agora))
+
+        with transacao() as conn:
+            antes = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO campanha_envios (campanha_id, cliente_id, destino, nome, cidade, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', linhas)
+            enfileirados += conn.total_changes - antes
+
+    return enfileirados
+
+
+def _reservar_bloco(campanha_id):
+    """Reserva atomicamente o próximo bloco de envios pendentes"""
+    agora = datetime.now()
+    expirado = (agora - timedelta(seconds=RESERVA_EXPIRA_SEGUNDOS)).isoformat()
+
+    with transacao() as conn:
+        return conn.execute('''
+            UPDATE campanha_envios SET status = 'enviando', atualizado_em = ?
+            WHERE id IN (
+                SELECT id FROM campanha_envios
+                WHERE campanha_id = ?
+                AND (
+                    status = 'pendente'
+                    OR (status = 'erro' AND proxima_tentativa <= ?)
+                    OR (status = 'enviando' AND atualizado_em < ?)
+                )
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, destino, nome, cidade, tentativas
+        ''', (agora.isoformat(), campanha_id, agora.isoformat(), expirado, TAMANHO_BLOCO)).fetchall()
+
+
+def _enviar_bloco(campanha, envios):
+    """Envia um bloco em paralelo (um remetente por thread) e retorna os resultados"""
+    canal = campanha['tipo']
+    limitador = _limitadores[canal]
+    locais = threading.local()
+    remetentes = []
+    lock = threading.Lock()
+
+    def enviar(envio):
+        remetente = getattr(locais, 'remetente', None)
+        if remetente is None:
+            remetente = locais.remetente = REMETENTES[canal]()
+            with lock:
+                remetentes.append(remetente)
+
+        variaveis = dados_personalizacao(envio)
+        limitador.aguardar()
+        try:
+            remetente.enviar(
+                envio['destino'],
+                renderizar(campanha['assunto'], variaveis),
+                renderizar(campanha['conteudo'], variaveis)
+            )
+            return envio, 'enviado', None
+        except ErroEnvioTemporario as e:
+            if envio['tentativas'] + 1 < MAX_TENTATIVAS:
+                return envio, 'erro', str(e)
+            return envio, 'falhou', str(e)
+        except Exception as e:
+            return envio, 'falhou', str(e)
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(WORKERS_POR_CAMPANHA, len(envios))) as executor:
+            return list(executor.map(enviar, envios))
+    finally:
+        for remetente in remetentes:
+            remetente.fechar()
+
+
+def _registrar_resultados(resultados):
+    agora = datetime.now()
+    linhas = []
+    for envio, status, erro in resultados:
+        tentativas = envio['tentativas'] + 1
+        proxima = (agora + timedelta(seconds=30 * 2 ** tentativas)).isoformat() if status == 'erro' else None
+        linhas.append((
+            status, tentativas, erro, proxima,
+            agora.isoformat() if status == 'enviado' else None,
+            agora.isoformat(), envio['id']
+        ))
+
+    with transacao() as conn:
+        conn.executemany('''
+            UPDATE campanha_envios SET
+                status = ?, tentativas = ?, erro = ?, proxima_tentativa = ?,
+                enviado_em = coalesce(?, enviado_em), atualizado_em = ?
+            WHERE id = ?
+        ''', linhas)
+
+
+def _pendentes(campanha_id):
+    row = get_conn().execute('''
+        SELECT
+            SUM(status IN ('pendente', 'enviando')) AS fila,
+            SUM(status = 'erro') AS repetir,
+            MIN(CASE WHEN status = 'erro' THEN proxima_tentativa END) AS proxima
+        FROM campanha_envios WHERE campanha_id = ?
+    ''', (campanha_id,)).fetchone()
+    return row['fila'] or 0, row['repetir'] or 0, row['proxima']
+
+
+def processar(campanha_id, aguardar_repeticoes=True):
+    """
+    Processa a fila de envios da campanha até esvaziar
+
+    Args:
+        aguardar_repeticoes: Espera o horário das novas tentativas em vez de
+            encerrar com envios em erro na fila
+    """
+    campanha = buscar_campanha(campanha_id)
+    if not campanha:
+        raise ValueError(f'Campanha {campanha_id} não encontrada')
+    if campanha['tipo'] not in REMETENTES:
+        raise ValueError(f"Canal sem remetente: {campanha['tipo']}")
+
+    while True:
+        envios = _reservar_bloco(campanha_id)
+        if envios:
+            _registrar_resultados(_enviar_bloco(campanha, envios))
+            continue
+
+        fila, repetir, proxima = _pendentes(campanha_id)
+        if fila:
+            # Outro processo está com blocos reservados
+            time.sleep(1)
+            continue
+        if repetir and aguardar_repeticoes:
+            espera = (datetime.fromisoformat(proxima) - datetime.now()).total_seconds()
+            time.sleep(min(max(espera, 0.1), 60))
+            continue
+        break
+
+    if not repetir:
+        with transacao() as conn:
+            conn.execute(
+                "UPDATE campanhas SET status = 'concluida', concluido_em = ? WHERE id = ? AND status = 'enviando'",
+                (datetime.now().isoformat(), campanha_id)
+            )
+
+
+def _marcar_enviando(campanha_id):
+    with transacao() as conn:
+        conn.execute(
+            "UPDATE campanhas SET status = 'enviando', iniciado_em = coalesce(iniciado_em, ?) WHERE id = ?",
+            (datetime.now().isoformat(), campanha_id)
+        )
+
+
+def disparar(campanha_id):
+    """Enfileira o público e processa os envios (execução síncrona)"""
+    _marcar_enviando(campanha_id)
+    enfileirar(campanha_id)
+    processar(campanha_id)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def disparar_em_segundo_plano(campanha_id):
+    """Inicia o disparo em uma thread do processo e retorna imediatamente"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv('ENVIO_CAMPANHAS_SIMULTANEAS', 2)))
+            _executor_pid = os.getpid()
+
+    _marcar_enviando(campanha_id)
+
+    def executar():
+        try:
+            disparar(campanha_id)
+        except Exception as e:
+            print(f"Erro ao disparar campanha {campanha_id}: {str(e)}")
+
+    _executor.submit(executar)
+
+
+def metricas(campanha_id):
+    """Contagem por status, vazão (envios/s) e fila restante"""
+    campanha = buscar_campanha(campanha_id)
+    if not campanha:
+        return None
+
+    por_status = {
+        row['status']: row['total']
+        for row in get_conn().execute(
+            'SELECT status, COUNT(*) AS total FROM campanha_envios WHERE campanha_id = ? GROUP BY status',
+            (campanha_id,)
+        )
+    }
+    janela = get_conn().execute(
+        "SELECT MIN(enviado_em), MAX(enviado_em) FROM campanha_envios WHERE campanha_id = ? AND status = 'enviado'",
+        (campanha_id,)
+    ).fetchone()
+
+    enviados = por_status.get('enviado', 0)
+    vazao = 0.0
+    inicio = campanha['iniciado_em'] or janela[0]
+    if enviados and inicio and janela[1]:
+        duracao = (datetime.fromisoformat(janela[1]) - datetime.fromisoformat(inicio)).total_seconds()
+        vazao = enviados / duracao if duracao > 0 else float(enviados)
+
+    fila = por_status.get('pendente', 0) + por_status.get('enviando', 0) + por_status.get('erro', 0)
+
+    return {
+        'campanha_id': campanha_id,
+        'status': campanha['status'],
+        'total': sum(por_status.values()),
+        'por_status': por_status,
+        'fila': fila,
+        'envios_por_segundo': round(vazao, 2),
+        'tempo_restante_segundos': round(fila / vazao) if vazao else None,
+        'iniciado_em': campanha['iniciado_em'],
+        'concluido_em': campanha['concluido_em']
+    }
+
+
+def erros_recentes(campanha_id, limite=20):
+    """Últimos envios com erro/falha (para diagnóstico)"""
+    return [
+        dict(row)
+        for row in get_conn().execute('''
+            SELECT cliente_id, destino, status, tentativas, erro, atualizado_em
+            FROM campanha_envios
+            WHERE campanha_id = ? AND status IN ('erro', 'falhou')
+            ORDER BY atualizado_em DESC LIMIT ?
+        ''', (campanha_id, limite))
+    ]
@@ -0,0 +1,197 @@
+"""
+Servidor dos arquivos estáticos do front-end (src/static)
+
+- Manifesto em memória montado na inicialização: o caminho pedido é
+  resolvido por dicionário, sem tocar no disco a cada requisição
+- Variantes comprimidas: usa .br/.gz gerados no build quando existem (e não
+  são mais antigos que o original); senão comprime em memória na
+  inicialização (gzip, e brotli se instalado) os arquivos de texto
+- Cache: assets com hash no nome (listados no manifesto do build do Vite
+  ou, sem ele, como assets/index-DevcPCdH.js) são imutáveis por um ano;
+  index.html tem cache curto para publicar novas versões; os demais, cache
+  moderado
+- ETag forte por conteúdo (um por codificação), If-None-Match /
+  If-Modified-Since e requisições Range tratados pelo Werkzeug
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+from flask import request, send_file, Response
+
+try:
+    import brotli
+except ImportError:  # somente gzip sem a dependência
+    brotli = None
+
+MAX_AGE_IMUTAVEL = 365 * 24 * 3600
+MAX_AGE_INDEX = int(os.getenv('ESTATICOS_MAX_AGE_INDEX', 60))
+MAX_AGE_PADRAO = int(os.getenv('ESTATICOS_MAX_AGE', 3600))
+
+NIVEL_GZIP = 9
+QUALIDADE_BROTLI = int(os.getenv('ESTATICOS_QUALIDADE_BROTLI', 9))
+COMPRESSAO_MIN_BYTES = 1024
+
+MIMETYPES_COMPRESSIVEIS = (
+    'text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+    'image/vnd.microsoft.icon'
+)
+
+# Manifesto do build do Vite (build.manifest): lista exata dos assets com hash
+MANIFESTOS_VITE = ['.vite/manifest.json', 'manifest.json']
+
+# Sem manifesto do build: nome gerado pelo Vite em assets/ (nome-<hash de 8
+# caracteres base64url>.ext). O hash precisa ter maiúscula ou dígito, para
+# nomes como logo-darkmode.svg não virarem imutáveis
+PADRAO_HASH = re.compile(r'^assets/[^/]+-(?=[A-Za-z0-9_-]*[A-Z0-9])[A-Za-z0-9_-]{8}\.[a-z0-9]+$')
+
+# Extensão das variantes pré-comprimidas no disco, por codificação
+EXTENSOES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _assets_com_hash(pasta):
+    """Arquivos listados no manifesto do build do Vite (None se não houver manifesto)"""
+    for relativo in MANIFESTOS_VITE:
+        caminho = os.path.join(pasta, relativo)
+        if not os.path.isfile(caminho):
+            continue
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                entradas = json.load(arquivo)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler manifesto do build {caminho}: {str(e)}")
+            return None
+
+        assets = set()
+        for entrada in entradas.values():
+            if entrada.get('file'):
+                assets.add(entrada['file'])
+            assets.update(entrada.get('css', []))
+            assets.update(entrada.get('assets', []))
+        return assets
+    return None
+
+
+def _cache_control(caminho, assets_com_hash):
+    if caminho == 'index.html':
+        return f'public, max-age={MAX_AGE_INDEX}, must-revalidate'
+
+    if assets_com_hash is not None:
+        imutavel = caminho in assets_com_hash
+    else:
+        imutavel = PADRAO_HASH.match(caminho) is not None
+
+    if imutavel:
+        return f'public, max-age={MAX_AGE_IMUTAVEL}, immutable'
+    return f'public, max-age={MAX_AGE_PADRAO}'
+
+
+def _comprimir(conteudo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(conteudo, quality=QUALIDADE_BROTLI)
+    return gzip.compress(conteudo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _variantes(completo, conteudo, mimetype, mtime):
+    """Variantes comprimidas do arquivo: {codificação: caminho no disco ou bytes}"""
+    if len(conteudo) < COMPRESSAO_MIN_BYTES or not mimetype.startswith(MIMETYPES_COMPRESSIVEIS):
+        return {}
+
+    variantes = {}
+    for codificacao, extensao in EXTENSOES.items():
+        pre_comprimido = completo + extensao
+        if os.path.isfile(pre_comprimido) and os.path.getmtime(pre_comprimido) >= mtime:
+            variantes[codificacao] = pre_comprimido
+        elif codificacao == 'gzip' or brotli is not None:
+            comprimido = _comprimir(conteudo, codificacao)
+            # Só vale a pena se reduzir o tamanho
+            if len(comprimido) < len(conteudo):
+                variantes[codificacao] = comprimido
+    return variantes
+
+
+def montar_manifesto(pasta):
+    """
+    Percorre a pasta de estáticos e monta o manifesto
+
+    Returns:
+        dict caminho relativo (com /) -> {caminho, mimetype, mtime, etag,
+        cache_control, variantes}
+    """
+    manifesto = {}
+    if not pasta or not os.path.isdir(pasta):
+        return manifesto
+
+    assets_com_hash = _assets_com_hash(pasta)
+
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            if nome.endswith(tuple(EXTENSOES.values())) and os.path.isfile(os.path.join(raiz, nome[:nome.rfind('.')])):
+                continue  # variante de outro arquivo
+
+            completo = os.path.join(raiz, nome)
+            relativo = os.path.relpath(completo, pasta).replace(os.sep, '/')
+            mtime = os.path.getmtime(completo)
+            mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+
+            with open(completo, 'rb') as arquivo:
+                conteudo = arquivo.read()
+
+            manifesto[relativo] = {
+                'caminho': completo,
+                'mimetype': mimetype,
+                'mtime': mtime,
+                'etag': hashlib.sha1(conteudo).hexdigest()[:32],
+                'cache_control': _cache_control(relativo, assets_com_hash),
+                'variantes': _variantes(completo, conteudo, mimetype, mtime)
+            }
+
+    return manifesto
+
+
+def _codificacao(variantes):
+    """Melhor variante aceita pelo cliente (br, gzip ou None)"""
+    aceitas = request.accept_encodings
+    for codificacao in ('br', 'gzip'):
+        if codificacao in variantes and aceitas[codificacao]:
+            return codificacao
+    return None
+
+
+def servir(item):
+    """Resposta do arquivo do manifesto, com a melhor codificação aceita"""
+    codificacao = _codificacao(item['variantes'])
+
+    if codificacao is None:
+        response = send_file(
+            item['caminho'],
+            mimetype=item['mimetype'],
+            etag=item['etag'],
+            last_modified=item['mtime'],
+            conditional=True
+        )
+    else:
+        variante = item['variantes'][codificacao]
+        etag = item['etag'] + '-' + codificacao
+
+        if isinstance(variante, bytes):
+            response = Response(variante, mimetype=item['mimetype'])
+            response.set_etag(etag)
+            response.last_modified = item['mtime']
+            response.make_conditional(request, accept_ranges=True, complete_length=len(variante))
+        else:
+            response = send_file(
+                variante,
+                mimetype=item['mimetype'],
+                etag=etag,
+                last_modified=item['mtime'],
+                conditional=True
+            )
+        response.headers['Content-Encoding'] = codificacao
+
+    if item['variantes']:
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = item['cache_control']
+    return response
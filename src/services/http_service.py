@@ -0,0 +1,153 @@
+"""
+GET condicional (ETag / If-None-Match) e compressão das respostas da API
+
+- Toda resposta 200 de GET em /api/ recebe um ETag forte (hash do corpo) e
+  devolve 304 quando o cliente já tem a mesma versão
+- Rotas com versão de dados conhecida usam versao_dados(): o ETag vem da
+  versão (ex.: última ingestão dos KPIs) e o 304 sai antes de executar a
+  rota
+- Corpos JSON/texto maiores que COMPRESSAO_MIN_BYTES são comprimidos com
+  brotli (se instalado) ou gzip, conforme o Accept-Encoding; cada codificação
+  tem seu próprio ETag (sufixo -br / -gzip)
+"""
+import os
+import gzip
+import hashlib
+from functools import wraps
+from flask import request, make_response
+
+try:
+    import brotli
+except ImportError:  # somente gzip sem a dependência
+    brotli = None
+
+COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', 1024))
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+MIMETYPES_COMPRESSIVEIS = ('application/json', 'text/')
+
+# Sufixo do ETag por codificação (um ETag forte identifica bytes exatos)
+SUFIXOS = {'br': '-br', 'gzip': '-gzip'}
+
+
+def _etag_base(etag):
+    """ETag sem o sufixo de codificação"""
+    for sufixo in SUFIXOS.values():
+        if etag.endswith(sufixo):
+            return etag[:-len(sufixo)]
+    return etag
+
+
+def _cliente_tem(etag):
+    """Indica se o If-None-Match da requisição contém a versão (em qualquer codificação)"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    if if_none_match.star_tag:
+        return True
+    return any(_etag_base(valor) == etag for valor in if_none_match.as_set())
+
+
+def _codificacao():
+    """Melhor codificação aceita pelo cliente (br, gzip ou None)"""
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+
+def _nao_modificado(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def versao_dados(versao):
+    """
+    Decorator de rota com versão de dados conhecida
+
+    Args:
+        versao: Função sem argumentos, somente leitura, que devolve uma string
+            que muda quando os dados da rota mudam (None ou erro desativam o
+            atalho)
+
+    O ETag combina a versão com a rota e a query; se o cliente já tem esse
+    ETag, a rota nem é executada.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            try:
+                atual = versao()
+            except Exception as e:
+                # Sem versão não há atalho: a rota responde (e trata seus próprios erros)
+                print(f"Erro ao obter versão dos dados de {request.path}: {str(e)}")
+                atual = None
+            if atual is None:
+                return f(*args, **kwargs)
+
+            args_query = sorted(request.args.items(multi=True))
+            etag = 'v' + hashlib.sha1(f'{atual}|{request.path}|{args_query}'.encode('utf-8')).hexdigest()[:32]
+
+            if _cliente_tem(etag):
+                return _nao_modificado(etag)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return decorated_function
+    return decorator
+
+
+def _preparar_resposta(response):
+    """Hook after_request: ETag, 304 e compressão das respostas da API"""
+    if (
+        request.method != 'GET'
+        or not request.path.startswith('/api/')
+        or response.status_code != 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    corpo = response.get_data()
+    etag, _ = response.get_etag()
+    if not etag:
+        etag = hashlib.sha1(corpo).hexdigest()[:32]
+
+    if _cliente_tem(etag):
+        return _nao_modificado(etag)
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    codificacao = _codificacao()
+
+    if (
+        codificacao is None
+        or len(corpo) < COMPRESSAO_MIN_BYTES
+        or not (response.mimetype or '').startswith(MIMETYPES_COMPRESSIVEIS)
+    ):
+        response.set_etag(etag)
+        return response
+
+    if codificacao == 'br':
+        comprimido = brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    else:
+        comprimido = gzip.compress(corpo, compresslevel=NIVEL_GZIP)
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacao
+    response.set_etag(etag + SUFIXOS[codificacao])
+    return response
+
+
+def configurar(app):
+    """Registra o tratamento de ETag/compressão nas respostas do app"""
+    app.after_request(_preparar_resposta)
@@ -0,0 +1,157 @@
+"""
+Armazenamento de insights de IA pré-calculados
+
+Cada insight é gravado com a impressão digital (hash) dos dados de entrada
+e um pequeno conjunto de métricas numéricas. As rotas devolvem o insight
+armazenado enquanto as métricas atuais não variarem além do limiar
+configurado, evitando uma nova chamada ao modelo a cada clique.
+"""
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+from services.db_service import get_conn, transacao
+
+# Variação relativa máxima das métricas para reaproveitar um insight (10%)
+LIMIAR_VARIACAO = float(os.getenv('INSIGHTS_LIMIAR_VARIACAO', 0.10))
+
+# Idade máxima de um insight armazenado antes de ser considerado vencido
+IDADE_MAXIMA_HORAS = int(os.getenv('INSIGHTS_IDADE_MAXIMA_HORAS', 72))
+
+
+def init_db():
+    """Inicializa tabela de insights se não existir"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS insights_ia (
+                    tipo TEXT NOT NULL,
+                    periodo TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    metricas TEXT,
+                    conteudo TEXT NOT NULL,
+                    gerado_em TIMESTAMP NOT NULL,
+                    PRIMARY KEY (tipo, periodo)
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabela de insights: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+class InsightsService:
+
+    @staticmethod
+    def fingerprint(dados):
+        """Hash estável dos dados de entrada"""
+        serializado = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serializado.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def variacao(metricas_antigas, metricas_novas):
+        """Maior variação relativa entre as métricas numéricas"""
+        maior = 0.0
+
+        for chave, valor_novo in metricas_novas.items():
+            valor_antigo = metricas_antigas.get(chave)
+            if not isinstance(valor_novo, (int, float)) or not isinstance(valor_antigo, (int, float)):
+                continue
+            base = max(abs(valor_antigo), 1.0)
+            maior = max(maior, abs(valor_novo - valor_antigo) / base)
+
+        return maior
+
+    def buscar(self, tipo, periodo):
+        """Retorna o insight armazenado (ou None)"""
+        row = get_conn().execute(
+            'SELECT * FROM insights_ia WHERE tipo = ? AND periodo = ?',
+            (tipo, periodo)
+        ).fetchone()
+
+        if not row:
+            return None
+
+        return {
+            'tipo': row['tipo'],
+            'periodo': row['periodo'],
+            'fingerprint': row['fingerprint'],
+            'metricas': json.loads(row['metricas'] or '{}'),
+            'conteudo': row['conteudo'],
+            'gerado_em': row['gerado_em']
+        }
+
+    def salvar(self, tipo, periodo, dados, metricas, conteudo):
+        """Grava (ou substitui) o insight de um tipo/período"""
+        gerado_em = datetime.now().isoformat()
+
+        with transacao() as conn:
+            conn.execute('''
+                INSERT INTO insights_ia (tipo, periodo, fingerprint, metricas, conteudo, gerado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(tipo, periodo) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    metricas = excluded.metricas,
+                    conteudo = excluded.conteudo,
+                    gerado_em = excluded.gerado_em
+            ''', (
+                tipo,
+                periodo,
+                self.fingerprint(dados),
+                json.dumps(metricas),
+                conteudo,
+                gerado_em
+            ))
+
+        return gerado_em
+
+    def valido(self, insight, dados, metricas, limiar=None):
+        """Verifica se o insight armazenado ainda representa os dados atuais"""
+        if not insight:
+            return False
+
+        if insight['fingerprint'] == self.fingerprint(dados):
+            return True
+
+        limiar = LIMIAR_VARIACAO if limiar is None else limiar
+        gerado_em = datetime.fromisoformat(insight['gerado_em'])
+
+        if datetime.now() - gerado_em > timedelta(hours=IDADE_MAXIMA_HORAS):
+            return False
+
+        return self.variacao(insight['metricas'], metricas) <= limiar
+
+    def obter_ou_gerar(self, tipo, periodo, dados, metricas, gerar, forcar=False, limiar=None):
+        """
+        Retorna o insight armazenado ou gera um novo
+
+        Args:
+            tipo: Tipo do insight (ex.: analise_vendas)
+            periodo: Período de referência (ex.: mes)
+            dados: Dados de entrada (usados na impressão digital)
+            metricas: Métricas numéricas comparadas com o limiar
+            gerar: Função sem argumentos que produz o conteúdo
+            forcar: Ignora o insight armazenado
+            limiar: Variação relativa aceita (padrão: INSIGHTS_LIMIAR_VARIACAO)
+
+        Returns:
+            dict com conteudo, gerado_em e pre_calculado
+        """
+        if not forcar:
+            insight = self.buscar(tipo, periodo)
+            if self.valido(insight, dados, metricas, limiar=limiar):
+                return {
+                    'conteudo': insight['conteudo'],
+                    'gerado_em': insight['gerado_em'],
+                    'pre_calculado': True
+                }
+
+        conteudo = gerar()
+        gerado_em = self.salvar(tipo, periodo, dados, metricas, conteudo)
+
+        return {
+            'conteudo': conteudo,
+            'gerado_em': gerado_em,
+            'pre_calculado': False
+        }
@@ -0,0 +1,747 @@
+"""
+Motor de agregação dos KPIs financeiros (vendas, receita, ocupação, ticket)
+
+- fato_disponibilidade: uma linha por passeio × data do passeio, com
+  capacidade, vagas disponíveis/vendidas, preço e receita estimada
+  (mesma estratégia de calcular_vendas_estimadas: capacidade - disponíveis)
+- fato_disponibilidade_mes: rollup mensal mantido por triggers (deltas)
+- As consultas usam o rollup para os meses completos do intervalo e a
+  tabela diária apenas para as pontas, sem chamar a Paytour
+- A ingestão (job) só grava as linhas que mudaram, então os triggers só
+  ajustam os rollups afetados
+- A cada ingestão, os totais das janelas semana/mes são gravados em
+  kpi_snapshots junto com o crescimento em relação ao período anterior e
+  ao mesmo período do ano anterior (comparando snapshots tirados com a
+  mesma antecedência), para o resumo ler sem recalcular
+- Entre execuções do job, as rotas pedem uma atualização em segundo plano
+  quando a última ingestão passou de KPI_INTERVALO_MINUTOS; uma reserva em
+  kpi_ingestoes garante uma só ingestão por vez entre processos
+"""
+import os
+import time
+import threading
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from services.db_service import get_conn, transacao
+from services import cache_service
+
+# Agrupamentos aceitos e a expressão SQL correspondente (sobre a tabela diária)
+AGRUPAMENTOS_DIARIOS = {
+    'dia': 'f.data',
+    'semana': "date(f.data, '-6 days', 'weekday 1')",
+}
+
+AGRUPAMENTOS_MENSAIS = {
+    'mes': 'b.mes',
+    'passeio': 'b.passeio_id',
+    'categoria': "coalesce(p.categoria, 'Sem categoria')",
+    'total': "'total'",
+}
+
+AGRUPAMENTOS = list(AGRUPAMENTOS_DIARIOS) + list(AGRUPAMENTOS_MENSAIS)
+
+# Meses de disponibilidade consultados na ingestão (limite da API)
+MESES_INGESTAO = 12
+THREADS_INGESTAO = 8
+
+# Capacidade assumida quando a Paytour não informa vagas_totais
+CAPACIDADE_PADRAO = 10
+
+# Idade máxima (minutos) da última ingestão antes de uma atualização em segundo plano
+INTERVALO_ATUALIZACAO_MINUTOS = int(os.getenv('KPI_INTERVALO_MINUTOS', 60))
+# Reserva de ingestão sem conclusão após esse tempo é considerada abandonada
+TEMPO_MAXIMO_INGESTAO_MINUTOS = 30
+# Após uma ingestão sem nenhum passeio (Paytour fora do ar), espera antes de tentar de novo
+ESPERA_APOS_FALHA_MINUTOS = 5
+
+# Janelas (dias a partir de hoje) dos períodos dia/semana/mes, como em calcular_vendas_estimadas
+JANELAS = {'dia': 0, 'semana': 7, 'mes': 30}
+
+# Períodos com snapshot diário e crescimento pré-calculado
+PERIODOS_SNAPSHOT = ['semana', 'mes']
+# 52 semanas: o snapshot do ano anterior cai no mesmo dia da semana
+DIAS_ANO_ANTERIOR = 364
+# Sem snapshot no dia exato (ingestão falhou), usa o mais recente até esses dias antes
+TOLERANCIA_SNAPSHOT_DIAS = 3
+
+_AJUSTE_MES = '''
+    INSERT INTO fato_disponibilidade_mes (passeio_id, mes, capacidade, vendidas, receita)
+    VALUES ({r}.passeio_id, substr({r}.data, 1, 7), {s} * {r}.capacidade, {s} * {r}.vendidas, {s} * {r}.receita)
+    ON CONFLICT(passeio_id, mes) DO UPDATE SET
+        capacidade = capacidade + excluded.capacidade,
+        vendidas = vendidas + excluded.vendidas,
+        receita = receita + excluded.receita;
+'''
+
+
+def init_db():
+    """Inicializa tabelas de fatos, dimensão de passeios e rollups"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dim_passeios (
+                    passeio_id INTEGER PRIMARY KEY,
+                    titulo TEXT,
+                    categoria TEXT,
+                    preco REAL,
+                    atualizado_em TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fato_disponibilidade (
+                    passeio_id INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    capacidade INTEGER NOT NULL,
+                    disponiveis INTEGER NOT NULL,
+                    vendidas INTEGER NOT NULL,
+                    preco REAL NOT NULL,
+                    receita REAL NOT NULL,
+                    atualizado_em TIMESTAMP,
+                    PRIMARY KEY (passeio_id, data)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_fato_disponibilidade_data ON fato_disponibilidade (data, passeio_id)'
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fato_disponibilidade_mes (
+                    passeio_id INTEGER NOT NULL,
+                    mes TEXT NOT NULL,
+                    capacidade INTEGER NOT NULL DEFAULT 0,
+                    vendidas INTEGER NOT NULL DEFAULT 0,
+                    receita REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (mes, passeio_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS fato_disponibilidade_ai AFTER INSERT ON fato_disponibilidade BEGIN
+                    {_AJUSTE_MES.format(r='new', s=1)}
+                END
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS fato_disponibilidade_au AFTER UPDATE ON fato_disponibilidade BEGIN
+                    {_AJUSTE_MES.format(r='old', s=-1)}
+                    {_AJUSTE_MES.format(r='new', s=1)}
+                END
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS fato_disponibilidade_ad AFTER DELETE ON fato_disponibilidade BEGIN
+                    {_AJUSTE_MES.format(r='old', s=-1)}
+                END
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS kpi_ingestoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    iniciado_em TIMESTAMP,
+                    concluido_em TIMESTAMP,
+                    passeios INTEGER,
+                    linhas_alteradas INTEGER,
+                    erro TEXT
+                )
+            ''')
+            # Bancos criados antes da coluna de erro
+            colunas = {row[1] for row in conn.execute('PRAGMA table_info(kpi_ingestoes)')}
+            if 'erro' not in colunas:
+                conn.execute('ALTER TABLE kpi_ingestoes ADD COLUMN erro TEXT')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS kpi_snapshots (
+                    periodo TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    capacidade INTEGER NOT NULL,
+                    vendidas INTEGER NOT NULL,
+                    receita REAL NOT NULL,
+                    crescimento_vendas REAL,
+                    crescimento_receita REAL,
+                    crescimento_vendas_ano REAL,
+                    crescimento_receita_ano REAL,
+                    registrado_em TIMESTAMP,
+                    PRIMARY KEY (periodo, data)
+                ) WITHOUT ROWID
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas de KPIs: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+# ============= INGESTÃO =============
+
+SQL_UPSERT_FATO = '''
+    INSERT INTO fato_disponibilidade (passeio_id, data, capacidade, disponiveis, vendidas, preco, receita, atualizado_em)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(passeio_id, data) DO UPDATE SET
+        capacidade = excluded.capacidade,
+        disponiveis = excluded.disponiveis,
+        vendidas = excluded.vendidas,
+        preco = excluded.preco,
+        receita = excluded.receita,
+        atualizado_em = excluded.atualizado_em
+    WHERE capacidade != excluded.capacidade
+        OR disponiveis != excluded.disponiveis
+        OR preco != excluded.preco
+'''
+
+SQL_UPSERT_PASSEIO = '''
+    INSERT INTO dim_passeios (passeio_id, titulo, categoria, preco, atualizado_em)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(passeio_id) DO UPDATE SET
+        titulo = excluded.titulo,
+        categoria = excluded.categoria,
+        preco = excluded.preco,
+        atualizado_em = excluded.atualizado_em
+'''
+
+
+def _categoria(passeio):
+    categoria = passeio.get('categoria')
+    if isinstance(categoria, dict):
+        categoria = categoria.get('nome')
+    if not categoria and passeio.get('categorias'):
+        primeira = passeio['categorias'][0]
+        categoria = primeira.get('nome') if isinstance(primeira, dict) else primeira
+    return categoria or None
+
+
+def _inteiro(valor, padrao):
+    """Converte para int; valores nulos ou não numéricos viram o padrão"""
+    try:
+        return int(valor)
+    except (ValueError, TypeError):
+        return padrao
+
+
+def _preco(detalhes):
+    try:
+        return float(detalhes.get('preco_exibicao', 0) or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def linhas_fato(passeio_id, detalhes, agora):
+    """Linhas de fato_disponibilidade a partir dos detalhes de um passeio"""
+    preco = _preco(detalhes)
+    linhas = {}
+
+    for disp in detalhes.get('disponibilidades') or []:
+        try:
+            data_str = disp.get('data')
+            datetime.strptime(data_str or '', '%Y-%m-%d')
+            capacidade = _inteiro(disp.get('vagas_totais'), CAPACIDADE_PADRAO)
+            disponiveis = _inteiro(disp.get('vagas_disponiveis'), 0)
+        except (ValueError, TypeError, AttributeError):
+            continue
+
+        anterior = linhas.get(data_str)
+        if anterior:
+            # Vários horários no mesmo dia: soma as vagas
+            capacidade += anterior[2]
+            disponiveis += anterior[3]
+        vendidas = max(0, capacidade - disponiveis)
+        linhas[data_str] = (passeio_id, data_str, capacidade, disponiveis, vendidas, preco, round(vendidas * preco, 2), agora)
+
+    return list(linhas.values())
+
+
+class IngestaoSemDados(Exception):
+    """Nenhum passeio pôde ser ingerido (Paytour indisponível ou todos com erro)"""
+
+
+def ingerir(paytour=None, ao_gravar=None, ingestao_id=None):
+    """
+    Atualiza dimensão e fatos a partir da Paytour
+
+    Os detalhes dos passeios são buscados em paralelo; a gravação é feita
+    em uma transação por passeio, alterando só as linhas que mudaram. Datas
+    futuras que a Paytour deixou de retornar (saídas canceladas) são
+    removidas do passeio. A falha de um passeio é registrada e não
+    interrompe os demais.
+
+    Args:
+        paytour: PaytourService (padrão: nova instância)
+        ao_gravar: Função opcional chamada com (conn, passeio_id, linhas, agora)
+            dentro da transação de cada passeio (ex.: snapshots)
+        ingestao_id: Reserva criada por _reservar_ingestao (concluída ao final)
+
+    Returns:
+        Relatório com passeios, linhas alteradas e duração
+
+    Raises:
+        IngestaoSemDados: nenhum passeio ingerido; a tentativa fica registrada
+            com erro e a conclusão anterior continua valendo
+    """
+    from services.paytour_service import PaytourService
+
+    paytour = paytour or PaytourService()
+    inicio = time.time()
+    agora = datetime.now().isoformat(timespec='seconds')
+
+    hoje = date.today()
+    data_de = hoje.isoformat()
+    data_ate = (hoje + timedelta(days=30 * MESES_INGESTAO)).isoformat()
+    passeios = paytour.listar_todos_passeios(data_de=data_de, data_ate=data_ate)
+
+    def buscar(passeio):
+        try:
+            return passeio, paytour.get_passeio_detalhes(passeio.get('id'), meses=MESES_INGESTAO)
+        except Exception as e:
+            print(f"Erro ao buscar detalhes do passeio {passeio.get('id')}: {str(e)}")
+            return passeio, None
+
+    alteradas = 0
+    processados = 0
+
+    with ThreadPoolExecutor(max_workers=THREADS_INGESTAO) as executor:
+        for passeio, detalhes in executor.map(buscar, passeios):
+            if not detalhes:
+                continue
+
+            passeio_id = passeio.get('id')
+            try:
+                linhas = linhas_fato(passeio_id, detalhes, agora)
+                datas = {linha[1] for linha in linhas}
+
+                with transacao() as conn:
+                    conn.execute(SQL_UPSERT_PASSEIO, (
+                        passeio_id,
+                        passeio.get('titulo', ''),
+                        _categoria(passeio) or _categoria(detalhes),
+                        _preco(detalhes),
+                        agora
+                    ))
+                    # rowcount não inclui as alterações feitas pelos triggers de rollup
+                    alteradas += max(0, conn.executemany(SQL_UPSERT_FATO, linhas).rowcount)
+
+                    # Datas futuras que não vieram nesta ingestão (saídas canceladas)
+                    removidas = [
+                        (passeio_id, data_str)
+                        for (data_str,) in conn.execute(
+                            'SELECT data FROM fato_disponibilidade WHERE passeio_id = ? AND data BETWEEN ? AND ?',
+                            (passeio_id, data_de, data_ate)
+                        ).fetchall()
+                        if data_str not in datas
+                    ]
+                    if removidas:
+                        conn.executemany(
+                            'DELETE FROM fato_disponibilidade WHERE passeio_id = ? AND data = ?', removidas
+                        )
+                        alteradas += len(removidas)
+
+                    if ao_gravar:
+                        ao_gravar(conn, passeio_id, linhas, agora)
+            except Exception as e:
+                print(f"Erro ao ingerir passeio {passeio_id}: {str(e)}")
+                continue
+
+            processados += 1
+
+    if not processados:
+        # Nada ingerido: o cubo continua o anterior (sem snapshot, sem nova versão,
+        # cache mantido) e a falha fica registrada
+        erro = 'Nenhum passeio ingerido' if passeios else 'Nenhum passeio retornado pela Paytour'
+        with transacao() as conn:
+            if ingestao_id:
+                conn.execute(
+                    'UPDATE kpi_ingestoes SET passeios = 0, linhas_alteradas = ?, erro = ? WHERE id = ?',
+                    (alteradas, erro, ingestao_id)
+                )
+            else:
+                conn.execute(
+                    'INSERT INTO kpi_ingestoes (iniciado_em, passeios, linhas_alteradas, erro) VALUES (?, 0, ?, ?)',
+                    (agora, alteradas, erro)
+                )
+        raise IngestaoSemDados(erro)
+
+    concluido_em = datetime.now().isoformat(timespec='seconds')
+    with transacao() as conn:
+        registrar_snapshots(conn, hoje, concluido_em)
+        if ingestao_id:
+            conn.execute(
+                'UPDATE kpi_ingestoes SET concluido_em = ?, passeios = ?, linhas_alteradas = ? WHERE id = ?',
+                (concluido_em, processados, alteradas, ingestao_id)
+            )
+        else:
+            conn.execute(
+                'INSERT INTO kpi_ingestoes (iniciado_em, concluido_em, passeios, linhas_alteradas) VALUES (?, ?, ?, ?)',
+                (agora, concluido_em, processados, alteradas)
+            )
+
+    # Respostas que leem o cubo de KPIs deixam de valer
+    cache_service.invalidar_seguro('financeiro', 'passeios', 'dashboard')
+
+    return {
+        'passeios': processados,
+        'linhas_alteradas': alteradas,
+        'ingerido_em': agora,
+        'duracao_segundos': round(time.time() - inicio, 2)
+    }
+
+
+def _crescimento(atual, anterior):
+    """Variação percentual (None sem base de comparação)"""
+    if not anterior:
+        return None
+    return round((atual - anterior) / anterior * 100, 1)
+
+
+def _snapshot_base(conn, periodo, data_alvo):
+    """Snapshot do período tirado em data_alvo (ou até TOLERANCIA_SNAPSHOT_DIAS antes)"""
+    return conn.execute(
+        'SELECT vendidas, receita FROM kpi_snapshots WHERE periodo = ? AND data BETWEEN ? AND ? '
+        'ORDER BY data DESC LIMIT 1',
+        (
+            periodo,
+            (data_alvo - timedelta(days=TOLERANCIA_SNAPSHOT_DIAS)).isoformat(),
+            data_alvo.isoformat()
+        )
+    ).fetchone()
+
+
+def registrar_snapshots(conn, hoje=None, agora=None):
+    """
+    Grava os totais de hoje de cada janela de PERIODOS_SNAPSHOT com o
+    crescimento pré-calculado
+
+    O período anterior é o snapshot tirado (dias da janela + 1) atrás, quando
+    a janela anterior estava à mesma distância de hoje; o ano anterior é o
+    snapshot de DIAS_ANO_ANTERIOR atrás. Reexecutar no mesmo dia substitui
+    o snapshot do dia.
+    """
+    hoje = hoje or date.today()
+    agora = agora or datetime.now().isoformat(timespec='seconds')
+
+    for periodo in PERIODOS_SNAPSHOT:
+        dias = JANELAS[periodo]
+        totais = consultar(hoje.isoformat(), (hoje + timedelta(days=dias)).isoformat())['totais']
+        anterior = _snapshot_base(conn, periodo, hoje - timedelta(days=dias + 1))
+        ano_anterior = _snapshot_base(conn, periodo, hoje - timedelta(days=DIAS_ANO_ANTERIOR))
+
+        conn.execute('''
+            INSERT OR REPLACE INTO kpi_snapshots (
+                periodo, data, capacidade, vendidas, receita,
+                crescimento_vendas, crescimento_receita, crescimento_vendas_ano, crescimento_receita_ano,
+                registrado_em
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            periodo,
+            hoje.isoformat(),
+            totais['capacidade'],
+            totais['vendidas'],
+            totais['receita'],
+            _crescimento(totais['vendidas'], anterior['vendidas'] if anterior else None),
+            _crescimento(totais['receita'], anterior['receita'] if anterior else None),
+            _crescimento(totais['vendidas'], ano_anterior['vendidas'] if ano_anterior else None),
+            _crescimento(totais['receita'], ano_anterior['receita'] if ano_anterior else None),
+            agora
+        ))
+
+
+def crescimento(periodo='mes'):
+    """Crescimento pré-calculado no último snapshot do período (ou None)"""
+    row = get_conn().execute(
+        'SELECT * FROM kpi_snapshots WHERE periodo = ? ORDER BY data DESC LIMIT 1', (periodo,)
+    ).fetchone()
+    if not row:
+        return None
+
+    return {
+        'data': row['data'],
+        'periodo_anterior': {
+            'vendas': row['crescimento_vendas'],
+            'receita': row['crescimento_receita']
+        },
+        'ano_anterior': {
+            'vendas': row['crescimento_vendas_ano'],
+            'receita': row['crescimento_receita_ano']
+        }
+    }
+
+
+def ultima_ingestao():
+    """Registro da última ingestão concluída (ou None)"""
+    row = get_conn().execute(
+        'SELECT * FROM kpi_ingestoes WHERE concluido_em IS NOT NULL ORDER BY id DESC LIMIT 1'
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def versao():
+    """
+    Versão dos dados do cubo (última ingestão concluída + data de hoje, já
+    que as janelas dia/semana/mês andam com o calendário); usada como ETag
+    """
+    row = get_conn().execute(
+        'SELECT MAX(id) FROM kpi_ingestoes WHERE concluido_em IS NOT NULL'
+    ).fetchone()
+    return f"{row[0] or 0}:{date.today().isoformat()}"
+
+
+def _desatualizada(conn, agora):
+    """Indica se os dados estão desatualizados, sem ingestão em andamento nem falha recente"""
+    recente = (agora - timedelta(minutes=INTERVALO_ATUALIZACAO_MINUTOS)).isoformat(timespec='seconds')
+    abandonada = (agora - timedelta(minutes=TEMPO_MAXIMO_INGESTAO_MINUTOS)).isoformat(timespec='seconds')
+
+    falha = (agora - timedelta(minutes=ESPERA_APOS_FALHA_MINUTOS)).isoformat(timespec='seconds')
+
+    ultima = conn.execute('SELECT MAX(concluido_em) FROM kpi_ingestoes').fetchone()[0]
+    if ultima and ultima > recente:
+        return False
+
+    # Ingestão em andamento ou que falhou há pouco
+    bloqueada = conn.execute(
+        'SELECT 1 FROM kpi_ingestoes WHERE concluido_em IS NULL AND ('
+        '(erro IS NULL AND iniciado_em > ?) OR (erro IS NOT NULL AND iniciado_em > ?)'
+        ') LIMIT 1',
+        (abandonada, falha)
+    ).fetchone()
+    return not bloqueada
+
+
+def _reservar_ingestao():
+    """
+    Reserva uma ingestão se os dados estiverem desatualizados e nenhuma outra
+    estiver em andamento (em qualquer processo); retorna o id ou None
+
+    A verificação é feita primeiro só com leitura; o lock de escrita só é
+    pedido quando há o que atualizar (e a verificação é refeita dentro dele).
+    """
+    agora = datetime.now()
+
+    if not _desatualizada(get_conn(), agora):
+        return None
+
+    with transacao() as conn:
+        if not _desatualizada(conn, agora):
+            return None
+
+        return conn.execute(
+            'INSERT INTO kpi_ingestoes (iniciado_em) VALUES (?)',
+            (agora.isoformat(timespec='seconds'),)
+        ).lastrowid
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def atualizar_em_segundo_plano():
+    """
+    Dispara uma ingestão em uma thread do processo se os dados estiverem
+    desatualizados; retorna imediatamente (True se uma ingestão foi iniciada)
+    """
+    global _executor, _executor_pid
+
+    ingestao_id = _reservar_ingestao()
+    if not ingestao_id:
+        return False
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1)
+            _executor_pid = os.getpid()
+
+    def executar():
+        try:
+            ingerir(ingestao_id=ingestao_id)
+        except Exception as e:
+            # A reserva expira após TEMPO_MAXIMO_INGESTAO_MINUTOS e outra ingestão é tentada
+            print(f"Erro ao atualizar KPIs: {str(e)}")
+
+    _executor.submit(executar)
+    return True
+
+
+# ============= CONSULTA =============
+
+def _meses_completos(inicio, fim):
+    """Primeiro e último mês (YYYY-MM) inteiramente contidos no intervalo"""
+    primeiro = inicio if inicio.day == 1 else (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    ultimo = fim if (fim + timedelta(days=1)).day == 1 else fim.replace(day=1) - timedelta(days=1)
+    if primeiro > ultimo:
+        return None, None
+    return primeiro.strftime('%Y-%m'), ultimo.strftime('%Y-%m')
+
+
+def _kpis(linha):
+    vendidas = linha['vendidas'] or 0
+    capacidade = linha['capacidade'] or 0
+    receita = linha['receita'] or 0
+    return {
+        'vendidas': vendidas,
+        'capacidade': capacidade,
+        'receita': round(receita, 2),
+        'ocupacao': round(vendidas / capacidade, 4) if capacidade else 0,
+        'ticket_medio': round(receita / vendidas, 2) if vendidas else 0
+    }
+
+
+def consultar(data_inicio, data_fim, agrupar='total', passeio_id=None, categoria=None):
+    """
+    KPIs de um intervalo arbitrário, agrupados por dia, semana, mês,
+    passeio, categoria ou total
+
+    Args:
+        data_inicio: Data inicial (YYYY-MM-DD)
+        data_fim: Data final (YYYY-MM-DD), inclusiva
+        agrupar: Uma das chaves de AGRUPAMENTOS
+        passeio_id: Filtra um passeio
+        categoria: Filtra uma categoria
+
+    Returns:
+        dict com grupos (lista) e totais
+    """
+    if agrupar not in AGRUPAMENTOS:
+        raise ValueError(f'Agrupamento inválido: {agrupar}')
+
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    if fim < inicio:
+        raise ValueError('data_fim anterior a data_inicio')
+
+    filtros = ''
+    params_filtro = []
+    if passeio_id is not None:
+        filtros += ' AND {t}.passeio_id = ?'
+        params_filtro.append(int(passeio_id))
+    if categoria:
+        filtros += ' AND {t}.passeio_id IN (SELECT passeio_id FROM dim_passeios WHERE categoria = ?)'
+        params_filtro.append(categoria)
+
+    if agrupar in AGRUPAMENTOS_DIARIOS:
+        grupo = AGRUPAMENTOS_DIARIOS[agrupar]
+        sql = f'''
+            SELECT {grupo} AS grupo, SUM(f.capacidade) AS capacidade, SUM(f.vendidas) AS vendidas, SUM(f.receita) AS receita
+            FROM fato_disponibilidade f
+            WHERE f.data BETWEEN ? AND ? {filtros.format(t='f')}
+            GROUP BY grupo ORDER BY grupo
+        '''
+        params = [data_inicio, data_fim] + params_filtro
+    else:
+        mes_de, mes_ate = _meses_completos(inicio, fim)
+        grupo = AGRUPAMENTOS_MENSAIS[agrupar]
+        sql = f'''
+            WITH b AS (
+                SELECT f.passeio_id, substr(f.data, 1, 7) AS mes, f.capacidade, f.vendidas, f.receita
+                FROM fato_disponibilidade f
+                WHERE f.data BETWEEN ? AND ?
+                AND NOT (substr(f.data, 1, 7) BETWEEN ? AND ?) {filtros.format(t='f')}
+                UNION ALL
+                SELECT m.passeio_id, m.mes, m.capacidade, m.vendidas, m.receita
+                FROM fato_disponibilidade_mes m
+                WHERE m.mes BETWEEN ? AND ? {filtros.format(t='m')}
+            )
+            SELECT {grupo} AS grupo, max(p.titulo) AS titulo, max(p.preco) AS preco,
+                SUM(b.capacidade) AS capacidade, SUM(b.vendidas) AS vendidas, SUM(b.receita) AS receita
+            FROM b LEFT JOIN dim_passeios p ON p.passeio_id = b.passeio_id
+            GROUP BY grupo ORDER BY {'receita DESC' if agrupar in ('passeio', 'categoria') else 'grupo'}
+        '''
+        # Sem meses completos: intervalo vazio no rollup ('~' > qualquer YYYY-MM)
+        mes_de, mes_ate = (mes_de, mes_ate) if mes_de else ('~', '')
+        params = [data_inicio, data_fim, mes_de, mes_ate] + params_filtro + [mes_de, mes_ate] + params_filtro
+
+    grupos = []
+    totais = {'capacidade': 0, 'vendidas': 0, 'receita': 0}
+    for row in get_conn().execute(sql, params):
+        item = {'grupo': row['grupo'], **_kpis(row)}
+        if agrupar == 'passeio':
+            item['titulo'] = row['titulo']
+            item['preco'] = row['preco'] or 0
+        grupos.append(item)
+        for chave in totais:
+            totais[chave] += row[chave] or 0
+
+    return {
+        'periodo': {'inicio': data_inicio, 'fim': data_fim},
+        'agrupar': agrupar,
+        'grupos': grupos,
+        'totais': _kpis(totais)
+    }
+
+
+def janela(periodo='mes'):
+    """Intervalo (início, fim) de hoje até o fim do período dia, semana ou mes"""
+    hoje = date.today()
+    dias = JANELAS.get(periodo, JANELAS['mes'])
+    return hoje.isoformat(), (hoje + timedelta(days=dias)).isoformat()
+
+
+def vendas_por_passeio(periodo='mes'):
+    """
+    Vendas por passeio de todo o catálogo no período (apenas com vendas),
+    ordenadas por receita
+    """
+    data_inicio, data_fim = janela(periodo)
+    grupos = consultar(data_inicio, data_fim, agrupar='passeio')['grupos']
+    return [
+        {
+            'passeio_id': item['grupo'],
+            'passeio': item['titulo'] or '',
+            'vendas': item['vendidas'],
+            'preco_medio': round(item['preco'], 2),
+            'receita': item['receita']
+        }
+        for item in grupos if item['vendidas'] > 0
+    ]
+
+
+def resumo():
+    """Resumo financeiro (mês e semana a partir de hoje) de todo o catálogo"""
+    inicio_mes, fim_mes = janela('mes')
+    inicio_semana, fim_semana = janela('semana')
+
+    kpis_mes = consultar(inicio_mes, fim_mes, agrupar='passeio')
+    kpis_semana = consultar(inicio_semana, fim_semana)['totais']
+    totais_mes = kpis_mes['totais']
+
+    passeios_mais_vendidos = sorted(
+        (
+            {'titulo': item['titulo'] or '', 'vendas': item['vendidas'], 'receita': item['receita']}
+            for item in kpis_mes['grupos'] if item['vendidas'] > 0
+        ),
+        key=lambda item: item['vendas'],
+        reverse=True
+    )
+
+    # Crescimento pré-calculado na ingestão (None enquanto não há histórico)
+    crescimento_periodos = {periodo: crescimento(periodo) for periodo in PERIODOS_SNAPSHOT}
+    crescimento_mes = (crescimento_periodos['mes'] or {}).get('periodo_anterior', {})
+
+    return {
+        'total_passeios': len(kpis_mes['grupos']),
+        'vendas_mes': totais_mes['vendidas'],
+        'receita_mes': totais_mes['receita'],
+        'vendas_semana': kpis_semana['vendidas'],
+        'receita_semana': kpis_semana['receita'],
+        'ticket_medio': totais_mes['ticket_medio'],
+        'crescimento_vendas': crescimento_mes.get('vendas'),
+        'crescimento_receita': crescimento_mes.get('receita'),
+        'crescimento': crescimento_periodos,
+        'passeios_mais_vendidos': passeios_mais_vendidos[:5]
+    }
+
+
+def vagas_por_passeio():
+    """Vagas disponíveis de cada passeio hoje, na semana e no mês (como get_disponibilidade_resumo)"""
+    hoje = date.today()
+    fim_semana = (hoje + timedelta(days=JANELAS['semana'])).isoformat()
+    fim_mes = (hoje + timedelta(days=JANELAS['mes'])).isoformat()
+
+    rows = get_conn().execute('''
+        SELECT passeio_id,
+            SUM(CASE WHEN data = :hoje THEN disponiveis ELSE 0 END) AS vagas_dia,
+            SUM(CASE WHEN data <= :fim_semana THEN disponiveis ELSE 0 END) AS vagas_semana,
+            SUM(disponiveis) AS vagas_mes
+        FROM fato_disponibilidade
+        WHERE data BETWEEN :hoje AND :fim_mes
+        GROUP BY passeio_id
+    ''', {'hoje': hoje.isoformat(), 'fim_semana': fim_semana, 'fim_mes': fim_mes})
+
+    return {
+        row['passeio_id']: {
+            'vagas_dia': row['vagas_dia'],
+            'vagas_semana': row['vagas_semana'],
+            'vagas_mes': row['vagas_mes']
+        }
+        for row in rows
+    }
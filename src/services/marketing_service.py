@@ -0,0 +1,34 @@
+"""
+Serviço de dados de campanhas de marketing (Google Ads / Meta Ads)
+"""
+
+
+class MarketingService:
+    """
+    Fonte das campanhas de marketing
+
+    Enquanto as integrações com Google Ads e Meta Ads não existem,
+    as campanhas são mantidas aqui.
+    """
+
+    CAMPANHAS = [
+        {
+            'id': 1,
+            'nome': 'Campanha Verão 2024',
+            'plataforma': 'Google Ads',
+            'status': 'ativa',
+            'impressoes': 15420,
+            'cliques': 892,
+            'conversoes': 45,
+            'investimento': 1250.00,
+            'retorno': 4500.00
+        }
+    ]
+
+    def listar_campanhas(self):
+        """Lista todas as campanhas"""
+        return [dict(campanha) for campanha in self.CAMPANHAS]
+
+    def campanhas_por_plataforma(self, plataforma):
+        """Lista campanhas de uma plataforma (ex.: 'Google Ads', 'Meta Ads')"""
+        return [c for c in self.listar_campanhas() if c.get('plataforma') == plataforma]
@@ -0,0 +1,366 @@
+"""
+Pace de reservas (vendas em carteira por antecedência) e pickup por passeio
+
+- fato_disponibilidade_historico: snapshot datado (um por dia de captura) de
+  cada passeio × data do passeio, gravado por trigger sempre que a ingestão
+  altera capacidade ou vagas vendidas
+- pace_curva: matriz passeio × data do passeio × antecedência (dias antes do
+  passeio, em faixas ANTECEDENCIAS) com as vagas em carteira naquele ponto.
+  Cada snapshot atualiza, no mesmo trigger, as faixas menores ou iguais à sua
+  antecedência; como os snapshots chegam com antecedência decrescente, cada
+  faixa termina com o último valor capturado até aquela antecedência
+- As consultas comparam as datas do intervalo com as mesmas datas 364 dias
+  antes (mesmo dia da semana) na mesma antecedência, interpolando entre as
+  faixas vizinhas por busca na chave primária da matriz, sem varrer o
+  histórico
+"""
+from datetime import datetime, date, timedelta
+from services.db_service import get_conn, transacao
+from services import kpi_service
+
+# Faixas de antecedência (dias antes da data do passeio) da matriz de pace
+ANTECEDENCIAS = [0, 1, 2, 3, 5, 7, 10, 14, 21, 30, 45, 60, 90, 120, 180, 270, 365]
+
+# Janelas (dias) do relatório de pickup
+JANELAS_PICKUP = [1, 7, 30]
+
+DIAS_ANO_ANTERIOR = kpi_service.DIAS_ANO_ANTERIOR
+
+AGRUPAMENTOS = {
+    'total': "'total'",
+    'passeio': 'ly.passeio_id',
+    'data': 'ly.data',
+}
+
+_SNAPSHOT = '''
+    INSERT INTO fato_disponibilidade_historico (passeio_id, data, capturado_em, capacidade, vendidas)
+    VALUES (new.passeio_id, new.data, date(new.atualizado_em), new.capacidade, new.vendidas)
+    ON CONFLICT(passeio_id, data, capturado_em) DO UPDATE SET
+        capacidade = excluded.capacidade,
+        vendidas = excluded.vendidas;
+    INSERT INTO pace_curva (passeio_id, data, antecedencia, capacidade, vendidas)
+    SELECT new.passeio_id, new.data, a.antecedencia, new.capacidade, new.vendidas
+    FROM pace_antecedencias a
+    WHERE a.antecedencia <= julianday(new.data) - julianday(date(new.atualizado_em))
+    ON CONFLICT(passeio_id, data, antecedencia) DO UPDATE SET
+        capacidade = excluded.capacidade,
+        vendidas = excluded.vendidas;
+'''
+
+
+def init_db():
+    """Inicializa histórico de disponibilidade, matriz de pace e triggers"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fato_disponibilidade_historico (
+                    passeio_id INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    capturado_em TEXT NOT NULL,
+                    capacidade INTEGER NOT NULL,
+                    vendidas INTEGER NOT NULL,
+                    PRIMARY KEY (passeio_id, data, capturado_em)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pace_antecedencias (
+                    antecedencia INTEGER PRIMARY KEY
+                )
+            ''')
+            conn.executemany(
+                'INSERT OR IGNORE INTO pace_antecedencias (antecedencia) VALUES (?)',
+                [(antecedencia,) for antecedencia in ANTECEDENCIAS]
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pace_curva (
+                    passeio_id INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    antecedencia INTEGER NOT NULL,
+                    capacidade INTEGER NOT NULL,
+                    vendidas INTEGER NOT NULL,
+                    PRIMARY KEY (passeio_id, data, antecedencia)
+                ) WITHOUT ROWID
+            ''')
+
+            novo = not conn.execute('SELECT 1 FROM fato_disponibilidade_historico LIMIT 1').fetchone()
+
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS fato_disponibilidade_historico_ai
+                AFTER INSERT ON fato_disponibilidade BEGIN
+                    {_SNAPSHOT}
+                END
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS fato_disponibilidade_historico_au
+                AFTER UPDATE OF capacidade, vendidas ON fato_disponibilidade
+                WHEN old.capacidade != new.capacidade OR old.vendidas != new.vendidas BEGIN
+                    {_SNAPSHOT}
+                END
+            ''')
+
+            if novo:
+                _semear(conn)
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas de pace: {str(e)}")
+
+
+def _semear(conn):
+    """Primeiro snapshot a partir dos fatos já ingeridos (antes dos triggers existirem)"""
+    conn.execute('''
+        INSERT OR IGNORE INTO fato_disponibilidade_historico (passeio_id, data, capturado_em, capacidade, vendidas)
+        SELECT passeio_id, data, date(atualizado_em), capacidade, vendidas FROM fato_disponibilidade
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO pace_curva (passeio_id, data, antecedencia, capacidade, vendidas)
+        SELECT f.passeio_id, f.data, a.antecedencia, f.capacidade, f.vendidas
+        FROM fato_disponibilidade f JOIN pace_antecedencias a
+            ON a.antecedencia <= julianday(f.data) - julianday(date(f.atualizado_em))
+    ''')
+
+# Inicializar DB
+init_db()
+
+
+def _validar_intervalo(data_inicio, data_fim):
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    if fim < inicio:
+        raise ValueError('data_fim anterior a data_inicio')
+    return inicio, fim
+
+
+def proximo_mes(hoje=None):
+    """Intervalo (início, fim) do próximo mês civil"""
+    hoje = hoje or date.today()
+    inicio = (hoje.replace(day=28) + timedelta(days=4)).replace(day=1)
+    fim = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return inicio.isoformat(), fim.isoformat()
+
+
+def _variacao(atual, anterior):
+    if not anterior:
+        return None
+    return round((atual - anterior) / anterior * 100, 1)
+
+
+def _comparativo(row):
+    vendidas = row['vendidas'] or 0
+    capacidade = row['capacidade'] or 0
+    vendidas_ano = row['vendidas_ano_anterior']
+    capacidade_ano = row['capacidade_ano_anterior']
+    return {
+        'vendidas': vendidas,
+        'capacidade': capacidade,
+        'ocupacao': round(vendidas / capacidade, 4) if capacidade else 0,
+        'vendidas_ano_anterior': vendidas_ano,
+        'ocupacao_ano_anterior': round(vendidas_ano / capacidade_ano, 4) if capacidade_ano else None,
+        'final_ano_anterior': row['final_ano_anterior'],
+        'diferenca': vendidas - vendidas_ano if vendidas_ano is not None else None,
+        'variacao': _variacao(vendidas, vendidas_ano)
+    }
+
+
+def pace(data_inicio, data_fim, agrupar='total', passeio_id=None, hoje=None):
+    """
+    Vagas em carteira do intervalo contra o ano anterior na mesma antecedência
+
+    Para cada data do passeio, o ano anterior é a data 364 dias antes, com as
+    vagas em carteira interpoladas linearmente entre as duas faixas de
+    ANTECEDENCIAS que cercam a antecedência atual. final_ano_anterior é o
+    total vendido que aquelas datas atingiram.
+
+    Args:
+        data_inicio: Data inicial (YYYY-MM-DD)
+        data_fim: Data final (YYYY-MM-DD), inclusiva
+        agrupar: total, passeio ou data
+        passeio_id: Filtra um passeio
+        hoje: Data de referência (padrão: hoje)
+
+    Returns:
+        dict com grupos (lista) e totais
+    """
+    if agrupar not in AGRUPAMENTOS:
+        raise ValueError(f'Agrupamento inválido: {agrupar}')
+    _validar_intervalo(data_inicio, data_fim)
+    hoje = (hoje or date.today()).isoformat()
+
+    filtro = ''
+    params = [hoje, data_inicio, data_fim]
+    if passeio_id is not None:
+        filtro = 'AND f.passeio_id = ?'
+        params.append(int(passeio_id))
+
+    sql = f'''
+        WITH d AS (
+            SELECT f.passeio_id, f.data, f.capacidade, f.vendidas,
+                max(julianday(f.data) - julianday(?), 0) AS antecedencia
+            FROM fato_disponibilidade f
+            WHERE f.data BETWEEN ? AND ? {filtro}
+        ), faixas AS (
+            SELECT d.*,
+                (SELECT max(a.antecedencia) FROM pace_antecedencias a WHERE a.antecedencia <= d.antecedencia) AS faixa_de,
+                (SELECT min(a.antecedencia) FROM pace_antecedencias a WHERE a.antecedencia >= d.antecedencia) AS faixa_ate,
+                date(d.data, '-{DIAS_ANO_ANTERIOR} days') AS data_ano_anterior
+            FROM d
+        ), ly AS (
+            SELECT x.*, ate.capacidade AS capacidade_ano_anterior, fim.vendidas AS final_ano_anterior,
+                CASE
+                    WHEN ate.vendidas IS NULL OR de.vendidas IS NULL OR x.faixa_ate = x.faixa_de THEN ate.vendidas
+                    ELSE round(ate.vendidas + (de.vendidas - ate.vendidas)
+                        * (x.faixa_ate - x.antecedencia) / (x.faixa_ate - x.faixa_de))
+                END AS vendidas_ano_anterior
+            FROM faixas x
+            LEFT JOIN pace_curva ate ON ate.passeio_id = x.passeio_id
+                AND ate.data = x.data_ano_anterior AND ate.antecedencia = x.faixa_ate
+            LEFT JOIN pace_curva de ON de.passeio_id = x.passeio_id
+                AND de.data = x.data_ano_anterior AND de.antecedencia = x.faixa_de
+            LEFT JOIN pace_curva fim ON fim.passeio_id = x.passeio_id
+                AND fim.data = x.data_ano_anterior AND fim.antecedencia = 0
+        )
+        SELECT {AGRUPAMENTOS[agrupar]} AS grupo, max(p.titulo) AS titulo,
+            SUM(ly.capacidade) AS capacidade, SUM(ly.vendidas) AS vendidas,
+            SUM(ly.capacidade_ano_anterior) AS capacidade_ano_anterior,
+            CAST(SUM(ly.vendidas_ano_anterior) AS INTEGER) AS vendidas_ano_anterior,
+            SUM(ly.final_ano_anterior) AS final_ano_anterior
+        FROM ly LEFT JOIN dim_passeios p ON p.passeio_id = ly.passeio_id
+        GROUP BY grupo ORDER BY grupo
+    '''
+
+    grupos = []
+    totais = {'capacidade': 0, 'vendidas': 0, 'capacidade_ano_anterior': None,
+              'vendidas_ano_anterior': None, 'final_ano_anterior': None}
+    for row in get_conn().execute(sql, params):
+        item = {'grupo': row['grupo'], **_comparativo(row)}
+        if agrupar == 'passeio':
+            item['titulo'] = row['titulo']
+        grupos.append(item)
+        for chave in totais:
+            if row[chave] is not None:
+                totais[chave] = (totais[chave] or 0) + row[chave]
+
+    return {
+        'periodo': {'inicio': data_inicio, 'fim': data_fim},
+        'referencia': hoje,
+        'agrupar': agrupar,
+        'grupos': grupos,
+        'totais': _comparativo(totais)
+    }
+
+
+def curva(data_inicio, data_fim, passeio_id=None, hoje=None):
+    """
+    Curva de pace: vagas em carteira das datas do intervalo em cada faixa de
+    antecedência, deste ano e do ano anterior
+
+    Faixas que ainda não passaram para todas as datas do intervalo vêm com
+    vendidas None (o valor ainda pode mudar).
+    """
+    inicio, fim = _validar_intervalo(data_inicio, data_fim)
+    hoje = hoje or date.today()
+    # Faixa a partir da qual todas as datas do intervalo já tiveram a antecedência atingida
+    completa_a_partir = (fim - hoje).days
+
+    filtro = ''
+    params_filtro = []
+    if passeio_id is not None:
+        filtro = 'AND c.passeio_id = ?'
+        params_filtro.append(int(passeio_id))
+
+    deslocamento = timedelta(days=DIAS_ANO_ANTERIOR)
+    sql = f'''
+        SELECT c.antecedencia, SUM(c.capacidade) AS capacidade, SUM(c.vendidas) AS vendidas
+        FROM pace_curva c
+        WHERE c.data BETWEEN ? AND ? {filtro}
+        GROUP BY c.antecedencia
+    '''
+    conn = get_conn()
+    atual = {row['antecedencia']: row for row in conn.execute(sql, [data_inicio, data_fim] + params_filtro)}
+    anterior = {
+        row['antecedencia']: row
+        for row in conn.execute(sql, [
+            (inicio - deslocamento).isoformat(), (fim - deslocamento).isoformat()
+        ] + params_filtro)
+    }
+
+    pontos = []
+    for antecedencia in reversed(ANTECEDENCIAS):
+        linha = atual.get(antecedencia)
+        linha_ano = anterior.get(antecedencia)
+        completa = antecedencia >= completa_a_partir
+        pontos.append({
+            'antecedencia': antecedencia,
+            'vendidas': linha['vendidas'] if linha and completa else None,
+            'vendidas_ano_anterior': linha_ano['vendidas'] if linha_ano else None,
+            'capacidade_ano_anterior': linha_ano['capacidade'] if linha_ano else None
+        })
+
+    return {
+        'periodo': {'inicio': data_inicio, 'fim': data_fim},
+        'referencia': hoje.isoformat(),
+        'passeio_id': passeio_id,
+        'pontos': pontos
+    }
+
+
+def pickup(passeio_id, data_inicio, data_fim, hoje=None):
+    """
+    Relatório de pickup de um passeio: para cada data do intervalo, vagas em
+    carteira hoje, vendidas nos últimos JANELAS_PICKUP dias e comparação com
+    o ano anterior na mesma antecedência
+
+    O valor de N dias atrás é o último snapshot do histórico capturado até
+    aquela data (None se o histórico ainda não cobre a janela).
+    """
+    _validar_intervalo(data_inicio, data_fim)
+    hoje = hoje or date.today()
+
+    colunas_pickup = ',\n'.join(
+        f'''(SELECT h.vendidas FROM fato_disponibilidade_historico h
+             WHERE h.passeio_id = f.passeio_id AND h.data = f.data AND h.capturado_em <= ?
+             ORDER BY h.capturado_em DESC LIMIT 1) AS vendidas_{dias}d'''
+        for dias in JANELAS_PICKUP
+    )
+    sql = f'''
+        SELECT f.data, f.capacidade, f.vendidas,
+            {colunas_pickup}
+        FROM fato_disponibilidade f
+        WHERE f.passeio_id = ? AND f.data BETWEEN ? AND ?
+        ORDER BY f.data
+    '''
+    params = [(hoje - timedelta(days=dias)).isoformat() for dias in JANELAS_PICKUP]
+    params += [int(passeio_id), data_inicio, data_fim]
+
+    comparativo = pace(data_inicio, data_fim, agrupar='data', passeio_id=passeio_id, hoje=hoje)
+    ano_anterior = {item['grupo']: item for item in comparativo['grupos']}
+
+    datas = []
+    totais = {'vendidas': 0, 'capacidade': 0, **{f'pickup_{dias}d': 0 for dias in JANELAS_PICKUP}}
+    for row in get_conn().execute(sql, params):
+        antecedencia = (datetime.strptime(row['data'], '%Y-%m-%d').date() - hoje).days
+        comparacao = ano_anterior.get(row['data'], {})
+        item = {
+            'data': row['data'],
+            'antecedencia': antecedencia,
+            'capacidade': row['capacidade'],
+            'vendidas': row['vendidas'],
+            'vendidas_ano_anterior': comparacao.get('vendidas_ano_anterior'),
+            'final_ano_anterior': comparacao.get('final_ano_anterior'),
+        }
+        for dias in JANELAS_PICKUP:
+            base = row[f'vendidas_{dias}d']
+            item[f'pickup_{dias}d'] = row['vendidas'] - base if base is not None else None
+            totais[f'pickup_{dias}d'] += item[f'pickup_{dias}d'] or 0
+        totais['vendidas'] += row['vendidas']
+        totais['capacidade'] += row['capacidade']
+        datas.append(item)
+
+    totais['ocupacao'] = round(totais['vendidas'] / totais['capacidade'], 4) if totais['capacidade'] else 0
+
+    return {
+        'passeio_id': int(passeio_id),
+        'periodo': {'inicio': data_inicio, 'fim': data_fim},
+        'referencia': hoje.isoformat(),
+        'datas': datas,
+        'totais': totais,
+        'pace': comparativo['totais']
+    }
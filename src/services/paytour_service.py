@@ -101,6 +101,45 @@ class PaytourService:
             print(f"Exceção ao buscar passeios: {str(e)}")
             return {'passeios': [], 'info': {}}
     
+    def get_pedidos(self, atualizado_de=None, pagina=1, quantidade=100):
+        """
+        Lista pedidos/reservas da loja, opcionalmente a partir de uma data de atualização
+        
+        Resposta vem em formato:
+        {
+            "itens": [...],
+            "info": {"total": X, "pagina": Y, "total_paginas": Z}
+        }
+        """
+        try:
+            url = f"{self.base_url}/pedidos"
+            headers = self._get_headers()
+            
+            params = {
+                'pagina': pagina,
+                'quantidade': quantidade,
+                'ordenacao': 'data_atualizacao'
+            }
+            
+            if atualizado_de:
+                params['data_atualizacao_de'] = atualizado_de
+            
+            response = requests.get(url, headers=headers, params=params, timeout=30)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    'pedidos': data.get('itens', []),
+                    'info': data.get('info', {})
+                }
+            else:
+                print(f"Erro ao buscar pedidos: {response.status_code} - {response.text}")
+                return {'pedidos': [], 'info': {}}
+                
+        except Exception as e:
+            print(f"Exceção ao buscar pedidos: {str(e)}")
+            return {'pedidos': [], 'info': {}}
+    
     def get_passeio_detalhes(self, passeio_id, meses=3):
         """
         Obtém detalhes de um passeio específico incluindo disponibilidade
@@ -235,6 +274,55 @@ class PaytourService:
             print(f"Exceção ao calcular vendas: {str(e)}")
             return {'vagas_vendidas': 0, 'receita_estimada': 0, 'preco_medio': 0}
     
+    def resumo_vendas_passeios(self, periodo='mes', limite=None):
+        """
+        Coleta vendas estimadas por passeio (apenas passeios com vendas)
+        
+        Args:
+            periodo: dia, semana ou mes
+            limite: Quantidade máxima de passeios consultados
+        """
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        um_mes = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+        
+        result = self.get_passeios(data_de=hoje, data_ate=um_mes)
+        passeios_list = result.get('passeios', [])
+        
+        if limite:
+            passeios_list = passeios_list[:limite]
+        
+        dados = []
+        
+        for passeio in passeios_list:
+            vendas = self.calcular_vendas_estimadas(passeio.get('id'), periodo=periodo)
+            
+            if vendas['vagas_vendidas'] > 0:
+                dados.append({
+                    'passeio': passeio.get('titulo', ''),
+                    'vendas': vendas['vagas_vendidas'],
+                    'receita': vendas['receita_estimada']
+                })
+        
+        return dados
+    
+    def listar_todos_passeios(self, data_de=None, data_ate=None, quantidade=100):
+        """Percorre todas as páginas de passeios"""
+        passeios = []
+        pagina = 1
+        
+        while True:
+            result = self.get_passeios(data_de=data_de, data_ate=data_ate, pagina=pagina, quantidade=quantidade)
+            itens = result.get('passeios', [])
+            passeios.extend(itens)
+            
+            total_paginas = result.get('info', {}).get('total_paginas')
+            if not itens or len(itens) < quantidade or (total_paginas and pagina >= int(total_paginas)):
+                break
+            pagina += 1
+        
+        return passeios
+    
+    
     def test_connection(self):
         """Testa conexão com a API Paytour"""
         try:
@@ -0,0 +1,264 @@
+"""
+Sincronização incremental de pedidos Paytour para os clientes do CRM
+
+- Busca apenas pedidos atualizados desde a última execução (high-water mark)
+- Cada página é gravada em uma única transação com executemany/ON CONFLICT
+- total_compras, valor_total e ultima_compra são ajustados por diferença
+  em relação ao estado já contabilizado de cada pedido, sem recalcular a base
+"""
+import time
+from datetime import datetime
+from services.db_service import get_conn, transacao, normalizar_email
+from services.paytour_service import PaytourService
+
+CHAVE_HWM = 'paytour_pedidos_hwm'
+
+# Situações de pedido que contam como compra
+STATUS_CONTABILIZADOS = {'aprovado', 'pago', 'confirmado', 'concluido', 'finalizado', 'utilizado'}
+
+TAMANHO_PAGINA = 200
+
+
+def init_db():
+    """Inicializa tabelas de controle da sincronização"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_estado (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT,
+                    atualizado_em TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS paytour_pedidos (
+                    pedido_id TEXT PRIMARY KEY,
+                    cliente_email TEXT NOT NULL,
+                    valor REAL DEFAULT 0,
+                    contabilizado INTEGER DEFAULT 0,
+                    data_pedido TEXT,
+                    status TEXT,
+                    atualizado_em TEXT
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_paytour_pedidos_email ON paytour_pedidos (cliente_email)'
+            )
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas de sincronização: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+SQL_UPSERT_CLIENTE = '''
+    INSERT INTO clientes (nome, email, telefone, cpf, cidade, estado, origem)
+    VALUES (?, ?, ?, ?, ?, ?, 'paytour')
+    ON CONFLICT(email) DO UPDATE SET
+        nome = CASE WHEN coalesce(clientes.nome, '') = '' THEN excluded.nome ELSE clientes.nome END,
+        telefone = CASE WHEN coalesce(clientes.telefone, '') = '' THEN excluded.telefone ELSE clientes.telefone END,
+        cpf = CASE WHEN coalesce(clientes.cpf, '') = '' THEN excluded.cpf ELSE clientes.cpf END,
+        cidade = CASE WHEN coalesce(clientes.cidade, '') = '' THEN excluded.cidade ELSE clientes.cidade END,
+        estado = CASE WHEN coalesce(clientes.estado, '') = '' THEN excluded.estado ELSE clientes.estado END
+'''
+
+SQL_AJUSTAR_AGREGADOS = '''
+    UPDATE clientes SET
+        total_compras = max(0, coalesce(total_compras, 0) + ?),
+        valor_total = max(0, coalesce(valor_total, 0) + ?),
+        ultima_compra = CASE
+            WHEN ? IS NOT NULL AND (ultima_compra IS NULL OR ultima_compra < ?) THEN ?
+            ELSE ultima_compra
+        END
+    WHERE email = ?
+'''
+
+SQL_UPSERT_PEDIDO = '''
+    INSERT INTO paytour_pedidos (pedido_id, cliente_email, valor, contabilizado, data_pedido, status, atualizado_em)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(pedido_id) DO UPDATE SET
+        cliente_email = excluded.cliente_email,
+        valor = excluded.valor,
+        contabilizado = excluded.contabilizado,
+        data_pedido = excluded.data_pedido,
+        status = excluded.status,
+        atualizado_em = excluded.atualizado_em
+'''
+
+
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+
+def normalizar_pedido(pedido):
+    """
+    Extrai do pedido Paytour os campos usados pelo CRM
+
+    Retorna None para pedidos sem email do cliente.
+    """
+    cliente = pedido.get('cliente') or pedido.get('comprador') or {}
+    email = normalizar_email(cliente.get('email') or pedido.get('email'))
+
+    if not email:
+        return None
+
+    status = _texto(pedido.get('status') or pedido.get('situacao')).lower()
+    data_pedido = _texto(pedido.get('data_pedido') or pedido.get('data_criacao') or pedido.get('created_at'))
+    atualizado_em = _texto(
+        pedido.get('data_atualizacao') or pedido.get('updated_at') or data_pedido
+    )
+
+    try:
+        valor = float(pedido.get('valor_total') or pedido.get('valor') or 0)
+    except (TypeError, ValueError):
+        valor = 0.0
+
+    return {
+        'pedido_id': _texto(pedido.get('id') or pedido.get('codigo')),
+        'email': email,
+        'nome': _texto(cliente.get('nome') or pedido.get('nome')) or email,
+        'telefone': _texto(cliente.get('telefone') or cliente.get('celular')),
+        'cpf': _texto(cliente.get('cpf') or cliente.get('documento')),
+        'cidade': _texto(cliente.get('cidade')),
+        'estado': _texto(cliente.get('estado') or cliente.get('uf')),
+        'valor': valor,
+        'contabilizado': 1 if status in STATUS_CONTABILIZADOS else 0,
+        'data_pedido': data_pedido[:19].replace('T', ' ') or None,
+        'status': status,
+        'atualizado_em': atualizado_em
+    }
+
+
+class PaytourSyncService:
+    def __init__(self, paytour=None):
+        self.paytour = paytour or PaytourService()
+
+    def obter_hwm(self):
+        """Data de atualização do último pedido sincronizado"""
+        row = get_conn().execute('SELECT valor FROM sync_estado WHERE chave = ?', (CHAVE_HWM,)).fetchone()
+        return row['valor'] if row else None
+
+    def aplicar_lote(self, pedidos):
+        """
+        Grava um lote de pedidos normalizados em uma única transação
+
+        Returns:
+            (clientes afetados, maior data de atualização do lote)
+        """
+        pedidos = [p for p in pedidos if p and p['pedido_id']]
+        if not pedidos:
+            return 0, None
+
+        # Última versão de cada pedido dentro do lote
+        por_id = {}
+        for pedido in pedidos:
+            por_id[pedido['pedido_id']] = pedido
+
+        with transacao() as conn:
+            marcadores = ','.join('?' * len(por_id))
+            anteriores = {
+                row['pedido_id']: row
+                for row in conn.execute(
+                    f'SELECT * FROM paytour_pedidos WHERE pedido_id IN ({marcadores})',
+                    list(por_id.keys())
+                )
+            }
+
+            # Diferenças por cliente: (compras, valor, maior data de compra)
+            deltas = {}
+            for pedido_id, pedido in por_id.items():
+                anterior = anteriores.get(pedido_id)
+                if anterior and anterior['contabilizado']:
+                    delta = deltas.setdefault(anterior['cliente_email'], [0, 0.0, None])
+                    delta[0] -= 1
+                    delta[1] -= anterior['valor'] or 0
+                if pedido['contabilizado']:
+                    delta = deltas.setdefault(pedido['email'], [0, 0.0, None])
+                    delta[0] += 1
+                    delta[1] += pedido['valor']
+                    if pedido['data_pedido'] and (delta[2] is None or pedido['data_pedido'] > delta[2]):
+                        delta[2] = pedido['data_pedido']
+
+            # Clientes únicos do lote
+            clientes = {}
+            for pedido in por_id.values():
+                clientes[pedido['email']] = (
+                    pedido['nome'], pedido['email'], pedido['telefone'],
+                    pedido['cpf'], pedido['cidade'], pedido['estado']
+                )
+
+            conn.executemany(SQL_UPSERT_CLIENTE, list(clientes.values()))
+            conn.executemany(SQL_AJUSTAR_AGREGADOS, [
+                (compras, valor, data, data, data, email)
+                for email, (compras, valor, data) in deltas.items()
+                if compras or valor or data
+            ])
+            conn.executemany(SQL_UPSERT_PEDIDO, [
+                (p['pedido_id'], p['email'], p['valor'], p['contabilizado'],
+                 p['data_pedido'], p['status'], p['atualizado_em'])
+                for p in por_id.values()
+            ])
+
+            hwm = max(p['atualizado_em'] for p in por_id.values())
+            conn.execute('''
+                INSERT INTO sync_estado (chave, valor, atualizado_em) VALUES (?, ?, ?)
+                ON CONFLICT(chave) DO UPDATE SET
+                    valor = max(coalesce(sync_estado.valor, ''), excluded.valor),
+                    atualizado_em = excluded.atualizado_em
+            ''', (CHAVE_HWM, hwm, datetime.now().isoformat()))
+
+        return len(clientes), hwm
+
+    def sincronizar(self, max_paginas=None):
+        """
+        Executa a sincronização incremental
+
+        Returns:
+            Relatório com quantidades, duração e vazão (pedidos/s)
+        """
+        inicio = time.time()
+        hwm_inicial = self.obter_hwm()
+        pagina = 1
+        total_pedidos = 0
+        ignorados = 0
+        clientes_afetados = 0
+        hwm = hwm_inicial
+
+        while True:
+            resultado = self.paytour.get_pedidos(
+                atualizado_de=hwm_inicial,
+                pagina=pagina,
+                quantidade=TAMANHO_PAGINA
+            )
+            itens = resultado.get('pedidos', [])
+            if not itens:
+                break
+
+            normalizados = [normalizar_pedido(item) for item in itens]
+            ignorados += sum(1 for p in normalizados if p is None)
+
+            afetados, hwm_lote = self.aplicar_lote(normalizados)
+            clientes_afetados += afetados
+            total_pedidos += len(itens)
+            if hwm_lote and (hwm is None or hwm_lote > hwm):
+                hwm = hwm_lote
+
+            total_paginas = resultado.get('info', {}).get('total_paginas')
+            if (total_paginas and pagina >= int(total_paginas)) or len(itens) < TAMANHO_PAGINA:
+                break
+            if max_paginas and pagina >= max_paginas:
+                break
+            pagina += 1
+
+        duracao = time.time() - inicio
+
+        return {
+            'pedidos_processados': total_pedidos,
+            'pedidos_ignorados': ignorados,
+            'clientes_afetados': clientes_afetados,
+            'paginas': pagina if total_pedidos else 0,
+            'hwm_anterior': hwm_inicial,
+            'hwm_atual': hwm,
+            'duracao_segundos': round(duracao, 2),
+            'pedidos_por_segundo': round(total_pedidos / duracao, 1) if duracao > 0 else 0
+        }
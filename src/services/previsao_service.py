@@ -0,0 +1,363 @@
+"""
+Previsão de ocupação final por passeio e data
+
+- Treino offline (job): para cada faixa de antecedência da matriz de pace,
+  uma regressão ridge em NumPy prevê a ocupação final de uma data a partir
+  da ocupação em carteira naquela antecedência, dia da semana, mês
+  (sazonalidade) e score de clima, mais um viés por passeio
+- O clima de cada data vem de clima_diario, preenchida pelo job com a
+  previsão do WeatherService (a última previsão antes da data fica como
+  histórico para o treino)
+- O modelo é gravado em um .npz pequeno (coeficientes por faixa e viés por
+  passeio) e mantido em memória; a inferência é uma multiplicação de
+  matrizes vetorizada sobre as datas pedidas
+"""
+import os
+import time
+import threading
+from datetime import datetime, date
+import numpy as np
+from services.db_service import get_conn, transacao
+from services import pace_service, kpi_service, cache_service
+
+MODELO_PATH = os.getenv(
+    'PREVISAO_MODELO_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'modelos', 'previsao_ocupacao.npz')
+)
+
+# Regularização da ridge e do viés por passeio
+LAMBDA = 1.0
+SUAVIZACAO_VIES = 20
+# Faixas com menos amostras que isso usam a ocupação em carteira como previsão
+MIN_AMOSTRAS = 50
+
+# Score de clima considerado neutro (dias sem previsão registrada)
+CLIMA_NEUTRO = 100
+# Dias de previsão do tempo disponíveis; antecedências maiores usam o clima
+# neutro no treino e na inferência (o modelo não aprende com um clima que
+# não se conhece ao prever)
+HORIZONTE_CLIMA_DIAS = 5
+
+# intercepto, ocupação em carteira, 6 dias da semana, 11 meses, clima
+N_VARIAVEIS = 1 + 1 + 6 + 11 + 1
+
+
+def init_db():
+    """Inicializa tabela do histórico de clima usado pela previsão"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clima_diario (
+                    data TEXT PRIMARY KEY,
+                    score INTEGER NOT NULL,
+                    chuva_prob REAL,
+                    temp_max REAL,
+                    vento REAL,
+                    registrado_em TIMESTAMP
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabela de clima: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+def registrar_clima(weather=None, dias=HORIZONTE_CLIMA_DIAS):
+    """Grava a previsão do tempo dos próximos dias em clima_diario (substitui a anterior)"""
+    from services.weather_service import WeatherService
+
+    weather = weather or WeatherService()
+    previsao = weather.get_forecast(days=dias)
+    impactos = {item['data']: item['score'] for item in weather.analyze_impact(previsao)}
+    agora = datetime.now().isoformat(timespec='seconds')
+
+    with transacao() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO clima_diario (data, score, chuva_prob, temp_max, vento, registrado_em)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (dia['data'], impactos[dia['data']], dia.get('chuva_prob'), dia.get('temp_max'), dia.get('vento'), agora)
+            for dia in previsao
+        ])
+
+    cache_service.invalidar_seguro('clima', 'dashboard')
+    return len(previsao)
+
+
+def _clima(datas, antecedencia):
+    """
+    Score de clima de cada data (CLIMA_NEUTRO quando não registrado ou quando
+    a antecedência passa de HORIZONTE_CLIMA_DIAS)
+    """
+    if not len(datas):
+        return np.zeros(0)
+
+    scores = dict(get_conn().execute(
+        'SELECT data, score FROM clima_diario WHERE data BETWEEN ? AND ?',
+        (str(datas.min()), str(datas.max()))
+    ).fetchall())
+    clima = np.array([scores.get(str(d), CLIMA_NEUTRO) for d in datas], dtype=np.float64)
+    return np.where(antecedencia <= HORIZONTE_CLIMA_DIAS, clima, CLIMA_NEUTRO)
+
+
+def _variaveis(ocupacao, datas, clima):
+    """Matriz de variáveis (n × N_VARIAVEIS) para ocupações e datas (datetime64[D])"""
+    n = len(datas)
+    dias = datas.astype('datetime64[D]').astype(np.int64)
+    dia_semana = (dias + 3) % 7  # 0 = segunda-feira
+    mes = datas.astype('datetime64[M]').astype(np.int64) % 12  # 0 = janeiro
+
+    x = np.zeros((n, N_VARIAVEIS))
+    x[:, 0] = 1
+    x[:, 1] = ocupacao
+    # Segunda-feira e janeiro são a referência (sem coluna)
+    linhas = np.arange(n)
+    com_dia = dia_semana > 0
+    x[linhas[com_dia], 1 + dia_semana[com_dia]] = 1
+    com_mes = mes > 0
+    x[linhas[com_mes], 7 + mes[com_mes]] = 1
+    x[:, -1] = (clima - CLIMA_NEUTRO) / 100
+    return x
+
+
+def _ridge(x, y):
+    penalidade = LAMBDA * np.eye(x.shape[1])
+    penalidade[0, 0] = 0  # sem penalizar o intercepto
+    return np.linalg.solve(x.T @ x + penalidade, x.T @ y)
+
+
+def _identidade():
+    """Coeficientes que preveem a própria ocupação em carteira"""
+    coeficientes = np.zeros(N_VARIAVEIS)
+    coeficientes[1] = 1
+    return coeficientes
+
+
+def treinar(hoje=None, salvar=True):
+    """
+    Treina o modelo com as datas já realizadas da matriz de pace
+
+    Returns:
+        Relatório com amostras e erro médio absoluto (ocupação) por faixa
+    """
+    inicio = time.time()
+    hoje = (hoje or date.today()).isoformat()
+
+    rows = get_conn().execute('''
+        SELECT c.passeio_id, c.data, c.antecedencia, c.capacidade, c.vendidas, f.vendidas AS final
+        FROM pace_curva c
+        JOIN pace_curva f ON f.passeio_id = c.passeio_id AND f.data = c.data AND f.antecedencia = 0
+        WHERE c.data < ? AND c.capacidade > 0
+    ''', (hoje,)).fetchall()
+
+    if rows:
+        passeios, datas, antecedencias, capacidades, vendidas, finais = (np.array(col) for col in zip(*rows))
+    else:
+        passeios = antecedencias = np.zeros(0, dtype=np.int64)
+        capacidades = vendidas = finais = np.zeros(0)
+        datas = np.array([], dtype=str)
+
+    datas = datas.astype('datetime64[D]')
+    ocupacao = vendidas / np.where(capacidades > 0, capacidades, 1)
+    y = np.minimum(finais / np.where(capacidades > 0, capacidades, 1), 1)
+    x = _variaveis(ocupacao, datas, _clima(datas, antecedencias))
+
+    faixas = np.array(pace_service.ANTECEDENCIAS)
+    coeficientes = np.tile(_identidade(), (len(faixas), 1))
+    amostras = np.zeros(len(faixas), dtype=np.int64)
+    erros = np.full(len(faixas), np.nan)
+    residuos = np.zeros(len(y))
+
+    for i, faixa in enumerate(faixas):
+        mascara = antecedencias == faixa
+        amostras[i] = mascara.sum()
+        if amostras[i] >= MIN_AMOSTRAS:
+            coeficientes[i] = _ridge(x[mascara], y[mascara])
+        residuos[mascara] = y[mascara] - x[mascara] @ coeficientes[i]
+        if amostras[i]:
+            erros[i] = np.abs(residuos[mascara]).mean()
+
+    # Viés por passeio: média dos resíduos, encolhida para zero em passeios com pouco histórico
+    ids, indices = np.unique(passeios, return_inverse=True)
+    soma = np.bincount(indices, weights=residuos, minlength=len(ids))
+    quantidade = np.bincount(indices, minlength=len(ids))
+    vies = soma / (quantidade + SUAVIZACAO_VIES)
+
+    treinado_em = datetime.now().isoformat(timespec='seconds')
+    modelo = {
+        'antecedencias': faixas,
+        'coeficientes': coeficientes,
+        'passeio_ids': ids.astype(np.int64),
+        'vies': vies,
+        'amostras': amostras,
+        'erros': erros,
+        'treinado_em': np.array(treinado_em)
+    }
+
+    if salvar:
+        os.makedirs(os.path.dirname(MODELO_PATH), exist_ok=True)
+        temporario = MODELO_PATH + '.tmp.npz'
+        np.savez_compressed(temporario, **modelo)
+        os.replace(temporario, MODELO_PATH)
+        cache_service.invalidar_seguro('financeiro')
+
+    return {
+        'amostras': int(len(y)),
+        'passeios': int(len(ids)),
+        'por_antecedencia': [
+            {
+                'antecedencia': int(faixa),
+                'amostras': int(amostras[i]),
+                'erro_medio': round(float(erros[i]), 4) if amostras[i] else None
+            }
+            for i, faixa in enumerate(faixas)
+        ],
+        'treinado_em': treinado_em,
+        'duracao_segundos': round(time.time() - inicio, 2)
+    }
+
+
+_modelo = None
+_modelo_mtime = None
+_modelo_lock = threading.Lock()
+
+
+def carregar_modelo():
+    """Modelo em memória, recarregado quando o arquivo muda (None se não treinado)"""
+    global _modelo, _modelo_mtime
+
+    try:
+        mtime = os.path.getmtime(MODELO_PATH)
+    except OSError:
+        return None
+
+    with _modelo_lock:
+        if _modelo is None or _modelo_mtime != mtime:
+            with np.load(MODELO_PATH) as arquivo:
+                _modelo = {chave: arquivo[chave] for chave in arquivo.files}
+            _modelo['treinado_em'] = str(_modelo['treinado_em'])
+            _modelo_mtime = mtime
+    return _modelo
+
+
+def versao():
+    """
+    Versão dos dados da previsão: arquivo do modelo, clima registrado e cubo
+    de KPIs (ocupação em carteira); None se o modelo não foi treinado
+    """
+    try:
+        mtime = os.path.getmtime(MODELO_PATH)
+    except OSError:
+        return None
+
+    clima = get_conn().execute('SELECT MAX(registrado_em) FROM clima_diario').fetchone()[0]
+    return f"{mtime}:{clima}:{kpi_service.versao()}"
+
+
+def prever(modelo, passeio_ids, datas, ocupacao, antecedencia, clima):
+    """
+    Ocupação final prevista (vetorizada)
+
+    A previsão de cada data é interpolada entre os modelos das duas faixas de
+    antecedência vizinhas e limitada entre a ocupação em carteira e 1.
+
+    Args:
+        modelo: Retorno de carregar_modelo
+        passeio_ids, ocupacao, antecedencia, clima: Arrays de mesmo tamanho
+        datas: Array datetime64[D]
+    """
+    x = _variaveis(ocupacao, datas, clima)
+    faixas = modelo['antecedencias']
+    antecedencia = np.clip(antecedencia, 0, faixas[-1])
+
+    ate = np.searchsorted(faixas, antecedencia, side='left')
+    de = np.where(faixas[ate] == antecedencia, ate, ate - 1)
+    previsto_ate = np.einsum('ij,ij->i', x, modelo['coeficientes'][ate])
+    previsto_de = np.einsum('ij,ij->i', x, modelo['coeficientes'][de])
+    largura = np.where(ate > de, faixas[ate] - faixas[de], 1)
+    peso = (faixas[ate] - antecedencia) / largura
+    previsto = previsto_ate + (previsto_de - previsto_ate) * peso
+
+    ids = modelo['passeio_ids']
+    if len(ids):
+        posicao = np.clip(np.searchsorted(ids, passeio_ids), 0, len(ids) - 1)
+        previsto += np.where(ids[posicao] == passeio_ids, modelo['vies'][posicao], 0)
+
+    return np.clip(previsto, ocupacao, 1)
+
+
+def prever_periodo(data_inicio, data_fim, passeio_id=None, hoje=None):
+    """
+    Ocupação e vagas vendidas previstas por data (de um passeio ou de todos)
+
+    Returns:
+        dict com datas (lista) e totais, ou None se o modelo não foi treinado
+    """
+    modelo = carregar_modelo()
+    if modelo is None:
+        return None
+
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    if fim < inicio:
+        raise ValueError('data_fim anterior a data_inicio')
+    hoje = hoje or date.today()
+
+    sql = 'SELECT passeio_id, data, capacidade, vendidas FROM fato_disponibilidade WHERE data BETWEEN ? AND ?'
+    params = [data_inicio, data_fim]
+    if passeio_id is not None:
+        sql += ' AND passeio_id = ?'
+        params.append(int(passeio_id))
+    rows = get_conn().execute(sql, params).fetchall()
+
+    if rows:
+        passeios, datas, capacidades, vendidas = (np.array(col) for col in zip(*rows))
+    else:
+        passeios = np.zeros(0, dtype=np.int64)
+        capacidades = vendidas = np.zeros(0)
+        datas = np.array([], dtype=str)
+
+    datas = datas.astype('datetime64[D]')
+    ocupacao = vendidas / np.where(capacidades > 0, capacidades, 1)
+    antecedencia = (datas - np.datetime64(hoje, 'D')).astype(np.int64)
+    # Datas passadas já estão realizadas
+    previsto = np.where(
+        antecedencia < 0,
+        ocupacao,
+        prever(modelo, passeios, datas, ocupacao, antecedencia, _clima(datas, antecedencia))
+    )
+    vendidas_previstas = previsto * capacidades
+
+    # Agregado por data
+    dias, indices = np.unique(datas, return_inverse=True)
+    soma_capacidade = np.bincount(indices, weights=capacidades, minlength=len(dias))
+    soma_vendidas = np.bincount(indices, weights=vendidas, minlength=len(dias))
+    soma_previstas = np.bincount(indices, weights=vendidas_previstas, minlength=len(dias))
+
+    def ocupacao_de(vendas, capacidade):
+        return round(float(vendas / capacidade), 4) if capacidade else 0
+
+    return {
+        'periodo': {'inicio': data_inicio, 'fim': data_fim},
+        'passeio_id': passeio_id,
+        'treinado_em': modelo['treinado_em'],
+        'datas': [
+            {
+                'data': str(dia),
+                'capacidade': int(soma_capacidade[i]),
+                'vendidas': int(soma_vendidas[i]),
+                'vendidas_previstas': int(round(soma_previstas[i])),
+                'ocupacao_atual': ocupacao_de(soma_vendidas[i], soma_capacidade[i]),
+                'ocupacao_prevista': ocupacao_de(soma_previstas[i], soma_capacidade[i])
+            }
+            for i, dia in enumerate(dias)
+        ],
+        'totais': {
+            'capacidade': int(capacidades.sum()),
+            'vendidas': int(vendidas.sum()),
+            'vendidas_previstas': int(round(vendidas_previstas.sum())),
+            'ocupacao_atual': ocupacao_de(vendidas.sum(), capacidades.sum()),
+            'ocupacao_prevista': ocupacao_de(vendidas_previstas.sum(), capacidades.sum())
+        }
+    }
@@ -0,0 +1,168 @@
+"""
+Serialização compacta de dados tabulares para prompts de IA
+
+Em vez do repr de listas de dicts (chaves e aspas repetidas em cada linha),
+os dados são enviados como cabeçalho + linhas separadas por "|", ordenados
+por relevância e cortados para caber em um orçamento de tokens. As linhas
+que não cabem são agregadas em uma única linha "outros".
+"""
+import os
+
+try:
+    import tiktoken
+except ImportError:  # tokenizador opcional; sem ele usamos a estimativa por caracteres
+    tiktoken = None
+
+ORCAMENTO_TOKENS_PADRAO = int(os.getenv('AI_PROMPT_ORCAMENTO_TOKENS', 1200))
+
+# Média de caracteres por token para texto em português com números
+CARACTERES_POR_TOKEN = 3.5
+
+_encoding = None
+
+
+def estimar_tokens(texto):
+    """Estima a quantidade de tokens de um texto localmente"""
+    global _encoding
+
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('o200k_base')
+        return len(_encoding.encode(texto))
+
+    return int(len(texto) / CARACTERES_POR_TOKEN) + 1
+
+
+def _formatar_valor(valor):
+    """Formata um valor da forma mais curta possível"""
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    if isinstance(valor, float):
+        valor = round(valor, 2)
+        if valor.is_integer():
+            return str(int(valor))
+        return f"{valor:.2f}".rstrip('0')
+    return str(valor).replace('|', '/').replace('\n', ' ')
+
+
+def _e_numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+
+def agrupar_linhas(linhas, chave):
+    """
+    Pré-agrega linhas com a mesma chave somando as colunas numéricas
+
+    Args:
+        linhas: Lista de dicts
+        chave: Coluna usada para agrupar
+    """
+    grupos = {}
+
+    for linha in linhas:
+        valor_chave = linha.get(chave)
+        grupo = grupos.get(valor_chave)
+
+        if grupo is None:
+            grupos[valor_chave] = dict(linha)
+            continue
+
+        for coluna, valor in linha.items():
+            if coluna != chave and _e_numero(valor) and _e_numero(grupo.get(coluna)):
+                grupo[coluna] += valor
+
+    return list(grupos.values())
+
+
+def serializar_tabela(linhas, colunas=None):
+    """
+    Serializa lista de dicts como cabeçalho + linhas separadas por "|"
+
+    Args:
+        linhas: Lista de dicts
+        colunas: Colunas a incluir (padrão: chaves da primeira linha)
+    """
+    if not linhas:
+        return '(sem dados)'
+
+    colunas = colunas or list(linhas[0].keys())
+    saida = ['|'.join(colunas)]
+
+    for linha in linhas:
+        saida.append('|'.join(_formatar_valor(linha.get(coluna)) for coluna in colunas))
+
+    return '\n'.join(saida)
+
+
+def compactar_tabela(linhas, colunas=None, ordenar_por=None, agrupar_por=None, orcamento_tokens=None):
+    """
+    Serializa dados tabulares respeitando um orçamento de tokens
+
+    As linhas são (opcionalmente) agrupadas, ordenadas de forma decrescente
+    pela coluna de relevância e incluídas até o orçamento se esgotar. O
+    restante vira uma linha "outros (N)" com a soma das colunas numéricas.
+
+    Args:
+        linhas: Lista de dicts
+        colunas: Colunas a incluir (padrão: chaves da primeira linha)
+        ordenar_por: Coluna numérica usada para ranquear as linhas
+        agrupar_por: Coluna usada para pré-agregar linhas repetidas
+        orcamento_tokens: Limite de tokens (padrão: AI_PROMPT_ORCAMENTO_TOKENS)
+    """
+    if not linhas:
+        return '(sem dados)'
+
+    orcamento = orcamento_tokens or ORCAMENTO_TOKENS_PADRAO
+    colunas = colunas or list(linhas[0].keys())
+
+    if agrupar_por:
+        linhas = agrupar_linhas(linhas, agrupar_por)
+
+    if ordenar_por:
+        linhas = sorted(
+            linhas,
+            key=lambda linha: linha.get(ordenar_por) if _e_numero(linha.get(ordenar_por)) else 0,
+            reverse=True
+        )
+
+    cabecalho = '|'.join(colunas)
+    saida = [cabecalho]
+    # Reservar espaço para a linha de agregação do restante
+    usados = estimar_tokens(cabecalho) + 16
+    incluidas = 0
+
+    for linha in linhas:
+        texto = '|'.join(_formatar_valor(linha.get(coluna)) for coluna in colunas)
+        custo = estimar_tokens(texto) + 1
+        if usados + custo > orcamento:
+            break
+        saida.append(texto)
+        usados += custo
+        incluidas += 1
+
+    restantes = linhas[incluidas:]
+    if restantes:
+        outros = {}
+        for coluna in colunas:
+            valores = [linha.get(coluna) for linha in restantes if _e_numero(linha.get(coluna))]
+            outros[coluna] = sum(valores) if valores else None
+        outros[colunas[0]] = f"outros ({len(restantes)})"
+        saida.append('|'.join(_formatar_valor(outros.get(coluna)) for coluna in colunas))
+
+    return '\n'.join(saida)
+
+
+def formatar_dados(dados, **kwargs):
+    """
+    Formata dados arbitrários para inclusão em prompt
+
+    Listas de dicts são compactadas com compactar_tabela; outros valores
+    são convertidos para texto sem alteração.
+    """
+    if isinstance(dados, list) and dados and all(isinstance(item, dict) for item in dados):
+        return compactar_tabela(dados, **kwargs)
+    if isinstance(dados, dict) and dados and all(not isinstance(v, (list, dict)) for v in dados.values()):
+        return '\n'.join(f"{chave}: {_formatar_valor(valor)}" for chave, valor in dados.items())
+    return str(dados)
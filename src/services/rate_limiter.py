@@ -0,0 +1,155 @@
+"""
+Limitadores de taxa (token bucket)
+
+- RateLimiter: em memória, compartilhado entre as threads do processo
+- RateLimiterCompartilhado: estado no SQLite (tabela limites_taxa), mesmo
+  limite para todos os workers gunicorn e jobs que usam o mesmo nome
+"""
+import time
+import threading
+from services.db_service import transacao
+
+
+def init_db():
+    """Inicializa a tabela dos limitadores compartilhados"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS limites_taxa (
+                    nome TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabela de limites de taxa: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+class RateLimiter:
+    """
+    Token bucket thread-safe
+
+    Args:
+        por_minuto: Quantidade de liberações por minuto (0 ou menos: sem limite)
+        rajada: Liberações acumuláveis para picos (padrão: 1/6 da taxa)
+    """
+
+    def __init__(self, por_minuto, rajada=None):
+        self.ilimitado = por_minuto <= 0
+        self.taxa = max(por_minuto, 0) / 60.0
+        self.capacidade = float(rajada or max(1, por_minuto // 6))
+        self.tokens = self.capacidade
+        self.atualizado_em = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+
+    def tentar(self):
+        """Consome um token se disponível, sem bloquear"""
+        if self.ilimitado:
+            return True
+
+        with self.lock:
+            self._repor()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até haver um token disponível (ou o timeout expirar)"""
+        if self.ilimitado:
+            return True
+
+        limite = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self.lock:
+                self._repor()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                espera = (1 - self.tokens) / self.taxa
+
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+
+            time.sleep(espera)
+
+
+class RateLimiterCompartilhado:
+    """
+    Token bucket com estado no SQLite, compartilhado entre processos
+
+    Cada liberação é uma transação curta (BEGIN IMMEDIATE) que repõe e
+    consome os tokens do nome informado; a espera acontece fora dela.
+
+    Args:
+        nome: Identificador do limite (processos com o mesmo nome dividem a taxa)
+        por_minuto: Quantidade de liberações por minuto (0 ou menos: sem limite)
+        rajada: Liberações acumuláveis para picos (padrão: 1/6 da taxa)
+    """
+
+    def __init__(self, nome, por_minuto, rajada=None):
+        self.nome = nome
+        self.ilimitado = por_minuto <= 0
+        self.taxa = max(por_minuto, 0) / 60.0
+        self.capacidade = float(rajada or max(1, por_minuto // 6))
+
+    def _consumir(self):
+        """Consome um token se disponível; retorna a espera em segundos (0 se consumiu)"""
+        agora = time.time()
+        with transacao() as conn:
+            row = conn.execute(
+                'SELECT tokens, atualizado_em FROM limites_taxa WHERE nome = ?', (self.nome,)
+            ).fetchone()
+            if row:
+                # Relógio voltando não gera tokens negativos
+                decorrido = max(agora - row['atualizado_em'], 0)
+                tokens = min(self.capacidade, row['tokens'] + decorrido * self.taxa)
+            else:
+                tokens = self.capacidade
+
+            espera = 0 if tokens >= 1 else (1 - tokens) / self.taxa
+            if not espera:
+                tokens -= 1
+            conn.execute(
+                'INSERT OR REPLACE INTO limites_taxa (nome, tokens, atualizado_em) VALUES (?, ?, ?)',
+                (self.nome, tokens, agora)
+            )
+            return espera
+
+    def tentar(self):
+        """Consome um token se disponível, sem bloquear"""
+        if self.ilimitado:
+            return True
+        return self._consumir() == 0
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até haver um token disponível (ou o timeout expirar)"""
+        if self.ilimitado:
+            return True
+
+        limite = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            espera = self._consumir()
+            if not espera:
+                return True
+
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+
+            time.sleep(espera)
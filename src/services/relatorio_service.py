@@ -0,0 +1,403 @@
+"""
+Relatórios financeiros em JSON, CSV, Excel (XLSX) e PDF
+
+- O intervalo pedido é dividido em meses, cada um agregado por passeio a
+  partir do cubo de KPIs (kpi_service), sem consultar a Paytour
+- Os arquivos são escritos linha a linha: CSV direto no arquivo, XLSX com
+  XlsxWriter em modo constant_memory e PDF com o canvas do reportlab,
+  página a página
+- Intervalos longos rodam em segundo plano; o status e o link de download
+  ficam na tabela relatorios (removidos com o arquivo por limpar_relatorios
+  após a retenção)
+- Relatórios síncronos usam um arquivo temporário apagado após o envio
+"""
+import os
+import csv
+import json
+import uuid
+import calendar
+import tempfile
+import threading
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from services.db_service import get_conn, transacao
+from services import kpi_service
+
+try:
+    import xlsxwriter
+except ImportError:  # formato xlsx indisponível sem a dependência
+    xlsxwriter = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas as pdf_canvas
+except ImportError:  # formato pdf indisponível sem a dependência
+    pdf_canvas = None
+
+RELATORIOS_DIR = os.getenv(
+    'RELATORIOS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'relatorios')
+)
+
+# Intervalos maiores que isso (em dias) são gerados em segundo plano
+DIAS_SINCRONO = int(os.getenv('RELATORIO_DIAS_SINCRONO', 62))
+
+# Relatórios em segundo plano mais antigos que isso são removidos por limpar_relatorios
+RETENCAO_RELATORIOS_HORAS = 24
+
+FORMATOS = {
+    'json': None,
+    'csv': 'text/csv',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+EXTENSOES = {'csv': 'csv', 'excel': 'xlsx', 'pdf': 'pdf'}
+
+COLUNAS = ['mes', 'passeio', 'vendas', 'preco_medio', 'receita']
+
+
+def init_db():
+    """Inicializa tabela de relatórios gerados"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS relatorios (
+                    id TEXT PRIMARY KEY,
+                    formato TEXT NOT NULL,
+                    data_inicio TEXT NOT NULL,
+                    data_fim TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    arquivo TEXT,
+                    resumo TEXT,
+                    erro TEXT,
+                    criado_em TIMESTAMP,
+                    concluido_em TIMESTAMP
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabela de relatórios: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+def formato_disponivel(formato):
+    """Indica se o formato é conhecido e sua dependência está instalada"""
+    if formato == 'excel':
+        return xlsxwriter is not None
+    if formato == 'pdf':
+        return pdf_canvas is not None
+    return formato in FORMATOS
+
+
+def dias_intervalo(data_inicio, data_fim):
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    return (fim - inicio).days + 1
+
+
+def dividir_em_meses(data_inicio, data_fim):
+    """Divide o intervalo em (início, fim) de cada mês civil"""
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+
+    if fim < inicio:
+        raise ValueError('data_fim anterior a data_inicio')
+
+    meses = []
+    atual = inicio
+    while atual <= fim:
+        ultimo_dia = date(atual.year, atual.month, calendar.monthrange(atual.year, atual.month)[1])
+        fim_mes = min(ultimo_dia, fim)
+        meses.append((atual.isoformat(), fim_mes.isoformat()))
+        atual = fim_mes + timedelta(days=1)
+    return meses
+
+
+def _agregar_mes(intervalo):
+    """Vendas por passeio de um mês, lidas do cubo de KPIs"""
+    data_inicio, data_fim = intervalo
+    mes = data_inicio[:7]
+    return [
+        {
+            'mes': mes,
+            'passeio_id': item['grupo'],
+            'passeio': item['titulo'] or '',
+            'vendas': item['vendidas'],
+            'preco_medio': round(item['preco'], 2),
+            'receita': item['receita']
+        }
+        for item in kpi_service.consultar(data_inicio, data_fim, agrupar='passeio')['grupos']
+    ]
+
+
+def agregar_periodo(data_inicio, data_fim):
+    """
+    Linhas (mês × passeio) do intervalo
+
+    Returns:
+        Lista de dicts com mes, passeio_id, passeio, vendas, preco_medio, receita
+    """
+    return [
+        linha
+        for intervalo in dividir_em_meses(data_inicio, data_fim)
+        for linha in _agregar_mes(intervalo)
+    ]
+
+
+def resumir(linhas, data_inicio, data_fim):
+    """Relatório no formato JSON (resumo + detalhes por passeio + por mês)"""
+    por_passeio = {}
+    por_mes = {}
+
+    for linha in linhas:
+        passeio = por_passeio.setdefault(linha['passeio_id'], {
+            'passeio': linha['passeio'], 'vendas': 0, 'preco_medio': linha['preco_medio'], 'receita': 0
+        })
+        passeio['vendas'] += linha['vendas']
+        passeio['receita'] += linha['receita']
+
+        mes = por_mes.setdefault(linha['mes'], {'mes': linha['mes'], 'vendas': 0, 'receita': 0})
+        mes['vendas'] += linha['vendas']
+        mes['receita'] += linha['receita']
+
+    detalhes = sorted(por_passeio.values(), key=lambda item: item['receita'], reverse=True)
+    for item in detalhes + list(por_mes.values()):
+        item['receita'] = round(item['receita'], 2)
+
+    return {
+        'periodo': {
+            'inicio': data_inicio,
+            'fim': data_fim
+        },
+        'resumo': {
+            'total_passeios': len(por_passeio),
+            'total_vendas': sum(item['vendas'] for item in detalhes),
+            'total_receita': round(sum(item['receita'] for item in detalhes), 2)
+        },
+        'detalhes': detalhes,
+        'por_mes': [por_mes[mes] for mes in sorted(por_mes)]
+    }
+
+
+# ============= ESCRITORES =============
+
+def escrever_csv(caminho, linhas, relatorio):
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS)
+        for linha in linhas:
+            escritor.writerow([linha[coluna] for coluna in COLUNAS])
+
+
+def escrever_xlsx(caminho, linhas, relatorio):
+    workbook = xlsxwriter.Workbook(caminho, {'constant_memory': True})
+    try:
+        negrito = workbook.add_format({'bold': True})
+        moeda = workbook.add_format({'num_format': 'R$ #,##0.00'})
+
+        detalhes = workbook.add_worksheet('Detalhes')
+        detalhes.write_row(0, 0, COLUNAS, negrito)
+        for numero, linha in enumerate(linhas, start=1):
+            detalhes.write_string(numero, 0, linha['mes'])
+            detalhes.write_string(numero, 1, linha['passeio'])
+            detalhes.write_number(numero, 2, linha['vendas'])
+            detalhes.write_number(numero, 3, linha['preco_medio'], moeda)
+            detalhes.write_number(numero, 4, linha['receita'], moeda)
+
+        resumo = workbook.add_worksheet('Resumo')
+        resumo.write_row(0, 0, ['Período', f"{relatorio['periodo']['inicio']} a {relatorio['periodo']['fim']}"])
+        resumo.write_row(1, 0, ['Passeios', relatorio['resumo']['total_passeios']])
+        resumo.write_row(2, 0, ['Vendas', relatorio['resumo']['total_vendas']])
+        resumo.write(3, 0, 'Receita')
+        resumo.write_number(3, 1, relatorio['resumo']['total_receita'], moeda)
+        resumo.write_row(5, 0, ['mes', 'vendas', 'receita'], negrito)
+        for numero, mes in enumerate(relatorio['por_mes'], start=6):
+            resumo.write_string(numero, 0, mes['mes'])
+            resumo.write_number(numero, 1, mes['vendas'])
+            resumo.write_number(numero, 2, mes['receita'], moeda)
+    finally:
+        workbook.close()
+
+
+def escrever_pdf(caminho, linhas, relatorio):
+    largura, altura = A4
+    margem = 40
+    entrelinha = 14
+    posicoes = [margem, margem + 60, margem + 330, margem + 390, margem + 460]
+
+    pdf = pdf_canvas.Canvas(caminho, pagesize=A4)
+    pdf.setTitle('Relatório Financeiro - Maremar Turismo')
+
+    def cabecalho():
+        pdf.setFont('Helvetica-Bold', 9)
+        for x, coluna in zip(posicoes, COLUNAS):
+            pdf.drawString(x, altura - margem - 50, coluna)
+        pdf.setFont('Helvetica', 9)
+        return altura - margem - 50 - entrelinha
+
+    pdf.setFont('Helvetica-Bold', 14)
+    pdf.drawString(margem, altura - margem, 'Relatório Financeiro - Maremar Turismo')
+    pdf.setFont('Helvetica', 10)
+    pdf.drawString(
+        margem, altura - margem - 20,
+        f"{relatorio['periodo']['inicio']} a {relatorio['periodo']['fim']} | "
+        f"Vendas: {relatorio['resumo']['total_vendas']} | "
+        f"Receita: R$ {relatorio['resumo']['total_receita']:,.2f}"
+    )
+    y = cabecalho()
+
+    for linha in linhas:
+        if y < margem:
+            pdf.showPage()
+            y = cabecalho()
+        valores = [
+            linha['mes'],
+            linha['passeio'][:55],
+            str(linha['vendas']),
+            f"{linha['preco_medio']:,.2f}",
+            f"{linha['receita']:,.2f}"
+        ]
+        for x, valor in zip(posicoes, valores):
+            pdf.drawString(x, y, valor)
+        y -= entrelinha
+
+    pdf.save()
+
+
+ESCRITORES = {
+    'csv': escrever_csv,
+    'excel': escrever_xlsx,
+    'pdf': escrever_pdf,
+}
+
+
+def gerar_arquivo(formato, data_inicio, data_fim, relatorio_id=None):
+    """
+    Agrega o período e grava o arquivo do relatório
+
+    Sem relatorio_id o arquivo é temporário: quem chama deve apagá-lo com
+    remover_arquivo após o envio.
+
+    Returns:
+        (caminho do arquivo, relatório resumido)
+    """
+    linhas = agregar_periodo(data_inicio, data_fim)
+    relatorio = resumir(linhas, data_inicio, data_fim)
+
+    if relatorio_id:
+        os.makedirs(RELATORIOS_DIR, exist_ok=True)
+        caminho = os.path.join(RELATORIOS_DIR, f"{relatorio_id}.{EXTENSOES[formato]}")
+    else:
+        descritor, caminho = tempfile.mkstemp(prefix='relatorio_', suffix=f".{EXTENSOES[formato]}")
+        os.close(descritor)
+
+    try:
+        ESCRITORES[formato](caminho, linhas, relatorio)
+    except BaseException:
+        remover_arquivo(caminho)
+        raise
+
+    return caminho, relatorio
+
+
+def remover_arquivo(caminho):
+    """Apaga o arquivo de um relatório (ignora se já não existe)"""
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Erro ao remover arquivo de relatório {caminho}: {str(e)}")
+
+
+def nome_download(relatorio):
+    return f"relatorio_{relatorio['data_inicio']}_{relatorio['data_fim']}.{EXTENSOES[relatorio['formato']]}"
+
+
+# ============= EXECUÇÃO EM SEGUNDO PLANO =============
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _executar(relatorio_id, formato, data_inicio, data_fim):
+    try:
+        caminho, relatorio = gerar_arquivo(formato, data_inicio, data_fim, relatorio_id)
+        with transacao() as conn:
+            conn.execute(
+                "UPDATE relatorios SET status = 'concluido', arquivo = ?, resumo = ?, concluido_em = ? WHERE id = ?",
+                (caminho, json.dumps(relatorio['resumo']), datetime.now().isoformat(), relatorio_id)
+            )
+    except Exception as e:
+        print(f"Erro ao gerar relatório {relatorio_id}: {str(e)}")
+        with transacao() as conn:
+            conn.execute(
+                "UPDATE relatorios SET status = 'erro', erro = ?, concluido_em = ? WHERE id = ?",
+                (str(e), datetime.now().isoformat(), relatorio_id)
+            )
+
+
+def iniciar(formato, data_inicio, data_fim):
+    """Registra o relatório e o gera em segundo plano; retorna o id"""
+    global _executor, _executor_pid
+
+    relatorio_id = uuid.uuid4().hex
+    with transacao() as conn:
+        conn.execute('''
+            INSERT INTO relatorios (id, formato, data_inicio, data_fim, status, criado_em)
+            VALUES (?, ?, ?, ?, 'processando', ?)
+        ''', (relatorio_id, formato, data_inicio, data_fim, datetime.now().isoformat()))
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv('RELATORIOS_SIMULTANEOS', 2)))
+            _executor_pid = os.getpid()
+
+    _executor.submit(_executar, relatorio_id, formato, data_inicio, data_fim)
+    return relatorio_id
+
+
+def buscar(relatorio_id):
+    """Registro do relatório (status, arquivo, resumo)"""
+    row = get_conn().execute('SELECT * FROM relatorios WHERE id = ?', (relatorio_id,)).fetchone()
+    if not row:
+        return None
+
+    relatorio = dict(row)
+    relatorio['resumo'] = json.loads(relatorio['resumo']) if relatorio['resumo'] else None
+    return relatorio
+
+
+def limpar_relatorios(horas=RETENCAO_RELATORIOS_HORAS):
+    """
+    Remove relatórios em segundo plano mais antigos que a retenção (registro
+    e arquivo) e arquivos órfãos de RELATORIOS_DIR; retorna a quantidade
+    """
+    limite = datetime.now() - timedelta(hours=int(horas))
+
+    with transacao() as conn:
+        expirados = conn.execute(
+            'SELECT id, arquivo FROM relatorios WHERE criado_em < ?', (limite.isoformat(),)
+        ).fetchall()
+        conn.executemany('DELETE FROM relatorios WHERE id = ?', [(row['id'],) for row in expirados])
+
+    for row in expirados:
+        if row['arquivo']:
+            remover_arquivo(row['arquivo'])
+
+    # Arquivos sem registro (ex.: relatórios removidos antes de existir a limpeza)
+    if os.path.isdir(RELATORIOS_DIR):
+        ativos = {row[0] for row in get_conn().execute('SELECT arquivo FROM relatorios WHERE arquivo IS NOT NULL')}
+        for nome in os.listdir(RELATORIOS_DIR):
+            caminho = os.path.join(RELATORIOS_DIR, nome)
+            if (
+                caminho not in ativos
+                and os.path.isfile(caminho)
+                and datetime.fromtimestamp(os.path.getmtime(caminho)) < limite
+            ):
+                remover_arquivo(caminho)
+
+    return len(expirados)
@@ -0,0 +1,247 @@
+"""
+Segmentação RFM (recência, frequência, valor) dos clientes do CRM
+
+A base inteira é carregada em arrays NumPy e pontuada em uma única passada
+vetorizada: cada dimensão recebe nota de 1 a 5 pelos quintis dos clientes
+que já compraram, e a combinação das notas define o segmento. As notas são
+gravadas em clientes_rfm e a contagem por segmento em rfm_segmentos, de
+onde a criação de campanhas lê o tamanho do público sem varrer a base.
+"""
+import time
+from datetime import datetime, timezone
+import numpy as np
+from services.db_service import get_conn, transacao
+
+# Segmentos na ordem de prioridade da classificação (o primeiro que casar vence)
+SEGMENTOS = [
+    'campeoes',
+    'fieis',
+    'novos',
+    'potenciais',
+    'em_risco',
+    'nao_pode_perder',
+    'hibernando',
+    'precisam_atencao',
+    'sem_compra',
+]
+
+DESCRICAO_SEGMENTOS = {
+    'campeoes': 'Compraram recentemente, com frequência e alto valor',
+    'fieis': 'Compram com frequência',
+    'novos': 'Primeira compra recente',
+    'potenciais': 'Compra recente, ainda com poucas compras',
+    'em_risco': 'Compravam com frequência, mas não voltam há algum tempo',
+    'nao_pode_perder': 'Alto valor e sem comprar há muito tempo',
+    'hibernando': 'Poucas compras e última compra antiga',
+    'precisam_atencao': 'Notas intermediárias',
+    'sem_compra': 'Cadastrados sem nenhuma compra',
+}
+
+QUANTIS = [0.2, 0.4, 0.6, 0.8]
+
+
+def init_db():
+    """Inicializa tabelas da segmentação RFM"""
+    try:
+        with transacao() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clientes_rfm (
+                    cliente_id INTEGER PRIMARY KEY,
+                    recencia_dias INTEGER,
+                    frequencia INTEGER,
+                    monetario REAL,
+                    r INTEGER,
+                    f INTEGER,
+                    m INTEGER,
+                    segmento TEXT NOT NULL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_clientes_rfm_segmento ON clientes_rfm (segmento, cliente_id)'
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rfm_segmentos (
+                    segmento TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL,
+                    recencia_media REAL,
+                    frequencia_media REAL,
+                    monetario_medio REAL,
+                    calculado_em TIMESTAMP
+                )
+            ''')
+    except Exception as e:
+        print(f"Erro ao inicializar tabelas RFM: {str(e)}")
+
+# Inicializar DB
+init_db()
+
+
+def _notas(valores, base, maior_melhor=True):
+    """Nota de 1 a 5 pelos quintis de valores[base]"""
+    if not base.any():
+        return np.ones(len(valores), dtype=np.int8)
+
+    limites = np.quantile(valores[base], QUANTIS)
+    if maior_melhor:
+        notas = 1 + np.searchsorted(limites, valores, side='left')
+    else:
+        notas = 5 - np.searchsorted(limites, valores, side='right')
+    return notas.astype(np.int8)
+
+
+def pontuar(ultima_compra, frequencia, monetario, hoje=None):
+    """
+    Calcula recência, notas R/F/M e segmento de cada cliente
+
+    Args:
+        ultima_compra: Array datetime64[D] (NaT para quem nunca comprou)
+        frequencia: Array com o total de compras
+        monetario: Array com o valor total gasto
+        hoje: Data de referência (datetime64[D]); padrão: hoje (UTC)
+
+    Returns:
+        dict de arrays: recencia_dias, r, f, m, segmento
+    """
+    hoje = np.datetime64(hoje or datetime.now(timezone.utc).date(), 'D')
+    compradores = ~np.isnat(ultima_compra) | (frequencia > 0)
+
+    # NaT vira INT64_MIN ao converter para número: identificado antes da subtração
+    sem_data = np.isnat(ultima_compra)
+    recencia = (hoje - ultima_compra).astype('timedelta64[D]').astype(np.float64)
+    # Sem data de compra: considerada a mais antiga entre os clientes com data
+    if sem_data.any():
+        recencia[sem_data] = recencia[~sem_data].max() if (~sem_data).any() else 0
+
+    r = _notas(recencia, compradores, maior_melhor=False)
+    f = _notas(frequencia, compradores)
+    m = _notas(monetario, compradores)
+
+    condicoes = [
+        (r >= 4) & (f >= 4) & (m >= 4),
+        (f >= 4) & (r >= 3),
+        (r >= 4) & (frequencia <= 1),
+        (r >= 4),
+        (r <= 2) & (f >= 3),
+        (r <= 2) & (m >= 4),
+        (r <= 2),
+    ]
+    segmento = np.select(condicoes, SEGMENTOS[:len(condicoes)], default='precisam_atencao')
+    segmento = np.where(compradores, segmento, 'sem_compra')
+
+    return {
+        'recencia_dias': np.where(sem_data, -1, recencia).astype(np.int64),
+        'r': r,
+        'f': f,
+        'm': m,
+        'segmento': segmento
+    }
+
+
+def _datas(valores):
+    """Converte textos de data/timestamp do SQLite em datetime64[D]"""
+    return np.array([v[:10] if v else 'NaT' for v in valores], dtype='datetime64[D]')
+
+
+def calcular_rfm(status='ativo'):
+    """
+    Recalcula a segmentação RFM de toda a base e grava o resultado
+
+    Returns:
+        Relatório com total de clientes, contagem por segmento e duração
+    """
+    inicio = time.time()
+
+    rows = get_conn().execute(
+        'SELECT id, ultima_compra, total_compras, valor_total FROM clientes WHERE status = ?',
+        (status,)
+    ).fetchall()
+
+    if rows:
+        ids, ultimas, compras, valores = zip(*rows)
+    else:
+        ids, ultimas, compras, valores = (), (), (), ()
+
+    ids = np.array(ids, dtype=np.int64)
+    frequencia = np.array([c or 0 for c in compras], dtype=np.int64)
+    monetario = np.array([v or 0 for v in valores], dtype=np.float64)
+
+    resultado = pontuar(_datas(ultimas), frequencia, monetario)
+    segmento = resultado['segmento']
+
+    # Agregados por segmento
+    nomes, indices, totais = np.unique(segmento, return_inverse=True, return_counts=True)
+    recencia = resultado['recencia_dias'].astype(np.float64)
+    recencia_valida = recencia >= 0
+    somas_recencia = np.bincount(indices, weights=np.where(recencia_valida, recencia, 0), minlength=len(nomes))
+    qtd_recencia = np.bincount(indices, weights=recencia_valida, minlength=len(nomes))
+    somas_frequencia = np.bincount(indices, weights=frequencia, minlength=len(nomes))
+    somas_monetario = np.bincount(indices, weights=monetario, minlength=len(nomes))
+
+    calculado_em = datetime.now().isoformat()
+
+    with transacao() as conn:
+        conn.execute('DELETE FROM clientes_rfm')
+        conn.executemany(
+            'INSERT INTO clientes_rfm (cliente_id, recencia_dias, frequencia, monetario, r, f, m, segmento) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            zip(
+                ids.tolist(),
+                resultado['recencia_dias'].tolist(),
+                frequencia.tolist(),
+                monetario.tolist(),
+                resultado['r'].tolist(),
+                resultado['f'].tolist(),
+                resultado['m'].tolist(),
+                segmento.tolist()
+            )
+        )
+        conn.execute('DELETE FROM rfm_segmentos')
+        conn.executemany(
+            'INSERT INTO rfm_segmentos (segmento, total, recencia_media, frequencia_media, monetario_medio, calculado_em) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (
+                    str(nome),
+                    int(total),
+                    round(float(somas_recencia[i] / qtd_recencia[i]), 1) if qtd_recencia[i] else None,
+                    round(float(somas_frequencia[i] / total), 2),
+                    round(float(somas_monetario[i] / total), 2),
+                    calculado_em
+                )
+                for i, (nome, total) in enumerate(zip(nomes, totais))
+            ]
+        )
+
+    return {
+        'total_clientes': int(len(ids)),
+        'segmentos': {str(nome): int(total) for nome, total in zip(nomes, totais)},
+        'calculado_em': calculado_em,
+        'duracao_segundos': round(time.time() - inicio, 2)
+    }
+
+
+def listar_segmentos():
+    """Segmentos com total de clientes e médias R/F/M do último cálculo"""
+    registrados = {
+        row['segmento']: dict(row)
+        for row in get_conn().execute('SELECT * FROM rfm_segmentos')
+    }
+
+    return [
+        {
+            'segmento': segmento,
+            'descricao': DESCRICAO_SEGMENTOS[segmento],
+            'total': registrados.get(segmento, {}).get('total', 0),
+            'recencia_media': registrados.get(segmento, {}).get('recencia_media'),
+            'frequencia_media': registrados.get(segmento, {}).get('frequencia_media'),
+            'monetario_medio': registrados.get(segmento, {}).get('monetario_medio'),
+            'calculado_em': registrados.get(segmento, {}).get('calculado_em')
+        }
+        for segmento in SEGMENTOS
+    ]
+
+
+def contar_segmento(segmento):
+    """Total de clientes de um segmento (lido da tabela de contagens)"""
+    row = get_conn().execute('SELECT total FROM rfm_segmentos WHERE segmento = ?', (segmento,)).fetchone()
+    return row[0] if row else 0
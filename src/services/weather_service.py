@@ -184,6 +184,16 @@ class WeatherService:
         
         return impactos
     
+    def resumo_impacto(self, impactos):
+        """Métricas agregadas da análise de impacto (usadas para detectar mudanças)"""
+        scores = [dia['score'] for dia in impactos]
+        
+        return {
+            'score_medio': round(sum(scores) / len(scores), 1) if scores else 0,
+            'score_minimo': min(scores) if scores else 0,
+            'dias_ruins': sum(1 for score in scores if score < 40)
+        }
+    
     def _get_recommendation(self, score, dia):
         """Gera recomendação baseada no score"""
         if score >= 80: